@@ -1,13 +1,13 @@
+import pandas as pd
 import streamlit as st
 from datetime import date
-from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 from utils.db import get_connection
+from utils import journal, ledger, repository, stations
 
 # === CONFIG ===
 st.set_page_config(layout="wide", page_title="Fuel Station Dashboard")
 
-engine = get_connection()
-
 # === HERO BANNER ===
 from PIL import Image
 import streamlit as st
@@ -66,6 +66,28 @@ st.markdown("---")
 # === EXPANDER SECTIONS ===
 st.title("📥 Daily Operations – Data Entry")
 
+# Saves are queued on the local write-behind journal (utils/journal.py)
+# and synced to the database in the background.
+if journal.ENABLED:
+    sync = journal.get_journal().counts()
+    st.caption(f"🔄 Sync queue: {sync['pending']} pending · {sync['failed']} failed")
+    if sync["failed"]:
+        with st.expander(f"⚠️ {sync['failed']} entries failed to sync", expanded=True):
+            st.dataframe(pd.DataFrame(journal.get_journal().failures()), hide_index=True, use_container_width=True)
+            if st.button("Retry failed entries"):
+                journal.get_journal().retry_failed()
+                st.rerun()
+
+# Entries are recorded against one station; the picker only shows for chains.
+try:
+    station_choices, station_index = stations.picker(repository.load_stations(), fleet=False)
+except SQLAlchemyError:
+    station_choices, station_index = {str(stations.DEFAULT_STATION): stations.DEFAULT_STATION}, 0
+station = station_choices[
+    st.selectbox("Station", list(station_choices), index=station_index)
+    if len(station_choices) > 1 else list(station_choices)[station_index]
+]
+
 # 1. STOCK ENTRY
 from PIL import Image
 import streamlit as st
@@ -79,32 +101,26 @@ with st.expander("📦 Fuel Stock Entry", expanded=False):
         stock_date = st.date_input("Stock Date", key="stock_date", value=date.today())
         stock_fuel_type = st.selectbox("Fuel Type", ["Petrol", "Diesel"], key="stock_fuel")
 
-    # Fetch opening dynamically
-    with engine.connect() as conn:
-        prev = conn.execute(
-            text("""
-                SELECT closing_stock FROM vw_fuel_stock
-                WHERE fuel_type = :fuel AND date < :date
-                ORDER BY date DESC LIMIT 1
-            """), {"fuel": stock_fuel_type, "date": stock_date}
-        ).fetchone()
-
-    opening_stock = prev[0] if prev else 0
-    st.info(f"Opening Stock: **{opening_stock} Litres**")
+    # Fetch opening from the ledger's latest balance
+    try:
+        with get_connection().connect() as conn:
+            opening_stock = ledger.opening_stock(conn, station, stock_fuel_type, stock_date)
+        if journal.ENABLED and sync["pending"]:
+            # Queued entries are not in the ledger yet; it posts the true figure on sync.
+            st.info(f"Opening Stock: **{opening_stock} Litres** (before {sync['pending']} queued entries sync)")
+        else:
+            st.info(f"Opening Stock: **{opening_stock} Litres**")
+    except SQLAlchemyError:
+        st.warning("Database unreachable – opening stock will be posted when the entry syncs.")
 
     received = st.number_input("Received Stock (Litres)", min_value=0.0, step=1.0)
     if st.button("Save Stock Entry"):
-        with engine.connect() as conn:
-            conn.execute(
-                text("""
-                    INSERT INTO fuel_stock(date,fuel_type,opening_stock,received_stock,closing_stock)
-                    VALUES(:d,:f,:o,:r,0)
-                """),
-                {"d": stock_date, "f": stock_fuel_type, "o": opening_stock, "r": received}
-            )
-            conn.commit()
-        st.cache_data.clear()
-        st.success("Stock Entry Saved Successfully ✔")
+        # Opening/closing stock are posted by the ledger when the entry syncs.
+        journal.submit({"stock": pd.DataFrame([
+            {"station_id": station, "date": stock_date, "fuel_type": stock_fuel_type, "received_stock": received}
+        ])})
+        st.success("Stock Entry Queued – saved once the journal syncs ✔" if journal.ENABLED
+                   else "Stock Entry Saved Successfully ✔")
 st.markdown("---")
 
 
@@ -127,31 +143,13 @@ with st.expander("⛽ Fuel Sales Entry", expanded=False):
     selling_price = col5.number_input("Selling Price (₹/L)", min_value=0.0, step=0.1)
 
     if st.button("Save Sales Entry"):
-        with engine.connect() as conn:
-            # insert sales
-            conn.execute(
-                text("""
-                    INSERT INTO fuel_sales(date,fuel_type,quantity_sold,selling_price,total_amount)
-                    VALUES(:d,:f,:q,:s,:t)
-                """),
-                {"d": sale_date, "f": fuel_type, "q": quantity_sold,
-                 "s": selling_price, "t": selling_price * quantity_sold}
-            )
-
-            # insert/update buying price
-            conn.execute(
-                text("""
-                    INSERT INTO fuel_price(date,fuel_type,buying_price)
-                    VALUES(:d,:f,:b) AS new
-                    ON DUPLICATE KEY UPDATE buying_price=new.buying_price
-                """),
-                {"d": sale_date, "f": fuel_type, "b": buying_price}
-            )
-
-            conn.commit()
-
-        st.cache_data.clear()
-        st.success("Sales Entry Saved Successfully ✔")
+        # Sale + buying price (upserted), stock posting and summary on sync.
+        journal.submit({"sales": pd.DataFrame([
+            {"station_id": station, "date": sale_date, "fuel_type": fuel_type, "quantity_sold": quantity_sold,
+             "selling_price": selling_price, "buying_price": buying_price}
+        ])})
+        st.success("Sales Entry Queued – saved once the journal syncs ✔" if journal.ENABLED
+                   else "Sales Entry Saved Successfully ✔")
 st.markdown("---")
 
 
@@ -168,17 +166,11 @@ with st.expander("💸 Expense Entry", expanded=False):
     exp_amount = st.number_input("Amount (₹)", min_value=0.0, step=10.0)
 
     if st.button("Save Expense Entry"):
-        with engine.connect() as conn:
-            conn.execute(
-                text("""
-                    INSERT INTO expenses(date, expense_type, amount)
-                    VALUES(:d, :t, :a)
-                """),
-                {"d": exp_date, "t": exp_type, "a": exp_amount}
-            )
-            conn.commit()
-        st.cache_data.clear()
-        st.success("Expense Entry Saved Successfully ✔")
+        journal.submit({"expenses": pd.DataFrame([
+            {"station_id": station, "date": exp_date, "expense_type": exp_type, "amount": exp_amount}
+        ])})
+        st.success("Expense Entry Queued – saved once the journal syncs ✔" if journal.ENABLED
+                   else "Expense Entry Saved Successfully ✔")
 
 # ============================================
 # ABOUT COMPANY
@@ -205,7 +197,6 @@ roadmap = [
     "Crude oil market integration",
     "OMC auto price circular updates (IOCL/BPCL/HPCL)",
     "Mobile application for operators",
-    "Multi-station support",
     "Tally + GST invoice integration",
     "Vendor purchase tracking",
     "WhatsApp & SMS alert system",
@@ -0,0 +1,228 @@
+"""Rolling-origin backtest of the Prediction page forecasts.
+
+At every origin (each ``--step`` days once ``--min-train`` days of history
+exist) the price and demand models are fitted on the history so far and
+scored on the following ``--horizon`` days, next to the previous page
+logic as a baseline (tomorrow = last price + mean of the last 7 changes;
+demand = 30-day average)::
+
+    python benchmarks/bench_forecast.py [--days 1095] [--step 7] [--json report.json]
+    python benchmarks/bench_forecast.py --db        # history from FUEL_DB_URL
+
+Reports MAPE/MAE per horizon and fuel, how often the purchase advice
+matches the advice the realised next-day price would have given, the
+error of the recommended 7-day purchase, and wall-clock and peak memory
+per fit as history grows.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import daily_sales  # noqa: E402
+from utils.forecast import daily_series, fit, recommend  # noqa: E402
+
+
+# ----------------------------------
+# BASELINE (previous page logic)
+# ----------------------------------
+def legacy_price(history, horizon):
+    """Last price plus the mean of the last 7 day-to-day changes, per day ahead."""
+    prices = history.dropna()
+    step = prices.diff().tail(7).mean()
+    return prices.iloc[-1] + step * np.arange(1, horizon + 1)
+
+
+def legacy_demand(history, horizon):
+    return np.full(horizon, history.tail(30).mean())
+
+
+# ----------------------------------
+# BACKTEST
+# ----------------------------------
+def _errors(actual, predicted):
+    """(absolute error, absolute percentage error) per step; NaN where unobserved."""
+    err = np.abs(actual - predicted)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(actual > 0, err / actual * 100, np.nan)
+    return err, pct
+
+
+def backtest(daily, horizon, min_train, step, level=0.95):
+    """Score every origin of one fuel's daily series; returns a dict of arrays."""
+    price, demand = daily["price"].to_numpy(), daily["demand"].to_numpy()
+    origins = list(range(min_train, len(daily) - horizon + 1, step))
+    out = {
+        "origins": len(origins),
+        "errors": {(t, m): {"mae": [], "mape": []} for t in ("price", "demand") for m in ("model", "legacy")},
+        "coverage": {"price": [], "demand": []},
+        "advice": {"model": [], "legacy": []},
+        "purchase_pct": {"model": [], "legacy": []},
+        "fits": [],
+    }
+    for n in origins:
+        train = daily.iloc[:n]
+        forecasts = {}
+        for target, y in (("price", price), ("demand", demand)):
+            start = time.perf_counter()
+            model = fit(y[:n], train.index[0])
+            out["fits"].append((n, time.perf_counter() - start))
+            fc = model.forecast(horizon, level)
+            actual = y[n:n + horizon]
+            legacy = (legacy_price if target == "price" else legacy_demand)(train[target], horizon)
+            for name, predicted in (("model", fc["forecast"].to_numpy()), ("legacy", legacy)):
+                mae, mape = _errors(actual, predicted)
+                out["errors"][(target, name)]["mae"].append(mae)
+                out["errors"][(target, name)]["mape"].append(mape)
+            inside = (actual >= fc["lower"].to_numpy()) & (actual <= fc["upper"].to_numpy())
+            out["coverage"][target].append(np.where(np.isnan(actual), np.nan, inside))
+            forecasts[target] = (fc["forecast"].to_numpy(), legacy)
+
+        # Purchase advice as the page computes it, against the advice the
+        # realised next-day price would have produced.
+        avg_price = np.nanmean(price[:n])
+        recent, avg_sales = np.nanmean(demand[n - 7:n]), np.nanmean(demand[n - 30:n])
+        truth = price[n]
+        if not np.isnan(truth):
+            expected = recommend(truth, avg_price, recent, avg_sales)
+            for i, name in enumerate(("model", "legacy")):
+                predicted = forecasts["price"][i][0]
+                out["advice"][name].append(recommend(predicted, avg_price, recent, avg_sales) == expected)
+
+        # Recommended 7-day purchase vs litres actually sold in those days.
+        week = demand[n:n + 7]
+        if len(week) == 7 and not np.isnan(week).any():
+            sold = week.sum()
+            out["purchase_pct"]["model"].append(abs(forecasts["demand"][0][:7].sum() - sold) / sold * 100)
+            out["purchase_pct"]["legacy"].append(abs(avg_sales * 7 - sold) / sold * 100)
+    return out
+
+
+def fit_profile(daily, lengths):
+    """Median wall-clock and tracemalloc peak of one fit per history length."""
+    rows = []
+    y = daily["demand"].to_numpy()
+    for n in lengths:
+        if n > len(y):
+            continue
+        times = []
+        for _ in range(3):
+            start = time.perf_counter()
+            fit(y[:n], daily.index[0])
+            times.append(time.perf_counter() - start)
+        tracemalloc.start()
+        fit(y[:n], daily.index[0])
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        rows.append({"days": n, "fit_ms": statistics.median(times) * 1000, "peak_kib": peak / 1024})
+    return rows
+
+
+# ----------------------------------
+# REPORT
+# ----------------------------------
+def summarize(fuel, result, horizon):
+    per_horizon = []
+    for (target, name), errs in result["errors"].items():
+        mae = np.nanmean(np.vstack(errs["mae"]), axis=0)
+        mape = np.nanmean(np.vstack(errs["mape"]), axis=0)
+        for h in range(horizon):
+            per_horizon.append({
+                "fuel": fuel, "target": target, "method": name, "horizon": h + 1,
+                "mae": float(mae[h]), "mape": float(mape[h]),
+            })
+    return {
+        "fuel": fuel,
+        "origins": result["origins"],
+        "per_horizon": per_horizon,
+        "coverage": {t: float(np.nanmean(np.vstack(c))) for t, c in result["coverage"].items()},
+        "advice_hit_rate": {m: float(np.mean(v)) if v else None for m, v in result["advice"].items()},
+        "purchase_mape": {m: float(np.mean(v)) if v else None for m, v in result["purchase_pct"].items()},
+        "fit_ms_median": statistics.median(t for _, t in result["fits"]) * 1000,
+    }
+
+
+def print_report(summaries, profile, horizon, level):
+    shown = sorted({1, min(7, horizon), horizon})
+    for s in summaries:
+        print(f"\n== {s['fuel']} ({s['origins']} origins) ==")
+        print(f"{'target':<8}{'method':<8}" + "".join(f"{f'h={h} MAPE':>12}{'MAE':>9}" for h in shown))
+        rows = pd.DataFrame(s["per_horizon"])
+        for (target, method), grp in rows.groupby(["target", "method"], sort=False):
+            grp = grp.set_index("horizon")
+            print(f"{target:<8}{method:<8}" + "".join(
+                f"{grp.at[h, 'mape']:>11.2f}%{grp.at[h, 'mae']:>9.2f}" for h in shown
+            ))
+        print(f"{level:.0%} interval coverage: price {s['coverage']['price']:.1%}, "
+              f"demand {s['coverage']['demand']:.1%}")
+        print(f"advice hit rate: model {s['advice_hit_rate']['model']:.1%}, "
+              f"legacy {s['advice_hit_rate']['legacy']:.1%}")
+        print(f"7-day purchase error: model {s['purchase_mape']['model']:.1f}%, "
+              f"legacy (avg x 7) {s['purchase_mape']['legacy']:.1f}%")
+        print(f"median fit: {s['fit_ms_median']:.1f} ms")
+    print("\nfit cost vs history length:")
+    for row in profile:
+        print(f"  {row['days']:>6} days  {row['fit_ms']:8.1f} ms  peak {row['peak_kib']:8.1f} KiB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=1095, help="synthetic history length")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--db", action="store_true", help="backtest the history in FUEL_DB_URL instead")
+    parser.add_argument("--horizon", type=int, default=14)
+    parser.add_argument("--min-train", type=int, default=60)
+    parser.add_argument("--step", type=int, default=7)
+    parser.add_argument("--level", type=float, default=0.95)
+    parser.add_argument("--json", help="write the machine-readable report here")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        from utils import repository
+        sales = repository.load_sales()
+        source = "db"
+    else:
+        sales = daily_sales(args.days, seed=args.seed)
+        source = f"synthetic(days={args.days}, seed={args.seed})"
+
+    started = time.perf_counter()
+    summaries, series = [], {}
+    for fuel, rows in sales.groupby("fuel_type"):
+        series[fuel] = daily_series(rows)
+        result = backtest(series[fuel], args.horizon, args.min_train, args.step, args.level)
+        summaries.append(summarize(fuel, result, args.horizon))
+    longest = max(series.values(), key=len)
+    profile = fit_profile(longest, [90, 180, 365, 730, 1095, 1825, 3650])
+    elapsed = time.perf_counter() - started
+
+    print(f"source: {source}; horizon {args.horizon} days, origins every {args.step} days")
+    print_report(summaries, profile, args.horizon, args.level)
+    print(f"\ntotal: {elapsed:.1f}s")
+
+    if args.json:
+        report = {
+            "source": source,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "args": vars(args),
+            "seconds": elapsed,
+            "fuels": summaries,
+            "fit_profile": profile,
+        }
+        with open(args.json, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
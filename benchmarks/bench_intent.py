@@ -0,0 +1,80 @@
+"""Parse throughput of the chatbot intent parser.
+
+Runs every phrasing in ``chat_corpus.txt`` through ``utils.intent.parse``
+and through the previous substring extractors, and prints parses/second::
+
+    python benchmarks/bench_intent.py [--repeat 2000]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from utils.intent import parse  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(__file__), "chat_corpus.txt")
+
+# ----------------------------------
+# PREVIOUS EXTRACTORS (baseline)
+# ----------------------------------
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3, "april": 4, "apr": 4,
+    "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7, "august": 8, "aug": 8,
+    "september": 9, "sep": 9, "october": 10, "oct": 10, "november": 11, "nov": 11,
+    "december": 12, "dec": 12,
+}
+
+
+def legacy_parse(text):
+    t = text.lower().strip()
+    m = re.search(r"(20\d{2})", t)
+    year = int(m.group(1)) if m else None
+    m = re.search(r"(\d{4}-\d{2}-\d{2})", t)
+    day = m.group(1) if m else None
+    month = next((v for k, v in MONTHS.items() if k in t), None)
+    fuel = "Diesel" if "diesel" in t else "Petrol" if "petrol" in t else None
+    metric = None
+    for key, name in (("profit", "profit"), ("revenue", "revenue"), ("sale", "sales"), ("sold", "sales"),
+                      ("expense", "expenses"), ("cost", "expenses"), ("stock", "stock")):
+        if key in t:
+            metric = name
+            break
+    return metric, fuel, year, month, day
+
+
+def load_corpus(path=CORPUS):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def bench(fn, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in corpus:
+            fn(text)
+    elapsed = time.perf_counter() - start
+    return repeat * len(corpus) / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--corpus", default=CORPUS)
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    intents = [parse(text) for text in corpus]
+    understood = sum(1 for i in intents if i.metrics and (i.start or i.group_by))
+    print(f"corpus: {len(corpus)} phrasings, {understood} resolved to a metric + period")
+
+    for name, fn in (("legacy extractors", legacy_parse), ("intent.parse", parse)):
+        rate = bench(fn, corpus, args.repeat)
+        print(f"{name:<18} {rate:>12,.0f} parses/s  {1e6 / rate:8.2f} µs/parse")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Headless run time of the dashboard pages against a synthetic database.
+
+Fills a local database with ``synthetic.populate`` (unless ``--reuse``),
+then executes each page with Streamlit's ``AppTest`` and records, per page:
+script run time with cold caches and warm, SQL time and statement count,
+rows fetched from the database, and peak Python memory (tracemalloc, on a
+separate cold run so tracing does not skew the timings). The bytes held by
+each loaded dataset, typed vs default dtypes (``utils.frames``), are
+reported at the end::
+
+    python benchmarks/bench_pages.py [--years 10] [--stations 50] [--json pages.json]
+    python benchmarks/bench_pages.py --url sqlite:////tmp/fuel_bench.db --reuse
+
+Without ``--url`` a throwaway SQLite file is used. Pages open on station
+``--station`` (default 1); ``--station 0`` benchmarks the fleet roll-up.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+PAGES = ["pages/2_SALES.py", "pages/3_STOCK.py", "pages/4_PREDICTION.py", "pages/5_FINANCIAL.py"]
+
+
+# ----------------------------------
+# SQL METER
+# ----------------------------------
+class SQLMeter:
+    """Statement count, time in the driver and rows fetched, via engine events."""
+
+    def __init__(self, engine):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+        sqlite = engine.dialect.name == "sqlite"
+
+        def on_connect(dbapi_conn, _):
+            if sqlite:
+                # Called once per fetched row.
+                dbapi_conn.row_factory = self._count_row
+
+        def before(conn, cursor, statement, parameters, context, executemany):
+            self._local.start = time.perf_counter()
+
+        def after(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - self._local.start
+            with self._lock:
+                self.statements += 1
+                self.seconds += elapsed
+                if not sqlite and cursor.description is not None and cursor.rowcount > 0:
+                    self.rows += cursor.rowcount
+
+        from sqlalchemy import event
+        event.listen(engine, "connect", on_connect)
+        event.listen(engine, "before_cursor_execute", before)
+        event.listen(engine, "after_cursor_execute", after)
+
+    def _count_row(self, cursor, row):
+        self.rows += 1
+        return row
+
+    def reset(self):
+        self.statements = 0
+        self.seconds = 0.0
+        self.rows = 0
+
+    def snapshot(self):
+        return {"statements": self.statements, "sql_s": self.seconds, "rows": self.rows}
+
+
+# ----------------------------------
+# PAGE RUNS
+# ----------------------------------
+def clear_caches():
+    """Drop every in-process cache so the next run starts cold."""
+    from utils import forecast, repository
+    repository.invalidate()
+    forecast.get_forecaster().clear()
+
+
+def run_page(path, timeout):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(path, default_timeout=timeout)
+    start = time.perf_counter()
+    at.run()
+    return time.perf_counter() - start, [str(e.value) for e in at.exception]
+
+
+def measure(path, meter, repeat, timeout):
+    clear_caches()
+    meter.reset()
+    cold_s, errors = run_page(path, timeout)
+    cold_sql = meter.snapshot()
+
+    warm = []
+    meter.reset()
+    for _ in range(repeat):
+        warm.append(run_page(path, timeout)[0])
+    warm_sql = {k: v / repeat for k, v in meter.snapshot().items()}
+
+    clear_caches()
+    tracemalloc.start()
+    run_page(path, timeout)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "page": os.path.basename(path),
+        "errors": errors,
+        "cold_s": cold_s,
+        "warm_s": statistics.median(warm) if warm else None,
+        "cold_sql": cold_sql,
+        "warm_sql": warm_sql,
+        "peak_mib": peak / 2 ** 20,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="database URL (default: temporary SQLite file)")
+    parser.add_argument("--reuse", action="store_true", help="benchmark the data already in --url")
+    parser.add_argument("--years", type=float, default=10)
+    parser.add_argument("--stations", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--station", type=int, default=1, help="station the pages open on (0: the fleet)")
+    parser.add_argument("--pages", nargs="*", default=PAGES)
+    parser.add_argument("--repeat", type=int, default=3, help="warm runs per page")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--json", help="write the machine-readable report here")
+    args = parser.parse_args(argv)
+
+    tmp = None
+    if args.url is None:
+        tmp = tempfile.mkdtemp()
+        args.url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        args.reuse = False
+    # utils.db and utils.stations read these at import time.
+    os.environ["FUEL_DB_URL"] = args.url
+    os.environ["FUEL_STATION_ID"] = str(args.station)
+    os.chdir(ROOT)
+
+    from utils.db import dispose_engine, get_connection
+
+    rows = None
+    generated_s = None
+    if not args.reuse:
+        from benchmarks.synthetic import populate
+        start = time.perf_counter()
+        rows = populate(get_connection(), args.years, args.stations, seed=args.seed)
+        generated_s = time.perf_counter() - start
+        print(f"generated {', '.join(f'{t}: {n:,}' for t, n in rows.items())} in {generated_s:.1f}s")
+
+    engine = get_connection()
+    meter = SQLMeter(engine)
+    engine.dispose()  # reconnect so the connect hook applies
+
+    results = []
+    for path in args.pages:
+        result = measure(path, meter, args.repeat, args.timeout)
+        results.append(result)
+        status = "OK" if not result["errors"] else f"ERROR {result['errors'][0][:60]}"
+        print(
+            f"{result['page']:<16} cold {result['cold_s']:7.2f}s  warm {result['warm_s']:7.2f}s  "
+            f"sql {result['cold_sql']['sql_s']:6.2f}s/{result['cold_sql']['statements']:>4} stmts  "
+            f"rows {result['cold_sql']['rows']:>9,}  peak {result['peak_mib']:7.1f} MiB  {status}"
+        )
+
+    from utils.frames import memory_report
+    datasets = memory_report()
+    print(datasets.to_string())
+
+    if args.json:
+        report = {
+            "url": "sqlite (temporary)" if tmp else engine.url.render_as_string(hide_password=True),
+            "dialect": engine.dialect.name,
+            "python": platform.python_version(),
+            "scale": {"years": args.years, "stations": args.stations, "seed": args.seed, "station": args.station},
+            "rows": rows,
+            "generated_s": generated_s,
+            "pages": results,
+            "datasets": datasets.to_dict(orient="index"),
+        }
+        with open(args.json, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"report written to {args.json}")
+
+    dispose_engine()
+    if tmp:
+        os.remove(os.path.join(tmp, "bench.db"))
+        os.rmdir(tmp)
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
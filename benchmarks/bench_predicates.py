@@ -0,0 +1,180 @@
+"""Old ``YEAR()/MONTH()`` predicates vs half-open date ranges.
+
+Loads a large synthetic sales table (indexed on ``(fuel_type, date)`` and
+``date``) and times the chatbot's monthly and yearly totals written both
+ways, alongside whether the planner falls back to a full scan::
+
+    python benchmarks/bench_predicates.py [--rows 1000000] [--url mysql+pymysql://...]
+
+Without ``--url`` a throwaway SQLite file is used, where the old predicate
+is spelled with ``strftime``.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from utils.periods import month_start, next_month  # noqa: E402
+from utils.query import Select, statement  # noqa: E402
+from utils.schema import full_scans  # noqa: E402
+
+TABLE = "bench_fuel_sales"
+FUELS = ["Petrol", "Diesel"]
+
+OLD_PREDICATES = {
+    "mysql": {
+        "year": "YEAR(date) = :year",
+        "month": "YEAR(date) = :year AND MONTH(date) = :month",
+    },
+    "sqlite": {
+        "year": "CAST(strftime('%Y', date) AS INTEGER) = :year",
+        "month": "CAST(strftime('%Y', date) AS INTEGER) = :year AND CAST(strftime('%m', date) AS INTEGER) = :month",
+    },
+}
+
+
+# ----------------------------------
+# SYNTHETIC TABLE
+# ----------------------------------
+def load_table(engine, rows, seed=7):
+    rng = np.random.default_rng(seed)
+    first = date(2015, 1, 1)
+    days = rng.integers(0, 365 * 10, rows)
+    fuels = rng.integers(0, len(FUELS), rows)
+    litres = rng.uniform(5, 60, rows).round(3)
+    price = rng.uniform(90, 110, rows).round(2)
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        conn.execute(text(f"""
+            CREATE TABLE {TABLE} (
+                id INTEGER PRIMARY KEY,
+                date DATE NOT NULL,
+                fuel_type VARCHAR(20) NOT NULL,
+                quantity_sold DECIMAL(12, 3) NOT NULL,
+                total_amount DECIMAL(16, 2) NOT NULL
+            )
+        """))
+        insert = text(
+            f"INSERT INTO {TABLE} (id, date, fuel_type, quantity_sold, total_amount) "
+            "VALUES (:id, :date, :fuel, :litres, :amount)"
+        )
+        chunk = 50_000
+        for lo in range(0, rows, chunk):
+            hi = min(lo + chunk, rows)
+            conn.execute(insert, [
+                {
+                    "id": i + 1,
+                    "date": first + timedelta(days=int(days[i])),
+                    "fuel": FUELS[fuels[i]],
+                    "litres": float(litres[i]),
+                    "amount": float(litres[i] * price[i]),
+                }
+                for i in range(lo, hi)
+            ])
+        conn.execute(text(f"CREATE INDEX ix_{TABLE}_fuel_date ON {TABLE} (fuel_type, date)"))
+        conn.execute(text(f"CREATE INDEX ix_{TABLE}_date ON {TABLE} (date)"))
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("ANALYZE"))
+
+
+# ----------------------------------
+# QUERIES
+# ----------------------------------
+def old_query(dialect, grain, year, month, fuel):
+    sql = f"SELECT SUM(quantity_sold) AS sales FROM {TABLE} WHERE {OLD_PREDICATES[dialect][grain]}"
+    params = {"year": year}
+    if grain == "month":
+        params["month"] = month
+    if fuel:
+        sql += " AND fuel_type=:fuel"
+        params["fuel"] = fuel
+    return sql, params
+
+
+def new_query(grain, year, month, fuel):
+    if grain == "month":
+        ranges = [(month_start(year, month), next_month(year, month))]
+    else:
+        ranges = [(date(year, 1, 1), date(year + 1, 1, 1))]
+    return (
+        Select(TABLE).sum("quantity_sold", "sales").during(ranges)
+        .fuels([fuel] if fuel else None).build()
+    )
+
+
+def workload(year):
+    """(grain, year, month, fuel) for every monthly and yearly chatbot total."""
+    cases = []
+    for fuel in [None] + FUELS:
+        cases.append(("year", year, None, fuel))
+        cases += [("month", year, m, fuel) for m in range(1, 13)]
+    return cases
+
+
+def run(conn, queries, repeat):
+    timings, results = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [conn.execute(*statement(sql, params)).scalar() for sql, params in queries]
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="database URL (default: temporary SQLite file)")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--year", type=int, default=2020)
+    args = parser.parse_args(argv)
+
+    tmp = None
+    if args.url is None:
+        tmp = tempfile.mkdtemp()
+        args.url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    engine = create_engine(args.url)
+    dialect = engine.dialect.name
+
+    start = time.perf_counter()
+    load_table(engine, args.rows)
+    print(f"{dialect}: loaded {args.rows:,} rows in {time.perf_counter() - start:.1f}s")
+
+    cases = workload(args.year)
+    old = [old_query(dialect, *case) for case in cases]
+    new = [new_query(*case) for case in cases]
+
+    with engine.connect() as conn:
+        old_time, old_results = run(conn, old, args.repeat)
+        new_time, new_results = run(conn, new, args.repeat)
+        old_scans = sum(bool(full_scans(conn, sql, params)) for sql, params in old)
+        new_scans = sum(bool(full_scans(conn, sql, params)) for sql, params in new)
+
+    same = all(
+        (a is None and b is None) or abs(float(a) - float(b)) < 1e-6
+        for a, b in zip(old_results, new_results)
+    )
+    shapes = len({sql for sql, _ in new})
+    print(f"{len(cases)} chatbot totals (yearly + 12 monthly, all fuels and per fuel); results match: {same}")
+    print(f"{'YEAR()/MONTH()':<16} {old_time * 1000:9.1f} ms  full scans: {old_scans}/{len(cases)}")
+    print(f"{'half-open range':<16} {new_time * 1000:9.1f} ms  full scans: {new_scans}/{len(cases)}"
+          f"  distinct statements: {shapes}")
+    print(f"speed-up: {old_time / new_time:.1f}x")
+
+    engine.dispose()
+    if tmp:
+        os.remove(os.path.join(tmp, "bench.db"))
+        os.rmdir(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""Concurrent-session load test of the Streamlit pages.
+
+Simulates N browser sessions in one server process, as Streamlit serves
+them: each session is a thread holding its own ``AppTest`` per page, and
+every action is one script rerun. Sessions open pages, change the sidebar
+filters on Sales, Stock and Financial at random, and submit the expense
+form on Data Entry. For each N the harness reports rerun latency
+percentiles per page, throughput, SQL statements per rerun and what the
+connection pool did (new connections, peak checked out, waits)::
+
+    python benchmarks/bench_sessions.py [--sessions 1 2 4 8 16] [--actions 15] [--json sessions.json]
+    python benchmarks/bench_sessions.py --url mysql+pymysql://... --reuse
+
+Without ``--url`` a throwaway SQLite file is filled by
+``synthetic.populate``. Data-entry saves go through the write-behind
+journal (a temporary file) unless ``--sync-writes`` is given. The
+saturation point is the first N after which throughput grows by less
+than 10%.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+PAGES = {
+    "sales": "pages/2_SALES.py",
+    "stock": "pages/3_STOCK.py",
+    "financial": "pages/5_FINANCIAL.py",
+    "entry": "pages/1_DATA ENTRY.py",
+}
+DEFAULT_MIX = "sales=3,stock=2,financial=3,entry=1"
+
+
+# ----------------------------------
+# SESSIONS
+# ----------------------------------
+def share_runtime():
+    """Serve one mock Runtime to every concurrent ``AppTest``.
+
+    ``AppTest.run`` installs a fresh mock Runtime singleton and clears it
+    when the run ends, which pulls it out from under runs still going on
+    other threads. A real server has one Runtime for all sessions.
+    """
+    from unittest.mock import MagicMock
+
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+
+
+def change_filter(at, rng):
+    """Pick one sidebar filter and change it, like a user would."""
+    widgets = [w for w in list(at.sidebar.selectbox) + list(at.sidebar.multiselect) if w.options]
+    if not widgets:
+        return at
+    widget = rng.choice(widgets)
+    if hasattr(widget, "select_index"):
+        widget.select_index(rng.randrange(len(widget.options)))
+    else:
+        widget.set_value(rng.sample(widget.options, rng.randint(1, len(widget.options))))
+    return at
+
+
+def submit_expense(at, rng):
+    form = [t for t in at.text_input if t.label.startswith("Expense Type")][0]
+    form.set_value("Load test")
+    amount = [n for n in at.number_input if n.label.startswith("Expense Amount")][0]
+    amount.set_value(round(rng.uniform(10, 500), 2))
+    [b for b in at.button if b.label == "Save Expense"][0].click()
+    return at
+
+
+class Session(threading.Thread):
+    """One simulated browser session performing ``actions`` reruns."""
+
+    def __init__(self, number, actions, mix, timeout, barrier):
+        super().__init__(name=f"session-{number}", daemon=True)
+        self.rng = random.Random(number)
+        self.actions = actions
+        self.mix = mix
+        self.timeout = timeout
+        self.barrier = barrier
+        self.apps = {}
+        self.samples = []  # (page, action, seconds, error)
+
+    def step(self):
+        from streamlit.testing.v1 import AppTest
+
+        page = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        at = self.apps.get(page)
+        if at is None:
+            action = "open"
+            at = self.apps[page] = AppTest.from_file(PAGES[page], default_timeout=self.timeout)
+        else:
+            action = "submit" if page == "entry" else "filter"
+            try:
+                (submit_expense if page == "entry" else change_filter)(at, self.rng)
+            except IndexError:
+                # The last rerun failed before drawing the form: just rerun.
+                action = "reload"
+
+        start = time.perf_counter()
+        error = None
+        try:
+            at.run()
+            if at.exception:
+                error = str(at.exception[0].value)
+        except Exception as exc:  # a timed-out or crashed rerun is a data point too
+            error = repr(exc)
+        self.samples.append((page, action, time.perf_counter() - start, error))
+
+    def run(self):
+        self.barrier.wait()
+        for _ in range(self.actions):
+            self.step()
+
+
+class PoolSampler(threading.Thread):
+    """Polls the shared pool for the peak number of checked-out connections."""
+
+    def __init__(self, interval=0.005):
+        super().__init__(name="pool-sampler", daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self.peak_overflow = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        from utils.db import get_connection
+        pool = get_connection().pool
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, pool.checkedout())
+            self.peak_overflow = max(self.peak_overflow, pool.overflow())
+            time.sleep(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+# ----------------------------------
+# LEVELS
+# ----------------------------------
+def percentiles(values):
+    if not values:
+        return {"p50": None, "p90": None, "p99": None, "max": None}
+    arr = np.asarray(values) * 1000
+    return {
+        "p50": float(np.percentile(arr, 50)),
+        "p90": float(np.percentile(arr, 90)),
+        "p99": float(np.percentile(arr, 99)),
+        "max": float(arr.max()),
+    }
+
+
+def run_level(n, actions, mix, timeout, meter):
+    from utils.db import _stats, pool_stats
+
+    _stats.reset()
+    meter.reset()
+    barrier = threading.Barrier(n + 1)
+    sessions = [Session(i, actions, mix, timeout, barrier) for i in range(n)]
+    for s in sessions:
+        s.start()
+    sampler = PoolSampler()
+    sampler.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for s in sessions:
+        s.join()
+    wall = time.perf_counter() - start
+    sampler.stop()
+
+    samples = [x for s in sessions for x in s.samples]
+    pool = pool_stats()
+    by_page = {}
+    for page in mix:
+        times = [t for p, action, t, _ in samples if p == page and action != "open"]
+        by_page[page] = {"reruns": len(times), **percentiles(times)}
+    return {
+        "sessions": n,
+        "reruns": len(samples),
+        "errors": sum(1 for *_, e in samples if e),
+        "first_error": next((e for *_, e in samples if e), None),
+        "wall_s": wall,
+        "throughput": len(samples) / wall if wall else None,
+        "latency_ms": percentiles([t for _, _, t, _ in samples]),
+        "pages": by_page,
+        "sql": {
+            "statements_per_rerun": meter.statements / len(samples) if samples else 0,
+            "sql_s": meter.seconds,
+        },
+        "pool": {
+            "connects": pool["connects"],
+            "checkouts": pool["checkouts"],
+            "peak_checked_out": sampler.peak,
+            "peak_overflow": sampler.peak_overflow,
+            "max_wait_s": pool["max_wait_s"],
+            "total_wait_s": pool["total_wait_s"],
+        },
+    }
+
+
+def saturation(levels, gain=0.10):
+    """Sessions at which adding more stopped raising throughput by ``gain``."""
+    for prev, cur in zip(levels, levels[1:]):
+        if cur["throughput"] < prev["throughput"] * (1 + gain):
+            return prev["sessions"]
+    return None
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        page, _, weight = part.partition("=")
+        if page not in PAGES:
+            raise SystemExit(f"unknown page {page!r}; choose from {', '.join(PAGES)}")
+        mix[page] = float(weight or 1)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="database URL (default: temporary SQLite file)")
+    parser.add_argument("--reuse", action="store_true", help="load-test the data already in --url")
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--stations", type=int, default=10)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--actions", type=int, default=15, help="reruns per session per level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"page weights (default {DEFAULT_MIX})")
+    parser.add_argument("--sync-writes", action="store_true", help="save synchronously, not via the journal")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--json", help="write the machine-readable report here")
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    tmp = tempfile.mkdtemp()
+    if args.url is None:
+        args.url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        args.reuse = False
+    # utils.* read their configuration at import time.
+    os.environ["FUEL_DB_URL"] = args.url
+    os.environ["FUEL_JOURNAL_PATH"] = os.path.join(tmp, "journal.db")
+    os.environ["FUEL_WRITE_BEHIND"] = "0" if args.sync_writes else "1"
+    os.chdir(ROOT)
+
+    from benchmarks.bench_pages import SQLMeter
+    from utils.db import POOL_SIZE, MAX_OVERFLOW, dispose_engine, get_connection
+
+    if not args.reuse:
+        from benchmarks.synthetic import populate
+        rows = populate(get_connection(), args.years, args.stations)
+        print(f"generated {', '.join(f'{t}: {n:,}' for t, n in rows.items())}")
+    engine = get_connection()
+    meter = SQLMeter(engine)
+    engine.dispose()
+    share_runtime()
+
+    print(f"pool_size={POOL_SIZE} max_overflow={MAX_OVERFLOW}; {args.actions} reruns per session; mix {args.mix}")
+    print(f"{'N':>4} {'reruns/s':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} "
+          f"{'sql/rerun':>9} {'conns':>6} {'peak out':>8} {'max wait':>9} {'errors':>6}")
+    levels = []
+    for n in args.sessions:
+        level = run_level(n, args.actions, mix, args.timeout, meter)
+        levels.append(level)
+        lat, pool = level["latency_ms"], level["pool"]
+        print(f"{n:>4} {level['throughput']:>9.1f} {lat['p50']:>8.0f} {lat['p90']:>8.0f} {lat['p99']:>8.0f} "
+              f"{level['sql']['statements_per_rerun']:>9.1f} {pool['connects']:>6} {pool['peak_checked_out']:>8} "
+              f"{pool['max_wait_s']:>8.3f}s {level['errors']:>6}")
+        if level["first_error"]:
+            print(f"     first error: {level['first_error'][:100]}")
+
+    knee = saturation(levels)
+    print(f"saturation: {f'{knee} sessions' if knee else 'not reached'}")
+
+    if args.json:
+        report = {
+            "url": engine.url.render_as_string(hide_password=True) if args.reuse else "sqlite (temporary)",
+            "dialect": engine.dialect.name,
+            "python": platform.python_version(),
+            "pool": {"size": POOL_SIZE, "max_overflow": MAX_OVERFLOW},
+            "actions_per_session": args.actions,
+            "mix": mix,
+            "write_behind": not args.sync_writes,
+            "levels": levels,
+            "saturation_sessions": knee,
+        }
+        with open(args.json, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"report written to {args.json}")
+
+    dispose_engine()
+    shutil.rmtree(tmp, ignore_errors=True)
+    return 1 if any(level["errors"] for level in levels) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
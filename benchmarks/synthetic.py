@@ -0,0 +1,187 @@
+"""Synthetic fuel-station history for offline benchmarks.
+
+Prices follow a slow random walk with occasional revisions; demand has a
+trend, a yearly and a weekly pattern (busier summers and weekends) and
+noise, and a small share of days carry no entry at all, as in real logs.
+Everything is seeded, so a given ``(days, seed)`` always yields the same
+history.
+
+``populate`` writes that history at scale into the station tables
+(``fuel_sales``, ``fuel_price``, ``fuel_stock``, ``expenses``), one
+station id per simulated station, and derives ledger balances, the daily
+summary and the fleet roll-up, e.g. ten years for 50 stations::
+
+    python benchmarks/synthetic.py --url sqlite:////tmp/fuel_bench.db --years 10 --stations 50
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from utils import importer, schema, summary  # noqa: E402
+from utils.db import bulk_insert  # noqa: E402
+from utils.ledger import BALANCE_TABLE  # noqa: E402
+from utils.stations import STATIONS_TABLE  # noqa: E402
+
+FUELS = {
+    # fuel: (starting price, base litres/day)
+    "Petrol": (100.0, 1200.0),
+    "Diesel": (90.0, 1100.0),
+}
+WEEKLY = np.array([0.95, 0.92, 0.94, 0.97, 1.05, 1.12, 1.05])  # Monday .. Sunday
+
+
+def daily_sales(days=1095, start=date(2023, 1, 1), seed=7, missing=0.01):
+    """One row per day and fuel: date, fuel_type, quantity_sold, selling_price, total_amount."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=days, freq="D")
+    weekday = WEEKLY[dates.dayofweek.to_numpy()]
+    yearly = 1 + 0.08 * np.sin(2 * np.pi * (dates.dayofyear.to_numpy() - 100) / 365.25)
+    frames = []
+    for fuel, (price0, litres0) in FUELS.items():
+        steps = rng.normal(0, 0.15, days)
+        revisions = rng.random(days) < 0.01
+        steps[revisions] += rng.normal(0, 2.5, revisions.sum())
+        price = np.round(price0 + np.cumsum(steps), 2)
+
+        trend = np.linspace(0, 0.15, days)
+        litres = litres0 * (1 + trend) * weekday * yearly * rng.lognormal(0, 0.08, days)
+        litres = np.round(np.maximum(litres, 0), 3)
+
+        keep = rng.random(days) >= missing
+        frames.append(pd.DataFrame({
+            "date": dates[keep],
+            "fuel_type": fuel,
+            "quantity_sold": litres[keep],
+            "selling_price": price[keep],
+            "total_amount": np.round(litres[keep] * price[keep], 2),
+        }))
+    return pd.concat(frames, ignore_index=True).sort_values(["date", "fuel_type"], ignore_index=True)
+
+
+# ----------------------------------
+# DATABASE FILL
+# ----------------------------------
+def station_frames(years=10, stations=50, start=date(2016, 1, 1), seed=7):
+    """``{table: DataFrame}`` rows for ``stations`` stations over ``years`` years.
+
+    Every station (ids 1..``stations``) has its own sales entry per fuel and
+    day, its own buying prices, tank deliveries and expenses.
+    """
+    days = int(round(years * 365.25))
+    rng = np.random.default_rng(seed + 1)
+    daily = daily_sales(days, start=start, seed=seed)
+    ids = np.arange(1, stations + 1)
+
+    # Each station gets a stable share of the day's demand, plus noise.
+    share = rng.dirichlet(np.full(stations, 8.0))
+    per_station = np.repeat(daily.to_numpy(), stations, axis=0)
+    sales = pd.DataFrame(per_station, columns=daily.columns)
+    sales.insert(0, "station_id", np.tile(ids, len(daily)))
+    noise = rng.lognormal(0, 0.05, len(sales))
+    litres = (sales["quantity_sold"].to_numpy(dtype=float) * np.tile(share, len(daily)) * stations * noise)
+    sales["quantity_sold"] = np.round(litres, 3)
+    sales["selling_price"] = sales["selling_price"].astype(float)
+    sales["total_amount"] = np.round(sales["quantity_sold"] * sales["selling_price"], 2)
+    sales["date"] = pd.to_datetime(sales["date"]).dt.date
+
+    prices = sales[["station_id", "date", "fuel_type", "selling_price"]].copy()
+    prices["buying_price"] = np.round(prices["selling_price"] - rng.uniform(3, 5, len(prices)), 2)
+
+    # Tank deliveries: top up to ~6 days of demand when below ~2 days.
+    stock = []
+    litres_per_day = sales.groupby(["station_id", "fuel_type", "date"])["quantity_sold"].sum()
+    for (station, fuel), series in litres_per_day.groupby(level=["station_id", "fuel_type"]):
+        series = series.droplevel(["station_id", "fuel_type"])
+        mean = series.mean()
+        level = series.iloc[:7].mean() * 6
+        opening = round(float(level), 3)  # seeds the ledger; later rows are posted
+        for day, sold in series.items():
+            received = 0.0
+            if level < mean * 2:
+                received = round(float(mean * 6 - level), 3)
+            stock.append((station, day, fuel, opening, received, 0.0))
+            opening = 0.0
+            level += received - sold
+    stock = pd.DataFrame(
+        stock, columns=["station_id", "date", "fuel_type", "opening_stock", "received_stock", "closing_stock"]
+    )
+
+    dates = pd.date_range(start, periods=days, freq="D")
+    expenses = [pd.DataFrame({
+        "station_id": np.repeat(ids, days), "date": np.tile(dates.date, stations), "expense_type": "EB",
+        "amount": np.round(rng.uniform(400, 900, days * stations), 2),
+    })]
+    month_starts = dates[dates.day == 1]
+    expenses.append(pd.DataFrame({
+        "station_id": np.repeat(ids, len(month_starts)), "date": np.tile(month_starts.date, stations),
+        "expense_type": "Salary", "amount": 45000.0,
+    }))
+    repairs = rng.poisson(0.02, (stations, days))
+    expenses.append(pd.DataFrame({
+        "station_id": np.repeat(np.repeat(ids, days), repairs.ravel()),
+        "date": np.tile(dates.date, stations).repeat(repairs.ravel()),
+        "expense_type": "Maintenance",
+        "amount": np.round(rng.uniform(2000, 25000, repairs.sum()), 2),
+    }))
+    expenses = pd.concat(expenses, ignore_index=True).sort_values(["date", "station_id"], ignore_index=True)
+
+    return {
+        "fuel_sales": sales[["station_id", "date", "fuel_type", "quantity_sold", "selling_price", "total_amount"]],
+        "fuel_price": prices[["station_id", "date", "fuel_type", "buying_price"]],
+        "fuel_stock": stock,
+        "expenses": expenses,
+    }
+
+
+def populate(engine, years=10, stations=50, start=date(2016, 1, 1), seed=7, chunk=50_000):
+    """Replace the station tables' rows with synthetic data; returns row counts.
+
+    Registers stations 1..``stations``, bulk-inserts rows in ``chunk``-row
+    batches, then derives the ledger, ``daily_fuel_summary`` and the fleet
+    roll-up for the whole range, as after an import.
+    """
+    schema.migrate(engine)
+    frames = station_frames(years, stations, start, seed)
+    end = max(df["date"].max() for df in frames.values())
+    registry = pd.DataFrame({"station_id": range(1, stations + 1)})
+    registry["name"] = [f"Station {i}" for i in registry["station_id"]]
+    with engine.begin() as conn:
+        for table in (*frames, summary.SUMMARY_TABLE, summary.FLEET_TABLE, BALANCE_TABLE, STATIONS_TABLE):
+            conn.exec_driver_sql(f"DELETE FROM {table}")
+        bulk_insert(conn, STATIONS_TABLE, registry)
+        for table, df in frames.items():
+            for lo in range(0, len(df), chunk):
+                bulk_insert(conn, table, df.iloc[lo:lo + chunk])
+        importer.derive(conn, {"sales", "stock"}, start, end, registry["station_id"])
+    return {table: len(df) for table, df in frames.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill the station tables with synthetic history.")
+    parser.add_argument("--url", required=True, help="database URL to fill (existing rows are replaced)")
+    parser.add_argument("--years", type=float, default=10)
+    parser.add_argument("--stations", type=int, default=50)
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2016, 1, 1))
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    from sqlalchemy import create_engine
+
+    engine = create_engine(args.url)
+    started = time.perf_counter()
+    counts = populate(engine, args.years, args.stations, args.start, args.seed)
+    engine.dispose()
+    print(", ".join(f"{table}: {n:,}" for table, n in counts.items()))
+    print(f"generated in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
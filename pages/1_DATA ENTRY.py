@@ -4,14 +4,138 @@ import os
 # This automatically finds the project root (NO hardcoded path)
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+import pandas as pd
 import streamlit as st
-from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 from utils.db import get_connection
+from utils import importer, journal, ledger, repository, stations
 
 st.set_page_config(layout="wide")
 st.title("📥 Daily Operations – Data Entry")
 
-engine = get_connection()
+
+def render_footer():
+    st.markdown("---")
+    st.markdown(
+        "<div style='text-align:center; opacity:0.6; font-size:14px;'>"
+        "© 2026 Fuel Station Operations Platform — All Rights Reserved<br>"
+        "Version: v0.1.0-beta"
+        "</div>",
+        unsafe_allow_html=True
+    )
+
+
+# Saves are queued on the local write-behind journal (utils/journal.py)
+# and synced to the database in the background.
+if journal.ENABLED:
+    sync = journal.get_journal().counts()
+    st.caption(f"🔄 Sync queue: {sync['pending']} pending · {sync['failed']} failed")
+    if sync["failed"]:
+        with st.expander(f"⚠️ {sync['failed']} entries failed to sync", expanded=True):
+            st.dataframe(pd.DataFrame(journal.get_journal().failures()), hide_index=True, use_container_width=True)
+            if st.button("Retry failed entries"):
+                journal.get_journal().retry_failed()
+                st.rerun()
+
+# Entries are recorded against one station; the picker only shows for chains.
+try:
+    station_choices, station_index = stations.picker(repository.load_stations(), fleet=False)
+except SQLAlchemyError:
+    station_choices, station_index = {str(stations.DEFAULT_STATION): stations.DEFAULT_STATION}, 0
+station = station_choices[
+    st.selectbox("Station", list(station_choices), index=station_index)
+    if len(station_choices) > 1 else list(station_choices)[station_index]
+]
+
+entry_mode = st.radio("Entry Mode", ["Single entry", "Shift close (grid)"], horizontal=True)
+
+# ===============================
+# 🧾 SHIFT CLOSE – GRID ENTRY
+# ===============================
+# Every row is validated before anything is written; the whole shift is
+# then saved in one transaction with one targeted cache invalidation.
+if entry_mode == "Shift close (grid)":
+    st.subheader("🧾 Shift Close – Grid Entry")
+    st.caption("Enter every fuel, tanker receipt and expense for the shift, then save them together.")
+
+    if "grid_version" not in st.session_state:
+        st.session_state.grid_version = 0
+    if "grid_saved" in st.session_state:
+        st.success(st.session_state.pop("grid_saved"))
+    version = st.session_state.grid_version
+
+    grid_date = st.date_input("Shift Date", key="grid_date")
+    fuels = list(importer.FUEL_TYPES)
+    fuel_column = st.column_config.SelectboxColumn("Fuel Type", options=fuels, required=True)
+
+    st.markdown("**⛽ Sales & Buying Prices**")
+    sales_grid = st.data_editor(
+        pd.DataFrame({"fuel_type": fuels, "quantity_sold": 0.0, "selling_price": 0.0, "buying_price": 0.0}),
+        column_config={
+            "fuel_type": fuel_column,
+            "quantity_sold": st.column_config.NumberColumn("Quantity Sold (L)", min_value=0.0, step=1.0),
+            "selling_price": st.column_config.NumberColumn("Selling Price (₹/L)", min_value=0.0, step=0.1),
+            "buying_price": st.column_config.NumberColumn("Buying Price (₹/L)", min_value=0.0, step=0.1),
+        },
+        num_rows="dynamic", hide_index=True, use_container_width=True, key=f"grid_sales_{version}",
+    )
+
+    st.markdown("**📦 Tanker Receipts**")
+    stock_grid = st.data_editor(
+        pd.DataFrame({"fuel_type": pd.Series(dtype=str), "received_stock": pd.Series(dtype=float)}),
+        column_config={
+            "fuel_type": fuel_column,
+            "received_stock": st.column_config.NumberColumn("Received Stock (L)", min_value=0.0, step=1.0),
+        },
+        num_rows="dynamic", hide_index=True, use_container_width=True, key=f"grid_stock_{version}",
+    )
+
+    st.markdown("**💸 Expenses**")
+    expense_grid = st.data_editor(
+        pd.DataFrame({"expense_type": pd.Series(dtype=str), "amount": pd.Series(dtype=float)}),
+        column_config={
+            "expense_type": st.column_config.TextColumn("Expense Type"),
+            "amount": st.column_config.NumberColumn("Amount (₹)", min_value=0.0, step=10.0),
+        },
+        num_rows="dynamic", hide_index=True, use_container_width=True, key=f"grid_expenses_{version}",
+    )
+
+    if st.button("Save Shift", type="primary"):
+        # Rows left at zero / blank are not part of the shift.
+        grids = {
+            "sales": sales_grid[sales_grid["quantity_sold"].fillna(0) > 0],
+            "stock": stock_grid[stock_grid["received_stock"].fillna(0) > 0],
+            "expenses": expense_grid[
+                expense_grid["expense_type"].fillna("").str.strip().ne("") | expense_grid["amount"].fillna(0).gt(0)
+            ],
+        }
+        labels = {"sales": "Sales", "stock": "Receipts", "expenses": "Expenses"}
+
+        batch, problems = {}, []
+        for kind, grid in grids.items():
+            rows, errors = importer.validate(
+                grid.reset_index(drop=True).assign(date=pd.Timestamp(grid_date)), kind, first_row=1,
+                station=station,
+            )
+            batch[kind] = rows
+            problems += [f"{labels[kind]} row {row}: {message}" for row, message in errors]
+
+        if problems:
+            st.warning("⚠️ Nothing was saved. Fix these rows first:\n\n" + "\n".join(f"- {p}" for p in problems))
+        elif not any(len(rows) for rows in batch.values()):
+            st.warning("⚠️ Nothing to save")
+        else:
+            written = sum(len(rows) for rows in batch.values())
+            journal.submit(batch)
+            st.session_state.grid_saved = (
+                f"✅ Shift queued: {written} rows (applied in one transaction once the journal syncs)"
+                if journal.ENABLED else f"✅ Shift saved: {written} rows (applied in one transaction)"
+            )
+            st.session_state.grid_version += 1
+            st.rerun()
+
+    render_footer()
+    st.stop()
 
 # ===============================
 # 📦 STOCK ENTRY (AUTO OPENING STOCK)
@@ -25,44 +149,31 @@ st.subheader("📦 Fuel Stock Entry")
 stock_date = st.date_input("Stock Date", key="stock_date")
 stock_fuel_type = st.selectbox("Fuel Type", ["Petrol", "Diesel"], key="stock_fuel")
 
-# Get opening stock from last day
-with engine.connect() as conn:
-    result = conn.execute(
-        text("""
-            SELECT closing_stock
-            FROM vw_fuel_stock
-            WHERE fuel_type = :fuel
-              AND date < :date
-            ORDER BY date DESC
-            LIMIT 1
-        """),
-        {"fuel": stock_fuel_type, "date": stock_date}
-    ).fetchone()
-
-if result:
-    opening_stock = result[0]
-    st.success(f"Opening Stock (Auto): {opening_stock} Litres")
+# Get opening stock from the ledger's latest balance
+try:
+    with get_connection().connect() as conn:
+        opening_stock = ledger.opening_stock(conn, station, stock_fuel_type, stock_date)
+except SQLAlchemyError:
+    st.warning("⚠️ Database unreachable – opening stock will be posted when the entry syncs.")
 else:
-    opening_stock = 0
-    st.warning("⚠️ No previous stock data found. Opening stock set to 0.")
+    if journal.ENABLED and sync["pending"]:
+        # Queued entries are not in the ledger yet; it posts the true figure on sync.
+        st.info(f"Opening Stock (Auto): {opening_stock} Litres, before {sync['pending']} queued entries sync")
+    elif opening_stock:
+        st.success(f"Opening Stock (Auto): {opening_stock} Litres")
+    else:
+        st.warning("⚠️ No previous stock data found. Opening stock set to 0.")
 
 with st.form("fuel_stock_form"):
     received_stock = st.number_input("Received Stock (Litres)", min_value=0.0, step=1.0)
     save_stock = st.form_submit_button("Save Stock Details")
 
 if save_stock:
-    with engine.connect() as conn:
-        conn.execute(
-            text("""
-                INSERT INTO fuel_stock (date, fuel_type, opening_stock, received_stock, closing_stock)
-                VALUES (:date, :fuel, :opening, :received, 0)
-            """),
-            {"date": stock_date, "fuel": stock_fuel_type, "opening": opening_stock, "received": received_stock}
-        )
-        conn.commit()
-
-    st.cache_data.clear()
-    st.success("✅ Stock saved successfully")
+    # Opening/closing stock are posted by the ledger when the entry syncs.
+    journal.submit({"stock": pd.DataFrame([
+        {"station_id": station, "date": stock_date, "fuel_type": stock_fuel_type, "received_stock": received_stock}
+    ])})
+    st.success("✅ Stock queued: saved once the journal syncs" if journal.ENABLED else "✅ Stock saved successfully")
 
 st.markdown("---")
 
@@ -88,38 +199,15 @@ with st.form("fuel_sales_form"):
 
 if save_sales:
     if quantity_sold > 0 and selling_price > 0 and buying_price > 0:
-        with engine.connect() as conn:
-
-            # Insert sales transaction
-            conn.execute(
-                text("""
-                    INSERT INTO fuel_sales (date, fuel_type, quantity_sold, selling_price, total_amount)
-                    VALUES (:date, :fuel, :qty, :price, :total)
-                """),
-                {
-                    "date": sale_date,
-                    "fuel": fuel_type,
-                    "qty": quantity_sold,
-                    "price": selling_price,
-                    "total": quantity_sold * selling_price
-                }
-            )
-
-            # Insert or update daily buying price
-            conn.execute(
-                text("""
-                    INSERT INTO fuel_price (date, fuel_type, buying_price)
-                    VALUES (:date, :fuel, :buy)
-                    AS new
-                    ON DUPLICATE KEY UPDATE buying_price = new.buying_price
-                """),
-                {"date": sale_date, "fuel": fuel_type, "buy": buying_price}
-            )
-
-            conn.commit()
-
-        st.cache_data.clear()
-        st.success("✅ Fuel sales & buying price saved successfully")
+        # Sales transaction + daily buying price (upserted) in one journal entry
+        journal.submit({"sales": pd.DataFrame([
+            {"station_id": station, "date": sale_date, "fuel_type": fuel_type, "quantity_sold": quantity_sold,
+             "selling_price": selling_price, "buying_price": buying_price}
+        ])})
+        st.success(
+            "✅ Fuel sales & buying price queued: saved once the journal syncs"
+            if journal.ENABLED else "✅ Fuel sales & buying price saved successfully"
+        )
     else:
         st.warning("⚠️ Quantity, selling price and buying price must be greater than zero")
 
@@ -139,30 +227,15 @@ with st.form("expense_form"):
 
 if save_expense:
     if expense_type.strip() and expense_amount > 0:
-        with engine.connect() as conn:
-            conn.execute(
-                text("""
-                    INSERT INTO expenses (date, expense_type, amount)
-                    VALUES (:date, :type, :amount)
-                """),
-                {"date": expense_date, "type": expense_type, "amount": expense_amount}
-            )
-            conn.commit()
-
-        st.cache_data.clear()
-        st.success("✅ Expense saved successfully")
+        journal.submit({"expenses": pd.DataFrame([
+            {"station_id": station, "date": expense_date, "expense_type": expense_type, "amount": expense_amount}
+        ])})
+        st.success("✅ Expense queued: saved once the journal syncs" if journal.ENABLED else "✅ Expense saved successfully")
     else:
         st.warning("⚠️ Enter valid expense type and amount")
 
     # ============================================
 # FOOTER
 # ============================================
-st.markdown("---")
-st.markdown(
-    "<div style='text-align:center; opacity:0.6; font-size:14px;'>"
-    "© 2026 Fuel Station Operations Platform — All Rights Reserved<br>"
-    "Version: v0.1.0-beta"
-    "</div>",
-    unsafe_allow_html=True
-)
+render_footer()
 
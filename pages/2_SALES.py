@@ -5,8 +5,8 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import streamlit as st
-import pandas as pd
-from utils.db import get_connection
+from utils import charts, loader, paging, repository, stations
+from utils.periods import MONTH_NAMES, month_ranges
 
 
 st.set_page_config(layout="wide")
@@ -15,21 +15,24 @@ st.title("📊 Sales Dashboard")
 st.info("Displays fuel sales performance and revenue trends.")
 
 # ----------------------------------
-# DATABASE CONNECTION
+# FILTER OPTIONS (CACHED, DISTINCT PERIODS ONLY)
 # ----------------------------------
-engine = get_connection()
-
-sales_df = pd.read_sql("SELECT * FROM vw_fuel_sales", engine)
-income_df = pd.read_sql("SELECT * FROM vw_income_summary", engine)
+# Station scope: one station, or the whole fleet (shown for chains only).
+station_choices, station_index = stations.picker(repository.load_stations())
+station = station_choices[
+    st.sidebar.selectbox("Station", list(station_choices), index=station_index)
+    if len(station_choices) > 1 else list(station_choices)[station_index]
+]
 
-sales_df["date"] = pd.to_datetime(sales_df["date"])
-income_df["date"] = pd.to_datetime(income_df["date"])
+options = loader.load({
+    "periods": loader.query(repository.load_periods, "daily_fuel_summary", station),
+    "fuel_types": loader.query(repository.load_fuel_types, "daily_fuel_summary", station),
+})
+periods_df, fuel_types = options["periods"], options["fuel_types"]
 
-# ----------------------------------
-# MONTH HELPERS
-# ----------------------------------
-sales_df["month_name"] = sales_df["date"].dt.month_name()
-sales_df["month_num"] = sales_df["date"].dt.month
+if periods_df.empty:
+    st.warning("⚠️ No sales data available yet.")
+    st.stop()
 
 # ----------------------------------
 # SIDEBAR FILTERS
@@ -38,14 +41,13 @@ st.sidebar.header("🔍 Filters")
 
 year = st.sidebar.selectbox(
     "Select Year",
-    sorted(sales_df["date"].dt.year.unique())
+    sorted(periods_df["year"].unique())
 )
 
-available_months = (
-    sales_df[sales_df["date"].dt.year == year]
-    .sort_values("month_num")["month_name"]
-    .unique()
-)
+available_months = [
+    MONTH_NAMES[m - 1]
+    for m in periods_df.loc[periods_df["year"] == year, "month"]
+]
 
 selected_months = st.sidebar.multiselect(
     "Select Month",
@@ -59,23 +61,20 @@ if not selected_months:
 
 fuel = st.sidebar.multiselect(
     "Fuel Type",
-    sales_df["fuel_type"].unique(),
-    default=sales_df["fuel_type"].unique()
+    fuel_types,
+    default=fuel_types
 )
 
 # ----------------------------------
-# FILTER DATA
+# LOAD SELECTED WINDOW ONLY (FILTERS RUN IN SQL, DATASETS IN PARALLEL)
 # ----------------------------------
-filtered_sales = sales_df[
-    (sales_df["date"].dt.year == year) &
-    (sales_df["month_name"].isin(selected_months)) &
-    (sales_df["fuel_type"].isin(fuel))
-]
+date_ranges = month_ranges(int(year), selected_months)
 
-filtered_income = income_df[
-    (income_df["date"].dt.year == year) &
-    (income_df["date"].dt.month_name().isin(selected_months))
-]
+data = loader.load({
+    "sales": loader.query(repository.load_sales, date_ranges, fuel, station),
+    "income": loader.query(repository.load_income, date_ranges, station),
+})
+filtered_sales, filtered_income = data["sales"], data["income"]
 
 # ----------------------------------
 # KPIs
@@ -101,17 +100,23 @@ with col3:
     )
 
 # ----------------------------------
-# SALES TREND (SEPARATE LINE PER FUEL)
+# SALES TREND (ONE LINE PER FUEL, DOWNSAMPLED)
 # ----------------------------------
 st.subheader("📈 Fuel Sales Trend")
 
-for f in fuel:
-    temp = filtered_sales[filtered_sales["fuel_type"] == f]
-    if not temp.empty:
-        st.line_chart(
-            temp.groupby("date")["quantity_sold"].sum(),
-            use_container_width=True
-        )
+sales_trend = (
+    filtered_sales
+    .groupby(["date", "fuel_type"], observed=True)["quantity_sold"]
+    .sum()
+    .unstack("fuel_type")
+)
+
+sales_span = charts.span(sales_trend)
+sales_window = st.slider("Zoom", *sales_span, value=sales_span, key="sales_zoom") if sales_span else None
+st.plotly_chart(
+    charts.time_series(sales_trend, sales_window, y_title="Litres"),
+    use_container_width=True
+)
 
 # ----------------------------------
 # FUEL-WISE SALES BAR CHART
@@ -133,8 +138,26 @@ if not fuel_summary.empty:
 # ----------------------------------
 st.markdown("---")
 
-with st.expander("📄 View Raw Sales Data"):
-    st.dataframe(
-        filtered_sales.sort_values("date"),
-        use_container_width=True
+if st.toggle("📄 View Raw Sales Data", key="raw_sales"):
+    size_col, order_col = st.columns(2)
+    size = size_col.selectbox(
+        "Rows per page", paging.PAGE_SIZES,
+        index=paging.PAGE_SIZES.index(paging.DEFAULT_PAGE_SIZE), key="raw_sales_size"
+    )
+    newest_first = order_col.toggle("Newest first", key="raw_sales_newest")
+
+    # One page per rerun, paged and sorted in SQL (see repository.load_raw_page).
+    pager = st.session_state.setdefault("raw_sales_pager", paging.Pager())
+    pager.scope(date_ranges, fuel, station, size, newest_first)
+    raw_rows, next_cursor = repository.load_raw_page(
+        "sales", date_ranges, fuel, station, pager.cursor, size, newest_first
+    )
+    st.dataframe(raw_rows, hide_index=True, use_container_width=True)
+
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    prev_col.button("◀ Previous", key="raw_sales_prev", on_click=pager.back, disabled=pager.page == 1)
+    page_col.caption(f"Page {pager.page} · {len(raw_rows)} rows")
+    next_col.button(
+        "Next ▶", key="raw_sales_next", on_click=pager.forward, args=(next_cursor,),
+        disabled=next_cursor is None
     )
@@ -5,25 +5,22 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import streamlit as st
-import pandas as pd
-from utils.db import get_connection
+from utils import charts, loader, paging, repository, stations
+from utils.periods import MONTH_NAMES, month_ranges
 
 st.set_page_config(layout="wide")
 
 st.title("📦 Stock Dashboard")
 
-engine = get_connection()
-
 # --------------------------------------------------
-# LOAD STOCK DATA
+# LOAD FILTER OPTIONS (DISTINCT PERIODS ONLY)
 # --------------------------------------------------
-stock_df = pd.read_sql("SELECT * FROM vw_fuel_stock", engine)
-stock_df['date'] = pd.to_datetime(stock_df['date'])
-
-# Helpers
-stock_df['year'] = stock_df['date'].dt.year
-stock_df['month_name'] = stock_df['date'].dt.month_name()
-stock_df['month_num'] = stock_df['date'].dt.month
+# Station scope: one station, or the whole fleet (shown for chains only).
+station_choices, station_index = stations.picker(repository.load_stations())
+station = station_choices[
+    st.sidebar.selectbox("Station", list(station_choices), index=station_index)
+    if len(station_choices) > 1 else list(station_choices)[station_index]
+]
 
 # --------------------------------------------------
 # SIDEBAR FILTERS (Fuel applies to whole page)
@@ -40,17 +37,17 @@ fuel_type = st.sidebar.selectbox(
 # ==================================================
 st.subheader("🟦 Current Stock Snapshot (Latest Data)")
 
-latest_stock_df = (
-    stock_df[stock_df['fuel_type'] == fuel_type]
-    .sort_values("date", ascending=False)
-)
+# Filter options and the latest balance come from different tables: load both at once.
+data = loader.load({
+    "periods": loader.query(repository.load_periods, "fuel_stock", station),
+    "latest": loader.query(repository.load_latest_stock, fuel_type, station),
+})
+periods_df, latest_row = data["periods"], data["latest"]
 
-if latest_stock_df.empty:
+if latest_row is None:
     st.error("❌ No stock data available.")
     st.stop()
 
-latest_row = latest_stock_df.iloc[0]
-
 current_stock = int(latest_row['closing_stock'])
 last_updated = latest_row['date'].strftime("%Y-%m-%d")
 
@@ -91,14 +88,13 @@ st.subheader("🟨 Historical Stock Analysis")
 # --------------------------------------------------
 year = st.sidebar.selectbox(
     "Select Year",
-    sorted(stock_df['year'].unique())
+    sorted(periods_df['year'].unique())
 )
 
-available_months = (
-    stock_df[stock_df['year'] == year]
-    .sort_values('month_num')['month_name']
-    .unique()
-)
+available_months = [
+    MONTH_NAMES[m - 1]
+    for m in periods_df.loc[periods_df['year'] == year, 'month']
+]
 
 selected_months = st.sidebar.multiselect(
     "Select Month",
@@ -111,13 +107,14 @@ if not selected_months:
     selected_months = available_months
 
 # --------------------------------------------------
-# APPLY FILTERS FOR ANALYSIS
+# LOAD SELECTED WINDOW ONLY (FILTERS RUN IN SQL)
 # --------------------------------------------------
-filtered_stock = stock_df[
-    (stock_df['fuel_type'] == fuel_type) &
-    (stock_df['year'] == year) &
-    (stock_df['month_name'].isin(selected_months))
-]
+date_ranges = month_ranges(int(year), selected_months)
+filtered_stock = repository.load_stock(
+    date_ranges,
+    [fuel_type],
+    station,
+)
 
 if filtered_stock.empty:
     st.warning("⚠️ No stock data available for the selected filters.")
@@ -128,10 +125,12 @@ if filtered_stock.empty:
 # --------------------------------------------------
 st.subheader("📈 Stock Level Trend")
 
-st.line_chart(
-    filtered_stock
-    .sort_values("date")
-    .set_index("date")["closing_stock"],
+stock_trend = filtered_stock.set_index("date")["closing_stock"].rename(fuel_type)
+
+stock_span = charts.span(stock_trend)
+stock_window = st.slider("Zoom", *stock_span, value=stock_span, key="stock_zoom") if stock_span else None
+st.plotly_chart(
+    charts.time_series(stock_trend, stock_window, y_title="Litres"),
     use_container_width=True
 )
 
@@ -140,9 +139,26 @@ st.line_chart(
 # --------------------------------------------------
 st.markdown("---")
 
-with st.expander("📄 View Stock Data"):
-    st.dataframe(
-        filtered_stock
-        .sort_values("date", ascending=False),
-        use_container_width=True
-    )
\ No newline at end of file
+if st.toggle("📄 View Stock Data", key="raw_stock"):
+    size_col, order_col = st.columns(2)
+    size = size_col.selectbox(
+        "Rows per page", paging.PAGE_SIZES,
+        index=paging.PAGE_SIZES.index(paging.DEFAULT_PAGE_SIZE), key="raw_stock_size"
+    )
+    newest_first = order_col.toggle("Newest first", key="raw_stock_newest")
+
+    # One page per rerun, paged and sorted in SQL (see repository.load_raw_page).
+    pager = st.session_state.setdefault("raw_stock_pager", paging.Pager())
+    pager.scope(date_ranges, [fuel_type], station, size, newest_first)
+    raw_rows, next_cursor = repository.load_raw_page(
+        "stock", date_ranges, [fuel_type], station, pager.cursor, size, newest_first
+    )
+    st.dataframe(raw_rows, hide_index=True, use_container_width=True)
+
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    prev_col.button("◀ Previous", key="raw_stock_prev", on_click=pager.back, disabled=pager.page == 1)
+    page_col.caption(f"Page {pager.page} · {len(raw_rows)} rows")
+    next_col.button(
+        "Next ▶", key="raw_stock_next", on_click=pager.forward, args=(next_cursor,),
+        disabled=next_cursor is None
+    )
\ No newline at end of file
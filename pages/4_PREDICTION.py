@@ -6,64 +6,61 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import streamlit as st
 import pandas as pd
-from utils.db import get_connection
+from utils import charts, repository, stations
+from utils.forecast import get_forecaster, recommend
 
 st.set_page_config(layout="wide")
 
 st.title("🔮 Fuel Price & Stock Prediction")
-st.caption("Data-driven prediction using historical sales and price trends")
+st.caption("Holt / Holt-Winters forecasts of daily price and demand, with prediction intervals")
 
 # --------------------------------------------------
-# LOAD DATA FROM MYSQL (ALWAYS FRESH)
+# USER INPUT
 # --------------------------------------------------
-engine = get_connection()
-
-price_df = pd.read_sql("""
-    SELECT date, fuel_type, selling_price
-    FROM fuel_sales
-    ORDER BY date
-""", engine)
+# Station scope: one station, or the whole fleet (shown for chains only).
+station_choices, station_index = stations.picker(repository.load_stations())
+station = station_choices[
+    st.sidebar.selectbox("Station", list(station_choices), index=station_index)
+    if len(station_choices) > 1 else list(station_choices)[station_index]
+]
 
-sales_df = pd.read_sql("""
-    SELECT date, fuel_type, quantity_sold
-    FROM fuel_sales
-    ORDER BY date
-""", engine)
+fuel = st.selectbox("Select Fuel Type", ["Petrol", "Diesel"])
 
-price_df["date"] = pd.to_datetime(price_df["date"])
-sales_df["date"] = pd.to_datetime(sales_df["date"])
+col1, col2 = st.columns(2)
+horizon = col1.slider("Forecast Horizon (days)", min_value=1, max_value=30, value=7)
+interval = col2.select_slider(
+    "Prediction Interval", options=[0.8, 0.9, 0.95], value=0.95, format_func=lambda v: f"{v:.0%}"
+)
 
 # --------------------------------------------------
-# USER INPUT
+# LOAD DATA (DAILY SERIES; FITTED MODELS CACHED PER PROCESS)
 # --------------------------------------------------
-fuel = st.selectbox("Select Fuel Type", ["Petrol", "Diesel"])
+forecaster = get_forecaster()
+daily = forecaster.daily(fuel, station)
 
-fuel_price_df = price_df[price_df["fuel_type"] == fuel].copy()
-fuel_sales_df = sales_df[sales_df["fuel_type"] == fuel].copy()
-
-if len(fuel_price_df) < 30 or len(fuel_sales_df) < 30:
+if daily["price"].count() < 30 or daily["demand"].count() < 30:
     st.warning("⚠️ Not enough historical data for prediction.")
     st.stop()
 
-# --------------------------------------------------
-# PRICE PREDICTION (TREND-BASED)
-# --------------------------------------------------
-fuel_price_df = fuel_price_df.sort_values("date")
+price_model = forecaster.model(fuel, "price", daily, station)
+demand_model = forecaster.model(fuel, "demand", daily, station)
 
-fuel_price_df["ma_7"] = fuel_price_df["selling_price"].rolling(7).mean()
-fuel_price_df["ma_30"] = fuel_price_df["selling_price"].rolling(30).mean()
+# Demand is forecast at least a week out for the purchase recommendation.
+price_fc = price_model.forecast(horizon, interval)
+demand_fc = demand_model.forecast(max(horizon, 7), interval).clip(lower=0)
 
-latest_price = fuel_price_df.iloc[-1]["selling_price"]
-avg_price = fuel_price_df["selling_price"].mean()
-
-# Recent trend (last 7 days)
-recent_trend = fuel_price_df["selling_price"].diff().tail(7).mean()
-predicted_price = latest_price + recent_trend
+# --------------------------------------------------
+# PRICE PREDICTION
+# --------------------------------------------------
+latest_price = daily["price"].dropna().iloc[-1]
+avg_price = daily["price"].mean()
+predicted_price = price_fc["forecast"].iloc[0]
+horizon_price = price_fc.iloc[-1]
 
 # --------------------------------------------------
 # DISPLAY PRICE METRICS
 # --------------------------------------------------
-col1, col2, col3 = st.columns(3)
+col1, col2, col3, col4 = st.columns(4)
 
 with col1:
     st.metric("Current Price (₹)", f"{latest_price:.2f}")
@@ -74,27 +71,33 @@ with col2:
 with col3:
     st.metric("Predicted Tomorrow Price (₹)", f"{predicted_price:.2f}")
 
+with col4:
+    st.metric(
+        f"Predicted Price in {horizon} Days (₹)", f"{horizon_price['forecast']:.2f}",
+        help=f"{interval:.0%} interval: {horizon_price['lower']:.2f} – {horizon_price['upper']:.2f}",
+    )
+
 # --------------------------------------------------
-# DEMAND ANALYSIS (FROM SALES DATA)
+# DEMAND ANALYSIS (FROM DAILY SALES)
 # --------------------------------------------------
-fuel_sales_df = fuel_sales_df.sort_values("date")
-
-avg_daily_sales = fuel_sales_df["quantity_sold"].tail(30).mean()
-recent_sales = fuel_sales_df["quantity_sold"].tail(7).mean()
+avg_daily_sales = daily["demand"].tail(30).mean()
+recent_sales = daily["demand"].tail(7).mean()
+expected_week = demand_fc["forecast"].head(7).sum()
+advice = recommend(predicted_price, avg_price, recent_sales, avg_daily_sales)
 
 # --------------------------------------------------
 # STOCK PURCHASE RECOMMENDATION
 # --------------------------------------------------
 st.subheader("📦 Stock Purchase Recommendation")
 
-if predicted_price < avg_price * 0.98 and recent_sales >= avg_daily_sales:
+if advice == "more":
     st.success("🟢 BUY MORE STOCK")
     st.write(
         f"Price is predicted to be lower than average and demand is high.\n\n"
-        f"Recommended Purchase: **High quantity** (~{int(avg_daily_sales * 7)} litres)"
+        f"Recommended Purchase: **High quantity** (~{int(expected_week)} litres, forecast demand for the next 7 days)"
     )
 
-elif predicted_price > avg_price * 1.02:
+elif advice == "minimum":
     st.error("🔴 BUY MINIMUM STOCK")
     st.write(
         "Price is predicted to be higher than usual.\n\n"
@@ -105,7 +108,7 @@ else:
     st.warning("🟡 NORMAL PURCHASE")
     st.write(
         "Price and demand are stable.\n\n"
-        f"Recommended Purchase: **Routine quantity** (~{int(avg_daily_sales * 5)} litres)"
+        f"Recommended Purchase: **Routine quantity** (~{int(demand_fc['forecast'].head(5).sum())} litres)"
     )
 
 # --------------------------------------------------
@@ -135,21 +138,52 @@ else:
     )
 
 # --------------------------------------------------
-# PRICE TREND VISUALIZATION
+# FORECAST VISUALIZATION
 # --------------------------------------------------
-st.subheader("📈 Recent Price Trend")
+def forecast_chart(actual, fc):
+    """Full history of ``actual`` followed by the forecast and its interval."""
+    return pd.concat([
+        actual.rename("Actual").to_frame(),
+        fc.rename(columns={"forecast": "Forecast", "lower": "Lower", "upper": "Upper"}),
+    ])
+
+
+price_chart = forecast_chart(daily["price"], price_fc)
+demand_chart = forecast_chart(daily["demand"], demand_fc.head(horizon))
+
+# The whole history is drawn (downsampled); the zoom opens on the last 30 days.
+history_span = charts.span(price_chart)
+history_window = None
+if history_span:
+    recent = max(history_span[0], (daily.index.max() - pd.Timedelta(days=29)).date())
+    history_window = st.slider("Zoom", *history_span, value=(recent, history_span[1]), key="forecast_zoom")
+
+st.subheader("📈 Price Trend & Forecast")
+st.plotly_chart(
+    charts.time_series(price_chart, history_window, y_title="₹ / litre", dashed=("Lower", "Upper")),
+    use_container_width=True
+)
+
+st.subheader("⛽ Demand Trend & Forecast (Litres/Day)")
+st.plotly_chart(
+    charts.time_series(demand_chart, history_window, y_title="Litres", dashed=("Lower", "Upper")),
+    use_container_width=True
+)
 
-plot_df = fuel_price_df.tail(30).set_index("date")[["selling_price"]]
-st.line_chart(plot_df, use_container_width=True)
+with st.expander("📋 Forecast table"):
+    table = price_fc.join(demand_fc.head(horizon), lsuffix="_price", rsuffix="_demand")
+    st.dataframe(table.round(2), use_container_width=True)
 
 # --------------------------------------------------
 # EXPLANATION
 # --------------------------------------------------
 with st.expander("ℹ️ How this prediction works"):
-    st.write("""
-    - Predictions are based on recent historical trends.
-    - Moving averages smooth short-term fluctuations.
-    - Demand is inferred from actual fuel sales data.
+    st.write(f"""
+    - Sales are aggregated to one value per day: average selling price and litres sold.
+    - Price model: **{price_model.name}** (α={price_model.alpha:.2f}, β={price_model.beta:.3f}, γ={price_model.gamma:.2f}).
+    - Demand model: **{demand_model.name}** (α={demand_model.alpha:.2f}, β={demand_model.beta:.3f}, γ={demand_model.gamma:.2f}).
+    - The model (trend only, or trend + weekly pattern) is chosen automatically by AIC.
+    - Bands show the {interval:.0%} prediction interval; they widen with the horizon.
     - The system supports **decision-making**, not exact forecasting.
     """)
 # ============================================
@@ -5,8 +5,8 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import streamlit as st
-import pandas as pd
-from utils.db import get_connection
+from utils import charts, loader, paging, repository, stations
+from utils.periods import MONTH_NAMES, MONTH_NUMBERS, month_ranges
 
 st.set_page_config(layout="wide")
 
@@ -17,30 +17,27 @@ st.info(
 )
 
 # --------------------------------------------------
-# LOAD DATA (ALWAYS FRESH)
+# LOAD FILTER OPTIONS (DISTINCT PERIODS ONLY)
 # --------------------------------------------------
-engine = get_connection()
-
-profit_df = pd.read_sql(
-    "SELECT * FROM vw_profit_analysis ORDER BY date",
-    engine
-)
+# Station scope: one station, or the whole fleet (shown for chains only).
+station_choices, station_index = stations.picker(repository.load_stations())
+station = station_choices[
+    st.sidebar.selectbox("Station", list(station_choices), index=station_index)
+    if len(station_choices) > 1 else list(station_choices)[station_index]
+]
 
-profit_df["date"] = pd.to_datetime(profit_df["date"])
+periods_df = repository.load_periods("daily_fuel_summary", station)
 
-# --------------------------------------------------
-# DATE HELPERS
-# --------------------------------------------------
-profit_df["year"] = profit_df["date"].dt.year
-profit_df["month_name"] = profit_df["date"].dt.month_name()
-profit_df["month_num"] = profit_df["date"].dt.month
+if periods_df.empty:
+    st.warning("⚠️ No financial data available yet.")
+    st.stop()
 
 # --------------------------------------------------
 # FILTER SIDEBAR
 # --------------------------------------------------
 st.sidebar.header("🔍 Filters")
 
-years = sorted(profit_df["year"].unique())
+years = sorted(periods_df["year"].unique())
 
 year = st.sidebar.selectbox(
     "Select Year",
@@ -48,13 +45,10 @@ year = st.sidebar.selectbox(
     index=len(years)-1  # auto-select latest year
 )
 
-year_df = profit_df[profit_df["year"] == year]
-
-available_months = (
-    year_df
-    .sort_values("month_num")["month_name"]
-    .unique()
-)
+available_months = [
+    MONTH_NAMES[m - 1]
+    for m in periods_df.loc[periods_df["year"] == year, "month"]
+]
 
 selected_months = st.sidebar.multiselect(
     "Select Month",
@@ -65,7 +59,7 @@ selected_months = st.sidebar.multiselect(
 if not selected_months:
     selected_months = available_months
 
-fuel_types = profit_df["fuel_type"].unique()
+fuel_types = repository.load_fuel_types("daily_fuel_summary", station)
 
 fuel = st.sidebar.multiselect(
     "Fuel Type",
@@ -74,13 +68,16 @@ fuel = st.sidebar.multiselect(
 )
 
 # --------------------------------------------------
-# FILTER CORE DATA
+# LOAD SELECTED WINDOW ONLY (FILTERS RUN IN SQL)
 # --------------------------------------------------
-filtered_df = profit_df[
-    (profit_df["year"] == year) &
-    (profit_df["month_name"].isin(selected_months)) &
-    (profit_df["fuel_type"].isin(fuel))
-]
+date_ranges = month_ranges(int(year), selected_months)
+selected_periods = [int(year) * 100 + MONTH_NUMBERS[m] for m in selected_months]
+
+data = loader.load({
+    "financial": loader.query(repository.load_financial, date_ranges, fuel, station),
+    "monthly": loader.query(repository.load_period_totals, ["profit"], selected_periods, fuel, station),
+})
+filtered_df = data["financial"]
 
 # --------------------------------------------------
 # HANDLE EMPTY SCENARIOS
@@ -130,7 +127,12 @@ profit_trend = (
     .sum()
 )
 
-st.line_chart(profit_trend, use_container_width=True)
+profit_span = charts.span(profit_trend)
+profit_window = st.slider("Zoom", *profit_span, value=profit_span, key="profit_zoom") if profit_span else None
+st.plotly_chart(
+    charts.time_series(profit_trend, profit_window, y_title="Profit (₹)"),
+    use_container_width=True
+)
 
 # --------------------------------------------------
 # FUEL-WISE PROFIT
@@ -145,12 +147,10 @@ st.bar_chart(fuel_profit)
 # --------------------------------------------------
 st.subheader("📊 Monthly Profit Analysis")
 
-monthly_profit = (
-    filtered_df
-    .groupby("month_name")["profit"]
-    .sum()
-    .reindex(available_months)
-)
+# Month totals come off the fact store's prefix sums, keyed by YYYYMM.
+monthly_profit = data["monthly"]["profit"]
+monthly_profit.index = [MONTH_NAMES[p % 100 - 1] for p in monthly_profit.index]
+monthly_profit = monthly_profit.reindex(available_months)
 
 st.bar_chart(monthly_profit)
 
@@ -158,10 +158,28 @@ st.bar_chart(monthly_profit)
 # RAW DATA VIEW
 # --------------------------------------------------
 st.markdown("---")
-with st.expander("📄 View Financial Data"):
-    st.dataframe(
-        filtered_df.sort_values("date"),
-        use_container_width=True
+if st.toggle("📄 View Financial Data", key="raw_financial"):
+    size_col, order_col = st.columns(2)
+    size = size_col.selectbox(
+        "Rows per page", paging.PAGE_SIZES,
+        index=paging.PAGE_SIZES.index(paging.DEFAULT_PAGE_SIZE), key="raw_financial_size"
+    )
+    newest_first = order_col.toggle("Newest first", key="raw_financial_newest")
+
+    # One page per rerun, paged and sorted in SQL (see repository.load_raw_page).
+    pager = st.session_state.setdefault("raw_financial_pager", paging.Pager())
+    pager.scope(date_ranges, fuel, station, size, newest_first)
+    raw_rows, next_cursor = repository.load_raw_page(
+        "financial", date_ranges, fuel, station, pager.cursor, size, newest_first
+    )
+    st.dataframe(raw_rows, hide_index=True, use_container_width=True)
+
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    prev_col.button("◀ Previous", key="raw_financial_prev", on_click=pager.back, disabled=pager.page == 1)
+    page_col.caption(f"Page {pager.page} · {len(raw_rows)} rows")
+    next_col.button(
+        "Next ▶", key="raw_financial_next", on_click=pager.forward, args=(next_cursor,),
+        disabled=next_cursor is None
     )
 
 # --------------------------------------------------
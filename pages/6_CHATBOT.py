@@ -1,244 +1,127 @@
-import streamlit as st
-import mysql.connector
-import re
-import pandas as pd
-
-# ========== DB ==========
-def get_db():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="fast",
-        database="petrol_db"
-    )
+import sys
+import os
 
-def query(sql, params=None):
-    conn = get_db()
-    cur = conn.cursor(dictionary=True)
-    cur.execute(sql, params or [])
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    return rows
-
-# ========== NLP HELPERS ==========
-
-MONTHS = {
-    "january":1, "jan":1,
-    "february":2, "feb":2,
-    "march":3, "mar":3,
-    "april":4, "apr":4,
-    "may":5,
-    "june":6, "jun":6,
-    "july":7, "jul":7,
-    "august":8, "aug":8,
-    "september":9, "sep":9,
-    "october":10, "oct":10,
-    "november":11, "nov":11,
-    "december":12, "dec":12
-}
-
-def extract_year(text):
-    m = re.search(r"(20\d{2})", text)
-    return int(m.group(1)) if m else None
-
-def extract_date(text):
-    m = re.search(r"(\d{4}-\d{2}-\d{2})", text)
-    return m.group(1) if m else None
-
-def extract_month(text):
-    for k,v in MONTHS.items():
-        if k in text:
-            return v
-    return None
-
-def extract_fuel(text):
-    if "diesel" in text: return "Diesel"
-    if "petrol" in text: return "Petrol"
-    return None
-
-def extract_metric(text):
-    if "profit" in text: return "profit"
-    if "revenue" in text: return "revenue"
-    if "sale" in text or "sold" in text: return "sales"
-    if "expense" in text or "cost" in text: return "expenses"
-    if "stock" in text: return "stock"
-    return None
+# This automatically finds the project root (NO hardcoded path)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-# ========== QUERY HANDLER ==========
+import streamlit as st
+import datetime
+from utils import repository, stations
+from utils.chatsql import SQL_METRICS, breakdown
+from utils.cube import get_cube
+from utils.intent import parse
 
-def handle_query(text):
-    t = text.lower().strip()
-
-    metric = extract_metric(t)
-    fuel = extract_fuel(t)
-    year = extract_year(t)
-    month = extract_month(t)
-    date = extract_date(t)
-
-    # ----------- DAILY MODE -----------
-    if date and metric:
-        if metric == "profit":
-            sql = "SELECT profit FROM vw_profit_analysis WHERE date=%s"
-            params=[date]
-            if fuel:
-                sql+=" AND fuel_type=%s"
-                params.append(fuel)
-            data=query(sql, params)
-            if not data:
-                return f"No profit data on {date}."
-            value=data[0]['profit']
-            return f"Profit on {date}: ₹{value:,.0f}"
-
-        if metric == "sales":
-            sql = """
-                SELECT SUM(quantity_sold) AS vol 
-                FROM fuel_sales 
-                WHERE date=%s
-            """
-            params=[date]
-            if fuel:
-                sql+=" AND fuel_type=%s"
-                params.append(fuel)
-            data=query(sql, params)
-            value = data[0]['vol'] if data else None
-            if not value:
-                return f"No sales data on {date}."
-            return f"Fuel sold on {date}: {value:,.0f} litres"
-
-        if metric == "revenue":
-            sql = """
-                SELECT SUM(fs.quantity_sold * fp.selling_price) AS rev
-                FROM fuel_sales fs
-                JOIN fuel_price fp ON fs.date=fp.date AND fs.fuel_type=fp.fuel_type
-                WHERE fs.date=%s
-            """
-            params=[date]
-            if fuel:
-                sql+=" AND fs.fuel_type=%s"
-                params.append(fuel)
-            data=query(sql, params)
-            value=data[0]['rev'] if data else None
-            if not value:
-                return f"No revenue data on {date}."
-            return f"Revenue on {date}: ₹{value:,.0f}"
-
-        if metric == "expenses":
-            sql="SELECT SUM(amount) AS total FROM expenses WHERE date=%s"
-            data=query(sql,[date])
-            value=data[0]['total'] if data else None
-            return f"Expenses on {date}: ₹{value or 0:,.0f}"
-
-        if metric == "stock":
-            sql="SELECT closing_stock FROM vw_fuel_stock WHERE date=%s"
-            params=[date]
-            if fuel:
-                sql+=" AND fuel_type=%s"
-                params.append(fuel)
-            data=query(sql,params)
-            if not data:
-                return f"No stock data on {date}."
-            return f"Closing stock on {date}: {data[0]['closing_stock']} litres"
-
-    # ----------- MONTHLY MODE -----------
-    if month and year and metric:
-        if metric == "profit":
-            sql="""
-                SELECT SUM(profit) AS val FROM vw_profit_analysis
-                WHERE YEAR(date)=%s AND MONTH(date)=%s
-            """
-            params=[year,month]
-            if fuel:
-                sql+=" AND fuel_type=%s"
-                params.append(fuel)
-            data=query(sql,params)
-            v=data[0]['val'] if data else None
-            return f"Profit in {year}-{month:02d}: ₹{v or 0:,.0f}"
-
-        if metric == "sales":
-            sql="SELECT SUM(quantity_sold) AS vol FROM fuel_sales WHERE YEAR(date)=%s AND MONTH(date)=%s"
-            params=[year,month]
-            if fuel:
-                sql+=" AND fuel_type=%s"
-                params.append(fuel)
-            data=query(sql,params)
-            v=data[0]['vol'] if data else None
-            return f"Sales in {year}-{month:02d}: {v or 0:,.0f} litres"
-
-        if metric == "revenue":
-            sql="""
-                SELECT SUM(fs.quantity_sold * fp.selling_price) AS rev
-                FROM fuel_sales fs
-                JOIN fuel_price fp ON fs.date=fp.date AND fs.fuel_type=fp.fuel_type
-                WHERE YEAR(fs.date)=%s AND MONTH(fs.date)=%s
-            """
-            params=[year,month]
-            if fuel:
-                sql+=" AND fs.fuel_type=%s"
-                params.append(fuel)
-            data=query(sql,params)
-            v=data[0]['rev'] if data else None
-            return f"Revenue in {year}-{month:02d}: ₹{v or 0:,.0f}"
-
-        if metric == "expenses":
-            sql="SELECT SUM(amount) AS total FROM expenses WHERE YEAR(date)=%s AND MONTH(date)=%s"
-            data=query(sql,[year,month])
-            v=data[0]['total'] if data else None
-            return f"Expenses in {year}-{month:02d}: ₹{v or 0:,.0f}"
-
-    # ----------- YEARLY MODE -----------
-    if year and metric:
-        if metric == "profit":
-            sql="SELECT SUM(profit) AS val FROM vw_profit_analysis WHERE YEAR(date)=%s"
-            params=[year]
-            if fuel:
-                sql+=" AND fuel_type=%s"
-                params.append(fuel)
-            data=query(sql,params)
-            v=data[0]['val'] if data else None
-            return f"Profit in {year}: ₹{v or 0:,.0f}"
-
-        if metric == "sales":
-            sql="SELECT SUM(quantity_sold) AS vol FROM fuel_sales WHERE YEAR(date)=%s"
-            params=[year]
-            if fuel:
-                sql+=" AND fuel_type=%s"
-                params.append(fuel)
-            data=query(sql,params)
-            v=data[0]['vol'] if data else None
-            return f"Sales in {year}: {v or 0:,.0f} litres"
-
-        if metric == "revenue":
-            sql="""
-                SELECT SUM(fs.quantity_sold * fp.selling_price) AS rev
-                FROM fuel_sales fs
-                JOIN fuel_price fp ON fs.date=fp.date AND fs.fuel_type=fp.fuel_type
-                WHERE YEAR(fs.date)=%s
-            """
-            params=[year]
-            if fuel:
-                sql+=" AND fs.fuel_type=%s"
-                params.append(fuel)
-            data=query(sql,params)
-            v=data[0]['rev'] if data else None
-            return f"Revenue in {year}: ₹{v or 0:,.0f}"
-
-        if metric == "expenses":
-            sql="SELECT SUM(amount) AS total FROM expenses WHERE YEAR(date)=%s"
-            data=query(sql,[year])
-            v=data[0]['total'] if data else None
-            return f"Expenses in {year}: ₹{v or 0:,.0f}"
-
-    return "I couldn't understand your query. Try: profit in 2025"
-    
+# ========== QUERY HANDLER ==========
+# Questions are parsed once into an Intent (utils/intent.py). Single figures
+# come from the in-memory metric cube (utils/cube.py), which is built once
+# per process and patched after every data-entry write; breakdowns and
+# comparisons are one grouped SQL statement (utils/chatsql.py). Both read
+# the selected station's daily_fuel_summary rows (or the fleet roll-up),
+# whose columns SQL_METRICS names.
+
+HELP = "I couldn't understand your query. Try: profit in 2025"
+
+def format_value(metric, v):
+    if metric == "sales":
+        return f"{v:,.0f} litres"
+    return f"₹{v:,.0f}"
+
+def answer_day(cube, metric, day, fuel):
+    date = day.isoformat()
+    if metric == "stock":
+        v = cube.closing_stock(day, fuel)
+        if v is None:
+            return f"No stock data on {date}."
+        return f"Closing stock on {date}: {v:,.0f} litres"
+
+    v = cube.total(SQL_METRICS[metric], day, day + datetime.timedelta(days=1), fuel)
+    if metric == "expenses":
+        return f"Expenses on {date}: ₹{v or 0:,.0f}"
+    if v is None or (metric != "profit" and not v):
+        return f"No {metric} data on {date}."
+    label = {"profit": "Profit on", "sales": "Fuel sold on", "revenue": "Revenue on",
+             "margin": "Margin on"}[metric]
+    return f"{label} {date}: {format_value(metric, v)}"
+
+def answer_period(cube, metric, period, fuel):
+    if period.grain == "day":
+        return answer_day(cube, metric, period.start, fuel)
+    if metric == "stock":
+        return f"Stock is recorded per day. Try: stock on {period.start.isoformat()}"
+    v = cube.total(SQL_METRICS[metric], period.start, period.end, fuel)
+    word = "for" if period.grain == "range" else "in"
+    return f"{metric.capitalize()} {word} {period.label}: {format_value(metric, v or 0)}"
+
+def describe(intent):
+    names = [m.capitalize() if i == 0 else m for i, m in enumerate(intent.metrics) if m in SQL_METRICS]
+    what = names[0] if len(names) == 1 else ", ".join(names[:-1]) + " and " + names[-1]
+    word = {"day": "on", "range": "for"}.get(intent.grain, "in")
+    groups = intent.group_by + (["fuel"] if intent.comparison == "fuel" else [])
+    by = ["by " + " and ".join(groups)] if groups else []
+    return " ".join([what, word, intent.label] + by)
+
+def handle_query(text, station=None):
+    intent = parse(text)
+    if not intent.metrics:
+        return HELP
+
+    cube = get_cube(station)
+    if intent.start is None:
+        if not intent.group_by:
+            return HELP
+        # "monthly profit" with no period: the current year so far.
+        today = datetime.date.today()
+        intent.start, intent.end = datetime.date(today.year, 1, 1), today + datetime.timedelta(days=1)
+        intent.grain, intent.label = "range", f"{today.year} so far"
+
+    # A single figure comes straight from the cube.
+    if len(intent.metrics) == 1 and not intent.group_by and not intent.comparison:
+        return answer_period(cube, intent.metric, intent.period, intent.fuel)
+
+    # Stock is per day, so stock comparisons stay on the cube too.
+    if not any(m in SQL_METRICS for m in intent.metrics):
+        periods = intent.periods if intent.comparison == "period" else [intent.period]
+        fuels = (intent.fuels or cube.fuels) if intent.comparison == "fuel" else [intent.fuel]
+        lines = [
+            (f"{fuel}: " if intent.comparison == "fuel" else "") + answer_period(cube, "stock", period, fuel)
+            for fuel in fuels for period in periods
+        ]
+        return "\n".join(f"- {line}" for line in lines)
+
+    # Everything else is one grouped statement (utils/chatsql.py).
+    return describe(intent), breakdown(intent, cube.fuels, station)
+
+def show_table(title, table):
+    st.markdown(f"**{title}**")
+    metrics = [c for c in table.columns if c in SQL_METRICS]
+    units = {m: "litres" if m == "sales" else "₹" for m in metrics}
+    st.dataframe(
+        table.rename(columns={m: f"{m.capitalize()} ({units[m]})" for m in metrics}).round(0),
+        hide_index=True,
+        use_container_width=True,
+    )
+    if table["Period"].nunique() > 1 or "Fuel" in table.columns and len(table) > 1:
+        chart = table.pivot(index="Period", columns="Fuel", values=metrics[0]) if "Fuel" in table.columns \
+            else table.set_index("Period")[[metrics[0]]]
+        st.bar_chart(chart.reindex(table["Period"].unique()))
 
 # ========== STREAMLIT UI ==========
 
 st.title("⛽ Fuel Bunk Query Assistant")
 
-q = st.chat_input("Ask (e.g., profit in 2025, diesel sales on 2024-02-10)")
+# Station scope: one station, or the whole fleet (shown for chains only).
+station_choices, station_index = stations.picker(repository.load_stations())
+station = station_choices[
+    st.sidebar.selectbox("Station", list(station_choices), index=station_index)
+    if len(station_choices) > 1 else list(station_choices)[station_index]
+]
+
+q = st.chat_input("Ask (e.g., profit in 2025, diesel sales on 2024-02-10, monthly profit and expenses for 2025)")
 
 if q:
-    ans = handle_query(q)
+    ans = handle_query(q, station)
     with st.chat_message("assistant"):
-        st.markdown(ans)
+        if isinstance(ans, str):
+            st.markdown(ans)
+        else:
+            show_table(*ans)
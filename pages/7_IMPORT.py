@@ -0,0 +1,75 @@
+import sys
+import os
+
+# This automatically finds the project root (NO hardcoded path)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import streamlit as st
+from utils import importer, repository, stations
+
+st.set_page_config(layout="wide")
+st.title("📂 Bulk Import – Historical Logs")
+
+st.markdown(
+    "Upload a CSV or Excel file of past entries. Rows are validated and written in chunks; "
+    "closing stock, missing buying prices and the daily summary are derived for the imported range."
+)
+
+COLUMNS = {
+    "sales": "date, fuel_type, quantity_sold, selling_price, buying_price (optional), station_id (optional)",
+    "stock": "date, fuel_type, received_stock, station_id (optional)",
+    "expenses": "date, expense_type, amount, station_id (optional)",
+}
+
+# Rows without a station_id column belong to the selected station.
+station_choices, station_index = stations.picker(repository.load_stations(), fleet=False)
+station = station_choices[
+    st.selectbox("Station", list(station_choices), index=station_index)
+    if len(station_choices) > 1 else list(station_choices)[station_index]
+]
+
+kind = st.selectbox("What does the file contain?", list(COLUMNS), format_func=str.capitalize)
+st.caption(f"Expected columns: {COLUMNS[kind]}")
+
+upload = st.file_uploader("Log file", type=["csv", "xlsx", "xls"])
+
+col1, col2 = st.columns(2)
+chunksize = col1.number_input("Rows per chunk", min_value=1000, max_value=200000,
+                              value=importer.CHUNKSIZE, step=1000)
+dry_run = col2.checkbox("Validate only (write nothing)")
+
+if upload is not None and st.button("Validate" if dry_run else "Import"):
+    status = st.empty()
+
+    def progress(report):
+        status.info(f"⏳ {report.rows_read:,} rows read…")
+
+    try:
+        report = importer.run_import(
+            upload, kind, int(chunksize), dry_run, name=upload.name, progress=progress, station=station
+        )
+    except ValueError as exc:
+        status.empty()
+        st.error(str(exc))
+        st.stop()
+    status.empty()
+
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Rows Read", f"{report.rows_read:,}")
+    m2.metric("Rows Written", f"{report.rows_written:,}")
+    m3.metric("Rows Rejected", f"{len(report.errors):,}")
+    m4.metric("Time (s)", f"{report.seconds:.1f}")
+
+    if report.start:
+        st.success(f"Imported range: {report.start} to {report.end}")
+    if report.derived_stock_rows or report.derived_prices:
+        st.info(
+            f"Derived {report.derived_stock_rows:,} stock rows and "
+            f"{report.derived_prices:,} buying prices for days without one."
+        )
+
+    if report.errors:
+        errors = report.error_frame()
+        st.warning("Some rows were skipped. Fix them and import the file again; accepted rows are not duplicated.")
+        st.dataframe(errors.head(1000), hide_index=True, use_container_width=True)
+        st.download_button("Download all errors (CSV)", errors.to_csv(index=False), "import_errors.csv", "text/csv")
@@ -0,0 +1,21 @@
+"""Shared fixtures: a throwaway SQLite database behind ``db.get_connection()``."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import db, repository, schema  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A migrated SQLite engine, installed as the process-wide engine."""
+    engine = db._build_engine(f"sqlite:///{tmp_path / 'fuel.sqlite'}")
+    schema.migrate(engine)
+    monkeypatch.setattr(db, "_engine", engine)
+    repository.invalidate()  # cached reads of another test's database
+    yield engine
+    repository.invalidate()
+    engine.dispose()
@@ -0,0 +1,50 @@
+"""Bulk imports against a throwaway SQLite database."""
+from sqlalchemy import text
+
+from utils import importer, ledger
+
+
+def _csv(path, body):
+    path.write_text(body)
+    return str(path)
+
+
+def test_stock_import_fills_rows_derived_by_a_sales_import(database, tmp_path):
+    sales = _csv(tmp_path / "sales.csv", (
+        "date,fuel_type,quantity_sold,selling_price\n"
+        "2025-01-01,Petrol,100,100\n"
+        "2025-01-02,Petrol,100,100\n"
+        "2025-01-03,Petrol,100,100\n"
+    ))
+    stock = _csv(tmp_path / "stock.csv", (
+        "date,fuel_type,received_stock\n"
+        "2025-01-01,Petrol,1000\n"
+        "2025-01-02,Petrol,0\n"
+        "2025-01-03,Petrol,500\n"
+    ))
+
+    report = importer.run_import(sales, "sales")
+    assert report.rows_written == 3 and report.derived_stock_rows == 3
+    report = importer.run_import(stock, "stock")
+    assert report.errors == []
+    assert report.rows_written == 3
+
+    with database.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT date, opening_stock, received_stock, closing_stock FROM fuel_stock ORDER BY date, id"
+        )).fetchall()
+        balance = ledger.opening_stock(conn, 1, "Petrol", "2025-01-04")
+    assert [(str(d), float(o), float(r), float(c)) for d, o, r, c in rows] == [
+        ("2025-01-01", 0, 1000, 900),
+        ("2025-01-02", 900, 0, 800),
+        ("2025-01-03", 800, 500, 1200),
+    ]
+    assert balance == 1200
+
+
+def test_stock_import_still_rejects_stored_receipts(database, tmp_path):
+    stock = _csv(tmp_path / "stock.csv", "date,fuel_type,received_stock\n2025-01-01,Petrol,1000\n")
+    importer.run_import(stock, "stock")
+    report = importer.run_import(stock, "stock")
+    assert report.rows_written == 0
+    assert report.errors == [(2, "already in the database")]
@@ -0,0 +1,76 @@
+"""Chatbot question parsing."""
+from datetime import date
+
+from utils.intent import buckets, parse
+
+TODAY = date(2025, 6, 18)
+
+
+def _span(intent):
+    return intent.start, intent.end, intent.grain
+
+
+def test_last_n_days_ends_today_inclusive():
+    intent = parse("petrol sales last 7 days", TODAY)
+    assert intent.metrics == ["sales"] and intent.fuel == "Petrol"
+    assert _span(intent) == (date(2025, 6, 12), date(2025, 6, 19), "range")
+    assert intent.label == "last 7 days"
+
+
+def test_relative_weeks_months_and_years():
+    assert _span(parse("profit past 2 weeks", TODAY)) == (date(2025, 6, 5), date(2025, 6, 19), "range")
+    assert _span(parse("profit last 3 months", TODAY)) == (date(2025, 4, 1), date(2025, 7, 1), "range")
+    assert _span(parse("profit this month", TODAY)) == (date(2025, 6, 1), date(2025, 7, 1), "month")
+    assert _span(parse("profit last year", TODAY)) == (date(2024, 1, 1), date(2025, 1, 1), "year")
+    assert _span(parse("profit yesterday", TODAY)) == (date(2025, 6, 17), date(2025, 6, 18), "day")
+
+
+def test_between_two_dates_is_one_half_open_range():
+    intent = parse("expenses between 2025-01-01 and 2025-01-15", TODAY)
+    assert intent.metrics == ["expenses"]
+    assert _span(intent) == (date(2025, 1, 1), date(2025, 1, 16), "range")
+    assert intent.comparison is None
+
+
+def test_from_month_to_month_shares_the_trailing_year():
+    assert _span(parse("revenue from jan to mar 2024", TODAY)) == (date(2024, 1, 1), date(2024, 4, 1), "range")
+
+
+def test_quarter_and_month_names():
+    intent = parse("diesel profit Q1 2025", TODAY)
+    assert _span(intent) == (date(2025, 1, 1), date(2025, 4, 1), "quarter")
+    assert intent.label == "Q1 2025" and intent.fuel == "Diesel"
+    assert _span(parse("sales march 2024", TODAY)) == (date(2024, 3, 1), date(2024, 4, 1), "month")
+    # Without a year, a month name means this year's month.
+    assert _span(parse("sales in mar", TODAY)) == (date(2025, 3, 1), date(2025, 4, 1), "month")
+
+
+def test_margin_is_a_metric_not_the_month_of_march():
+    intent = parse("margin in 2024", TODAY)
+    assert intent.metrics == ["margin"]
+    assert _span(intent) == (date(2024, 1, 1), date(2025, 1, 1), "year")
+    assert parse("margin", TODAY).start is None
+
+
+def test_fuel_comparison():
+    intent = parse("petrol vs diesel profit in Q1 2025", TODAY)
+    assert intent.comparison == "fuel"
+    assert intent.fuels == ["Petrol", "Diesel"] and intent.fuel is None
+    assert _span(intent) == (date(2025, 1, 1), date(2025, 4, 1), "quarter")
+
+
+def test_period_comparison():
+    intent = parse("profit 2024 vs 2025", TODAY)
+    assert intent.comparison == "period"
+    assert [(p.start, p.end) for p in intent.periods] == [
+        (date(2024, 1, 1), date(2025, 1, 1)), (date(2025, 1, 1), date(2026, 1, 1)),
+    ]
+    assert intent.label == "2024 vs 2025"
+
+
+def test_breakdowns():
+    assert parse("monthly profit 2025", TODAY).group_by == ["month"]
+    assert parse("sales each month of 2025", TODAY).group_by == ["month"]
+    intent = parse("fuel wise sales today", TODAY)
+    assert intent.comparison == "fuel" and intent.group_by == []
+    assert [p.label for p in buckets(date(2025, 1, 15), date(2025, 4, 1), "month")] == ["2025-01", "2025-02", "2025-03"]
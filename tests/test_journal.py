@@ -0,0 +1,85 @@
+"""Write-behind journal draining into a throwaway SQLite database."""
+import sqlite3
+from datetime import date
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from utils import journal
+
+
+@pytest.fixture
+def queue(database, tmp_path):
+    return journal.Journal(str(tmp_path / "journal.db"))
+
+
+def _expense(amount=100.0, **extra):
+    row = {"station_id": 1, "date": date(2025, 1, 1), "expense_type": "Rent", "amount": amount, **extra}
+    return {"expenses": pd.DataFrame([row])}
+
+
+def _broken():
+    # No amount column: write_chunk raises, which is not a connection error.
+    return {"expenses": pd.DataFrame([{"station_id": 1, "date": date(2025, 1, 1), "expense_type": "Rent"}])}
+
+
+def _rows(database):
+    with database.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM expenses")).scalar()
+
+
+def _entries(queue):
+    db = sqlite3.connect(queue.path)
+    try:
+        return db.execute("SELECT status, attempts FROM journal ORDER BY id").fetchall()
+    finally:
+        db.close()
+
+
+def _make_due(queue):
+    db = sqlite3.connect(queue.path)
+    with db:
+        db.execute("UPDATE journal SET next_attempt_at = 0")
+    db.close()
+
+
+def test_replayed_entry_is_skipped_by_its_idempotency_key(database, queue):
+    queue.append(_expense())
+    assert queue.drain() == 1
+
+    # Crash after the commit but before the entry was marked done locally.
+    db = sqlite3.connect(queue.path)
+    with db:
+        db.execute("UPDATE journal SET status = 'pending', done_at = NULL")
+    db.close()
+
+    assert queue.drain() == 0
+    assert _rows(database) == 1
+    assert _entries(queue) == [("done", 0)]
+
+
+def test_entry_is_parked_after_max_attempts(database, queue):
+    queue.append(_broken())
+    for attempt in range(1, journal.MAX_ATTEMPTS + 1):
+        _make_due(queue)
+        assert queue.drain() == 0
+        assert _entries(queue) == [("pending" if attempt < journal.MAX_ATTEMPTS else "failed", attempt)]
+
+    _make_due(queue)
+    assert queue.drain() == 0
+    assert queue.counts() == {"pending": 0, "failed": 1, "done": 0}
+    assert queue.failures()[0]["attempts"] == journal.MAX_ATTEMPTS
+
+    assert queue.retry_failed() == 1
+    assert _entries(queue) == [("pending", 0)]
+
+
+def test_failed_batch_is_applied_one_entry_at_a_time(database, queue):
+    queue.append(_expense(100.0))
+    queue.append(_broken())
+    queue.append(_expense(200.0, expense_type="Salary"))
+
+    assert queue.drain() == 2
+    assert _rows(database) == 2
+    assert _entries(queue) == [("done", 0), ("pending", 1), ("done", 0)]
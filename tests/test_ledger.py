@@ -0,0 +1,80 @@
+"""Closing-stock posting against a throwaway SQLite database."""
+from sqlalchemy import text
+
+from utils import ledger
+
+
+def _stock(conn, day, received, opening=0):
+    conn.execute(text("""
+        INSERT INTO fuel_stock (station_id, date, fuel_type, opening_stock, received_stock, closing_stock)
+        VALUES (1, :day, 'Petrol', :opening, :received, 0)
+    """), {"day": day, "opening": opening, "received": received})
+
+
+def _sale(conn, day, litres):
+    conn.execute(text("""
+        INSERT INTO fuel_sales (station_id, date, fuel_type, quantity_sold, selling_price, total_amount)
+        VALUES (1, :day, 'Petrol', :litres, 100, :litres * 100)
+    """), {"day": day, "litres": litres})
+
+
+def _posted(conn):
+    rows = conn.execute(text(
+        "SELECT date, opening_stock, received_stock, closing_stock FROM fuel_stock ORDER BY date, id"
+    )).fetchall()
+    return [(str(d), float(o), float(r), float(c)) for d, o, r, c in rows]
+
+
+def test_sales_are_deducted_once_on_a_day_with_several_entries(database):
+    with database.begin() as conn:
+        _stock(conn, "2025-01-01", 500, opening=1000)
+        _stock(conn, "2025-01-01", 300)
+        _sale(conn, "2025-01-01", 200)
+        _sale(conn, "2025-01-01", 100)
+        ledger.post(conn, 1, "Petrol", "2025-01-01")
+
+        assert _posted(conn) == [
+            ("2025-01-01", 1000, 500, 1200),
+            ("2025-01-01", 1200, 300, 1500),
+        ]
+        assert ledger.opening_stock(conn, 1, "Petrol", "2025-01-02") == 1500
+
+
+def test_back_dated_entry_reposts_later_rows(database):
+    with database.begin() as conn:
+        _stock(conn, "2025-01-01", 0, opening=1000)
+        _stock(conn, "2025-01-03", 0)
+        _sale(conn, "2025-01-01", 100)
+        _sale(conn, "2025-01-03", 100)
+        ledger.post(conn, 1, "Petrol", "2025-01-01")
+        assert ledger.opening_stock(conn, 1, "Petrol", "2025-01-04") == 800
+
+        _stock(conn, "2025-01-02", 400)
+        ledger.post(conn, 1, "Petrol", "2025-01-02")
+
+        assert _posted(conn) == [
+            ("2025-01-01", 1000, 0, 900),
+            ("2025-01-02", 900, 400, 1300),
+            ("2025-01-03", 1300, 0, 1200),
+        ]
+        assert ledger.opening_stock(conn, 1, "Petrol", "2025-01-04") == 1200
+        balance = conn.execute(text(f"SELECT date, closing_stock FROM {ledger.BALANCE_TABLE}")).fetchone()
+        assert (str(balance[0]), float(balance[1])) == ("2025-01-03", 1200)
+
+
+def test_day_without_stock_entry_carries_the_balance(database):
+    with database.begin() as conn:
+        _stock(conn, "2025-01-01", 0, opening=1000)
+        _sale(conn, "2025-01-01", 100)
+        ledger.post(conn, 1, "Petrol", "2025-01-01")
+
+        # 2025-01-02 has no entry: the next day opens from 2025-01-01.
+        assert ledger.opening_stock(conn, 1, "Petrol", "2025-01-02") == 900
+        assert ledger.opening_stock(conn, 1, "Petrol", "2025-01-03") == 900
+        _stock(conn, "2025-01-03", 200)
+        ledger.post(conn, 1, "Petrol", "2025-01-03")
+
+        assert _posted(conn)[-1] == ("2025-01-03", 900, 200, 1100)
+        # A back-dated read falls back to the stock rows.
+        assert ledger.opening_stock(conn, 1, "Petrol", "2025-01-01") == 0
+        assert ledger.opening_stock(conn, 1, "Petrol", "2025-01-02") == 900
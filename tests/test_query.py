@@ -0,0 +1,107 @@
+"""SELECT builder shapes and keyset paging of the raw-data views."""
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from utils import repository
+from utils.query import Select, statement
+
+JAN = (date(2025, 1, 1), date(2025, 2, 1))
+MAR = (date(2025, 3, 1), date(2025, 4, 1))
+
+
+def test_date_ranges_are_half_open_bind_parameters():
+    sql, params = Select("t").during([JAN]).build()
+    assert sql == "SELECT * FROM t WHERE (date >= :d0_start AND date < :d0_end)"
+    assert params == {"d0_start": JAN[0], "d0_end": JAN[1]}
+
+    sql, _ = Select("t").during([JAN, MAR]).build()
+    assert sql == (
+        "SELECT * FROM t WHERE ((date >= :d0_start AND date < :d0_end) OR (date >= :d1_start AND date < :d1_end))"
+    )
+    assert Select("t").during([]).build()[0] == "SELECT * FROM t WHERE 1 = 0"
+    assert Select("t").during(None).build()[0] == "SELECT * FROM t"
+
+
+def test_one_value_is_an_equality_and_several_an_in_list():
+    assert Select("t").fuels(["Petrol"]).station(2).build() == (
+        "SELECT * FROM t WHERE fuel_type = :fuel AND station_id = :station", {"fuel": "Petrol", "station": 2},
+    )
+    assert Select("t").fuels(["Petrol", "Diesel"]).stations([1, 2]).build() == (
+        "SELECT * FROM t WHERE fuel_type IN :fuels AND station_id IN :stations",
+        {"fuels": ("Petrol", "Diesel"), "stations": (1, 2)},
+    )
+    assert Select("t").fuels(None).station(None).build() == ("SELECT * FROM t", {})
+
+
+def test_full_statement_shape():
+    sql, params = (
+        Select("daily_fuel_summary").columns("fuel_type", "litres", rename={"litres": "sales"}).sum("profit")
+        .since(date(2025, 1, 1)).group_by("fuel_type").order_by("fuel_type DESC").limit(10).build()
+    )
+    assert sql == (
+        "SELECT fuel_type, litres AS sales, SUM(profit) AS profit FROM daily_fuel_summary WHERE date >= :since "
+        "GROUP BY fuel_type ORDER BY fuel_type DESC LIMIT 10"
+    )
+    assert params == {"since": date(2025, 1, 1)}
+
+
+def test_keyset_predicate_leads_with_a_sargable_bound():
+    assert Select("t").after(["date", "id"], None).build() == ("SELECT * FROM t", {})
+
+    sql, params = Select("t").after(["date", "id"], (date(2025, 1, 2), 7)).build()
+    assert sql == "SELECT * FROM t WHERE date >= :k0 AND (date > :k0 OR (date = :k0 AND (id > :k1)))"
+    assert params == {"k0": date(2025, 1, 2), "k1": 7}
+
+    sql, _ = Select("t").after(["a", "b", "c"], (1, 2, 3), descending=True).build()
+    assert sql == "SELECT * FROM t WHERE a <= :k0 AND (a < :k0 OR (a = :k0 AND (b < :k1 OR (b = :k1 AND (c < :k2)))))"
+
+
+def test_statement_is_reused_per_shape(database):
+    sql, _ = Select("fuel_stock").columns("id").fuels(["Petrol", "Diesel"]).build()
+    first, bind = statement(sql, {"fuels": ("Petrol", "Diesel")})
+    second, _ = statement(sql, {"fuels": ("Petrol",)})
+    assert first is second
+    assert bind == {"fuels": ["Petrol", "Diesel"]}
+    assert statement("SELECT 1")[0] is statement("SELECT 1")[0]
+    assert statement("SELECT 2")[0] is not first
+
+    # The expanding IN list binds any number of values with the same clause.
+    with database.connect() as conn:
+        assert conn.execute(first, {"fuels": ["Petrol"]}).fetchall() == []
+        assert conn.execute(first, {"fuels": ["Petrol", "Diesel", "CNG"]}).fetchall() == []
+
+
+@pytest.fixture
+def stock(database):
+    """Ten Petrol stock rows of station 1, seven of them on one day."""
+    days = ["2025-01-01"] * 7 + ["2025-01-02"] * 2 + ["2025-01-03"]
+    with database.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO fuel_stock (station_id, date, fuel_type, opening_stock, received_stock, closing_stock)
+            VALUES (1, :day, 'Petrol', 0, 0, 0)
+        """), [{"day": d} for d in days])
+        return [row[0] for row in conn.execute(text("SELECT id FROM fuel_stock ORDER BY date, id"))]
+
+
+def _pages(size, descending=False):
+    pages, cursor = [], None
+    while True:
+        rows, cursor = repository.load_raw_page("stock", station=1, after=cursor, size=size, descending=descending)
+        pages.append(list(rows["id"]))
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("size", [3, 5, 10, 25])
+def test_pages_split_tied_dates_without_gaps_or_repeats(stock, size):
+    pages = _pages(size)
+    assert [i for page in pages for i in page] == stock
+    assert all(len(page) == size for page in pages[:-1])
+    # The size+1 probe ends on a full last page instead of an empty one.
+    assert len(pages) == -(-len(stock) // size)
+
+
+def test_newest_first_pages_mirror_oldest_first(stock):
+    assert [i for page in _pages(4, descending=True) for i in page] == stock[::-1]
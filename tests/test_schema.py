@@ -0,0 +1,61 @@
+"""Migrations applied to a database written before they existed."""
+import pytest
+from sqlalchemy import create_engine, text
+
+from utils import ledger, schema, summary
+
+LEGACY_SCHEMA = """
+    CREATE TABLE fuel_sales (id INTEGER PRIMARY KEY, date DATE, fuel_type TEXT, quantity_sold REAL,
+                             selling_price REAL, total_amount REAL);
+    CREATE TABLE fuel_price (date DATE, fuel_type TEXT, buying_price REAL, PRIMARY KEY (date, fuel_type));
+    CREATE TABLE fuel_stock (id INTEGER PRIMARY KEY, date DATE, fuel_type TEXT, opening_stock REAL,
+                             received_stock REAL, closing_stock REAL);
+    CREATE TABLE expenses (id INTEGER PRIMARY KEY, date DATE, expense_type TEXT, amount REAL);
+    INSERT INTO fuel_sales (date, fuel_type, quantity_sold, selling_price, total_amount) VALUES
+        ('2024-05-01', 'Petrol', 100, 100, 10000), ('2024-05-02', 'Petrol', 200, 100, 20000);
+    INSERT INTO fuel_price VALUES ('2024-05-01', 'Petrol', 90), ('2024-05-02', 'Petrol', 90);
+    INSERT INTO fuel_stock (date, fuel_type, opening_stock, received_stock, closing_stock) VALUES
+        ('2024-05-01', 'Petrol', 1000, 0, 0), ('2024-05-02', 'Petrol', 900, 500, 0);
+    INSERT INTO expenses (date, expense_type, amount) VALUES ('2024-05-02', 'Rent', 300);
+"""
+
+
+@pytest.fixture
+def legacy(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.sqlite'}")
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA.split(";"):
+            if statement.strip():
+                conn.exec_driver_sql(statement)
+    schema.migrate(engine)
+    return engine
+
+
+def test_upgrade_fills_summary_from_existing_rows(legacy):
+    with legacy.connect() as conn:
+        rows = conn.execute(text(
+            f"SELECT station_id, date, litres, revenue, margin, expenses, profit FROM {summary.SUMMARY_TABLE} ORDER BY date"
+        )).fetchall()
+        fleet = conn.execute(text(f"SELECT SUM(profit) FROM {summary.FLEET_TABLE}")).scalar()
+        income = conn.execute(text("SELECT SUM(total_sales), SUM(profit) FROM vw_income_summary")).fetchone()
+
+    assert [(s, str(d)) for s, d, *_ in rows] == [(1, "2024-05-01"), (1, "2024-05-02")]
+    assert [tuple(float(v) for v in r[2:]) for r in rows] == [
+        (100, 10000, 1000, 0, 1000),
+        (200, 20000, 2000, 300, 1700),
+    ]
+    assert float(fleet) == pytest.approx(2700)
+    assert tuple(float(v) for v in income) == pytest.approx((30000, 2700))
+
+
+def test_upgrade_posts_closing_stock(legacy):
+    with legacy.connect() as conn:
+        stock = conn.execute(text(
+            "SELECT opening_stock, received_stock, closing_stock FROM fuel_stock ORDER BY date, id"
+        )).fetchall()
+        closing = conn.execute(text(f"SELECT closing_stock FROM {summary.SUMMARY_TABLE} ORDER BY date")).fetchall()
+        opening = ledger.opening_stock(conn, 1, "Petrol", "2024-05-03")
+
+    assert [tuple(float(v) for v in row) for row in stock] == [(1000, 0, 900), (900, 500, 1200)]
+    assert [float(c) for c, in closing] == [900, 1200]
+    assert opening == 1200
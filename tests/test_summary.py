@@ -0,0 +1,60 @@
+"""Summary rebuilds against a throwaway SQLite database."""
+import os
+import sys
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import schema, summary  # noqa: E402
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fuel.sqlite'}")
+    schema.migrate(engine)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO fuel_sales (station_id, date, fuel_type, quantity_sold, selling_price, total_amount)
+            VALUES (1, '2017-03-04', 'Petrol', 100, 80, 8000), (1, '2017-03-04', 'Diesel', 50, 70, 3500)
+        """))
+    return engine
+
+
+def _expenses(conn, table, day):
+    return conn.execute(text(f"SELECT SUM(expenses) FROM {table} WHERE date = :day"), {"day": day}).scalar()
+
+
+def test_expense_on_day_without_sales_or_stock_is_summarised(engine):
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO expenses (station_id, date, expense_type, amount) VALUES
+            (1, '2017-03-05', 'Repairs', 5000),
+            (2, '2017-03-05', 'Rent', 1200)
+        """))
+        summary.rebuild(conn)
+
+        assert _expenses(conn, summary.SUMMARY_TABLE, date(2017, 3, 5)) == pytest.approx(6200)
+        assert _expenses(conn, summary.FLEET_TABLE, date(2017, 3, 5)) == pytest.approx(6200)
+        fuels = conn.execute(text(f"""
+            SELECT station_id, fuel_type, expenses, profit FROM {summary.SUMMARY_TABLE}
+            WHERE date = '2017-03-05' ORDER BY station_id, fuel_type
+        """)).fetchall()
+
+    # Station 1 splits its expense over its own fuels; station 2 has no
+    # history yet and spreads it over every known fuel.
+    assert [(s, f) for s, f, _, _ in fuels] == [(1, "Diesel"), (1, "Petrol"), (2, "Diesel"), (2, "Petrol")]
+    assert sum(float(p) for _, _, _, p in fuels) == pytest.approx(-6200)
+
+
+def test_incremental_rebuild_keeps_expense_only_day(engine):
+    with engine.begin() as conn:
+        summary.rebuild(conn)
+        conn.execute(text(
+            "INSERT INTO expenses (station_id, date, expense_type, amount) VALUES (1, '2017-03-05', 'Repairs', 5000)"
+        ))
+        summary.rebuild(conn, date(2017, 3, 5), date(2017, 3, 6), [1])
+
+        assert _expenses(conn, summary.SUMMARY_TABLE, date(2017, 3, 5)) == pytest.approx(5000)
@@ -0,0 +1,176 @@
+"""Embedded reporting replica of the transactional store.
+
+When ``FUEL_ANALYTICS_BACKEND``/``FUEL_ANALYTICS_URL`` is set (see
+``utils.db``), the reporting tables are mirrored into an embedded engine
+(DuckDB, or SQLite) carrying the same schema and views, and
+``repository.read_sql`` sends every query whose sources are all mirrored
+there: the dashboards' datasets, the views, the chatbot aggregates and the
+metric cube's loads. Writes keep going to the transactional store.
+
+Like the Parquet snapshot, each table is pulled incrementally: a refresh
+re-copies rows from the start of the month of the replica's latest date,
+or from the first date a write touched if that is earlier. Writes are
+known from local invalidations and, for every process, from the change
+log (``utils.changes``); the replica keeps its position in that log in
+``replica_changes``. The small ledger balance table is copied whole.
+Rebuild from the command line with::
+
+    python -m utils.analytics sync [--full] [table ...]
+"""
+import argparse
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import text
+
+from utils import changes, snapshot
+from utils.db import bulk_insert, get_analytics_engine, get_connection
+from utils.ledger import BALANCE_TABLE
+from utils.query import Select
+
+REFRESH_INTERVAL = snapshot.REFRESH_INTERVAL
+
+# Dated tables are synced incrementally; the balance table is tiny and
+# updated in place by the ledger, so it is always copied whole.
+TABLES = dict(snapshot.TABLES)
+FULL_COPY = {BALANCE_TABLE: ["station_id", "fuel_type", "date", "closing_stock"]}
+
+POSITIONS_TABLE = "replica_changes"
+CREATE_POSITIONS_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {POSITIONS_TABLE} (
+        table_name VARCHAR(64) PRIMARY KEY,
+        change_id BIGINT NOT NULL
+    )
+"""
+
+
+class AnalyticsReplica:
+    """Incrementally synced copy of ``TABLES`` in the analytics engine."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._synced_at = {}
+        self._dirty = {}
+        with engine.begin() as conn:
+            conn.execute(text(CREATE_POSITIONS_SQL))
+
+    def tables(self):
+        return set(TABLES) | set(FULL_COPY)
+
+    def mark_dirty(self, tables, since):
+        """Force the next read of ``tables`` (None: all) to re-pull from ``since``."""
+        with self._lock:
+            for table in self.tables() if tables is None else set(tables) & self.tables():
+                if table in FULL_COPY or since is None:
+                    self._synced_at.pop(table, None)
+                    continue
+                current = self._dirty.get(table)
+                self._dirty[table] = since if current is None else min(current, since)
+
+    def watermark(self, table):
+        with self.engine.connect() as conn:
+            value = conn.execute(text(f"SELECT MAX(date) FROM {table}")).scalar()
+        return pd.Timestamp(value).date() if value is not None else None
+
+    def _position(self, table):
+        with self.engine.connect() as conn:
+            return conn.execute(
+                text(f"SELECT change_id FROM {POSITIONS_TABLE} WHERE table_name = :table"), {"table": table}
+            ).scalar()
+
+    # ---------- sync ----------
+    def sync(self, table, full=False):
+        """Copy new/changed rows of ``table`` from the transactional store."""
+        with self._lock:
+            columns = FULL_COPY.get(table) or TABLES[table]
+            dirty = self._dirty.pop(table, None)
+            with get_connection().connect() as source:
+                position = logged = None
+                if table not in FULL_COPY:
+                    # Writes logged since the last sync, by any process.
+                    position, changed = changes.pending(source, [table], self._position(table))
+                    logged = changed.get(table)
+                mark = None
+                if table not in FULL_COPY and not full and logged != changes.FULL:
+                    mark = self.watermark(table)
+                    for since in (dirty, logged):
+                        if mark is not None and since is not None:
+                            mark = min(mark, since)
+                    mark = mark.replace(day=1) if mark is not None else None
+
+                sql, params = Select(table).columns(*columns).since(mark).build()
+                df = pd.read_sql(text(sql), source, params=params)
+
+            with self.engine.begin() as conn:
+                if mark is None:
+                    conn.execute(text(f"DELETE FROM {table}"))
+                else:
+                    conn.execute(text(f"DELETE FROM {table} WHERE date >= :start"), {"start": mark})
+                bulk_insert(conn, table, df)
+                if position is not None:
+                    conn.execute(text(f"DELETE FROM {POSITIONS_TABLE} WHERE table_name = :table"), {"table": table})
+                    conn.execute(
+                        text(f"INSERT INTO {POSITIONS_TABLE} (table_name, change_id) VALUES (:table, :position)"),
+                        {"table": table, "position": position},
+                    )
+            self._synced_at[table] = time.monotonic()
+            return len(df)
+
+    def ensure_fresh(self, tables):
+        for table in tables:
+            synced = self._synced_at.get(table)
+            if synced is None or table in self._dirty or time.monotonic() - synced > REFRESH_INTERVAL:
+                self.sync(table)
+
+
+_replica = None
+_replica_lock = threading.Lock()
+
+
+def enabled():
+    return get_analytics_engine() is not None
+
+
+def get_replica():
+    global _replica
+    if _replica is None:
+        with _replica_lock:
+            if _replica is None:
+                _replica = AnalyticsReplica(get_analytics_engine())
+    return _replica
+
+
+def engine_for(tables):
+    """Analytics engine, synced for the base ``tables``, if it mirrors them all."""
+    if not tables or not enabled():
+        return None
+    replica = get_replica()
+    if not set(tables) <= replica.tables():
+        return None
+    replica.ensure_fresh(sorted(tables))
+    return replica.engine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync the embedded analytics replica.")
+    parser.add_argument("command", choices=["sync"])
+    parser.add_argument("tables", nargs="*", help=f"default: {', '.join([*TABLES, *FULL_COPY])}")
+    parser.add_argument("--full", action="store_true", help="re-copy everything")
+    args = parser.parse_args(argv)
+
+    if not enabled():
+        parser.error("set FUEL_ANALYTICS_BACKEND or FUEL_ANALYTICS_URL to use the analytics replica")
+    replica = get_replica()
+    unknown = set(args.tables) - replica.tables()
+    if unknown:
+        parser.error(f"not a replicated table: {', '.join(sorted(unknown))}")
+    for table in args.tables or [*TABLES, *FULL_COPY]:
+        started = time.perf_counter()
+        rows = replica.sync(table, full=args.full)
+        print(f"{table}: {rows} rows copied in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
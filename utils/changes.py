@@ -0,0 +1,89 @@
+"""Cross-process change log for the mirrored tables.
+
+Every write path records, in the same transaction as its rows, which
+tables it wrote and the earliest date it touched. The Parquet snapshot and
+the analytics replica mirror the transactional store incrementally. Each
+keeps the id of the last change it has applied, and on every sync
+re-pulls a table from the earliest date logged since then. A back-dated
+write made by another process (the import CLI, the journal writer of
+another server, a summary or ledger rebuild) is therefore mirrored like a
+local one instead of hiding behind a ``MAX(date)`` watermark.
+
+Change ids are handed out before their transaction commits, so a change
+younger than ``SETTLE_SECONDS`` is applied again on the next sync rather
+than skipped past. The log keeps ``FUEL_CHANGE_LOG_DAYS`` of history. A
+consumer whose last applied change is older than that (or unknown) is
+told to re-pull in full.
+"""
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from utils.schema import data_changes
+
+CHANGES_TABLE = data_changes.name
+KEEP_DAYS = int(os.environ.get("FUEL_CHANGE_LOG_DAYS", 30))
+SETTLE_SECONDS = 120
+
+FULL = "full"  # ``pending()``: re-pull the whole table
+
+
+def record(conn, tables, since=None):
+    """Log that ``tables`` changed from ``since`` (None: anywhere) on the
+    caller's transaction; call it last, just before the commit."""
+    now = datetime.now()
+    conn.execute(data_changes.insert(), [
+        {"table_name": table, "since": since, "changed_at": now} for table in sorted(set(tables))
+    ])
+    # Keep the newest entry so consumers can still tell where the log ends.
+    newest = conn.execute(text(f"SELECT MAX(id) FROM {CHANGES_TABLE}")).scalar()
+    conn.execute(
+        text(f"DELETE FROM {CHANGES_TABLE} WHERE changed_at < :cutoff AND id < :newest"),
+        {"cutoff": now - timedelta(days=KEEP_DAYS), "newest": newest},
+    )
+
+
+def pending(conn, tables, after):
+    """Changes to ``tables`` logged after change id ``after``.
+
+    Returns ``(position, {table: since})``. ``since`` is the earliest date
+    to re-pull from, or ``FULL``; unchanged tables are left out. Store
+    ``position`` as the next ``after``. ``after=None`` (never synced
+    against the log) reports every table as ``FULL``.
+    """
+    first, last = conn.execute(text(f"SELECT MIN(id), MAX(id) FROM {CHANGES_TABLE}")).fetchone()
+    if after is None or (first is not None and after < first - 1):
+        return last or 0, {table: FULL for table in tables}
+    if last is None or last <= after:
+        return after, {}
+
+    # Every table's entries count towards settling: a later commit to any
+    # table must not carry the position past an id still uncommitted.
+    rows = conn.execute(
+        text(f"SELECT id, table_name, since, changed_at FROM {CHANGES_TABLE} WHERE id > :after ORDER BY id"),
+        {"after": after},
+    ).fetchall()
+    settled = datetime.now() - timedelta(seconds=SETTLE_SECONDS)
+    unsettled = [row_id for row_id, _, _, changed_at in rows if _as_datetime(changed_at) >= settled]
+    position = min(unsettled) - 1 if unsettled else last
+
+    changed = {}
+    for _, table, since, _ in rows:
+        if table not in tables:
+            continue
+        if since is None or changed.get(table) == FULL:
+            changed[table] = FULL
+        else:
+            since = _as_date(since)
+            changed[table] = min(changed.get(table, since), since)
+    return position, changed
+
+
+def _as_datetime(value):
+    # DateTime comes back as datetime from MySQL and as an ISO string from SQLite.
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+def _as_date(value):
+    return value if not isinstance(value, str) else datetime.fromisoformat(value).date()
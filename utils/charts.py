@@ -0,0 +1,102 @@
+"""Time-series charts for the dashboard pages.
+
+``time_series(frame)`` draws every column of a date-indexed frame as one
+Plotly ``scattergl`` (WebGL) trace on a shared figure. Each series is first
+cut to the visible ``window`` and then downsampled with
+Largest-Triangle-Three-Buckets (LTTB) to at most ``FUEL_CHART_POINTS``
+points. LTTB keeps the peaks and troughs that plain striding drops, so a
+multi-year chart ships a bounded payload and still looks like its data.
+
+Streamlit does not send Plotly's zoom events back to the script, so the
+pages zoom with a date slider instead (``span()`` gives its bounds). A
+narrower window is re-cut from the full-resolution rows before
+downsampling, so zooming in brings back every daily point.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+MAX_POINTS = int(os.environ.get("FUEL_CHART_POINTS", 800))
+
+
+def lttb(x, y, budget):
+    """Positions of the ``budget`` points of (x, y) that LTTB keeps.
+
+    The first and last points are always kept. Every bucket in between
+    keeps the point that forms the largest triangle with the point kept
+    before it and the mean of the next bucket.
+    """
+    n = len(y)
+    if budget >= n or budget < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, budget - 1).astype(int)
+    keep = np.empty(budget, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(budget - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt = edges[i + 2] if i + 2 < len(edges) else n
+        cx, cy = x[hi:nxt].mean(), y[hi:nxt].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def downsample(series, budget=MAX_POINTS):
+    """``series`` (date-indexed, sorted) cut to ``budget`` points with LTTB."""
+    series = series.dropna()
+    if len(series) <= budget:
+        return series
+    x = series.index.to_numpy(dtype="datetime64[ns]").astype("int64")
+    return series.iloc[lttb(x, series.to_numpy(), budget)]
+
+
+def span(frame):
+    """(first, last) date of ``frame``'s index for a zoom slider, or None
+    when there is less than two days to zoom over."""
+    if frame.empty:
+        return None
+    first, last = frame.index.min().date(), frame.index.max().date()
+    return (first, last) if first < last else None
+
+
+def clip(frame, window):
+    """Rows of ``frame`` dated within ``window`` (inclusive (start, end))."""
+    if window is None:
+        return frame
+    start, end = pd.Timestamp(window[0]), pd.Timestamp(window[1])
+    return frame[(frame.index >= start) & (frame.index <= end)]
+
+
+def time_series(frame, window=None, budget=MAX_POINTS, y_title=None, dashed=()):
+    """WebGL line chart of ``frame``'s columns (a Series is one trace),
+    cut to ``window`` and downsampled per series; ``dashed`` columns
+    (e.g. forecast intervals) are drawn dotted."""
+    if isinstance(frame, pd.Series):
+        frame = frame.to_frame()
+    frame = clip(frame.sort_index(kind="stable"), window)
+
+    fig = go.Figure()
+    for column in frame.columns:
+        points = downsample(frame[column], budget)
+        fig.add_trace(go.Scattergl(
+            x=points.index,
+            y=points.to_numpy(),
+            name=str(column),
+            mode="lines",
+            line={"dash": "dot"} if column in dashed else None,
+        ))
+    fig.update_layout(
+        height=360,
+        margin={"l": 0, "r": 0, "t": 10, "b": 0},
+        hovermode="x unified",
+        legend={"orientation": "h", "y": 1.08},
+        showlegend=len(frame.columns) > 1,
+        yaxis_title=y_title,
+    )
+    return fig
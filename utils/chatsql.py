@@ -0,0 +1,86 @@
+"""Compile a chatbot ``Intent`` into one grouped SQL statement.
+
+Breakdowns ("profit, sales and expenses for each month of 2025"), fuel
+comparisons and period comparisons are answered from one station's rows of
+``daily_fuel_summary`` (or the ``fleet_fuel_summary`` roll-up) with a single ``GROUP BY bucket[, fuel_type]`` query carrying every
+requested aggregate, instead of one round trip per metric x period x fuel.
+
+Buckets other than days are numbered with a ``CASE`` over half-open bind
+ranges (``utils.query.Select.bucket``), so the statement is portable across
+backends and the ``WHERE`` clause stays a sargable date range.
+"""
+import pandas as pd
+
+from utils import repository
+from utils.intent import buckets
+from utils.periods import merge_ranges
+from utils.query import Select
+from utils.summary import FLEET_TABLE, SUMMARY_TABLE
+
+# Chatbot metric -> summary column.
+SQL_METRICS = {
+    "sales": "litres",
+    "revenue": "revenue",
+    "expenses": "expenses",
+    "margin": "margin",
+    "profit": "profit",
+}
+
+
+def source(station=None):
+    """Summary table answering for ``station`` (None: the fleet roll-up)."""
+    return FLEET_TABLE if station is None else SUMMARY_TABLE
+
+
+def compile_breakdown(metrics, periods, by_day=False, by_fuel=False, fuels=None, station=None):
+    """(sql, params) aggregating ``metrics`` per period (and per fuel).
+
+    ``periods`` are ``utils.intent.Period`` buckets; with ``by_day`` the
+    rows are grouped by ``date`` directly and ``periods`` only bound the
+    scan. The ``bucket`` column is the period index (or the date).
+    """
+    query = Select(source(station)).station(station)
+    if by_day:
+        query.expr("date", "bucket")
+    else:
+        query.bucket([(p.start, p.end) for p in periods])
+    group = ["bucket", "fuel_type"] if by_fuel else ["bucket"]
+    query.columns(*group[1:])
+    for m in metrics:
+        query.sum(SQL_METRICS[m], m)
+    query.during(merge_ranges((p.start, p.end) for p in periods)).fuels(fuels or None)
+    return query.group_by(*group).order_by(*group).build()
+
+
+def breakdown(intent, fuels=(), station=None):
+    """Answer table for ``intent``: one row per period (x fuel), one column per metric.
+
+    ``fuels`` lists every fuel to show for an all-fuel comparison; buckets
+    with no summary rows are reported as zero.
+    """
+    metrics = [m for m in intent.metrics if m in SQL_METRICS]
+    if intent.comparison == "period":
+        periods = intent.periods
+    elif intent.group_by:
+        periods = buckets(intent.start, intent.end, intent.group_by[0])
+    else:
+        periods = [intent.period]
+
+    by_day = intent.comparison != "period" and intent.group_by[:1] == ["day"]
+    by_fuel = intent.comparison == "fuel"
+    sql, params = compile_breakdown(metrics, periods, by_day, by_fuel, intent.fuels, station)
+    df = repository.read_sql(sql, params, tables=[source(station)], parse_dates=())
+
+    labels = [p.label for p in periods]
+    if by_day:
+        df["bucket"] = pd.to_datetime(df["bucket"]).dt.strftime("%Y-%m-%d")
+    else:
+        df["bucket"] = df["bucket"].map(dict(enumerate(labels)))
+
+    keys = ["bucket"]
+    index = pd.Index(labels, name="bucket")
+    if by_fuel:
+        keys.append("fuel_type")
+        index = pd.MultiIndex.from_product([labels, list(intent.fuels or fuels)], names=keys)
+    table = df.set_index(keys)[metrics].astype(float).reindex(index, fill_value=0.0)
+    return table.reset_index().rename(columns={"bucket": "Period", "fuel_type": "Fuel"})
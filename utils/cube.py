@@ -0,0 +1,197 @@
+"""In-memory metric cube over the daily summary for chatbot answers.
+
+Values are held as a dense ``(day, fuel, metric)`` array starting at the
+first summary date, with prefix sums along the day axis, so any day, month,
+year or arbitrary date-range total is two array lookups and a subtraction.
+The cube is built once per process and station scope (a station's rows of
+``daily_fuel_summary``, or the ``fleet_fuel_summary`` roll-up) and patched
+in place from the first affected date whenever the repository invalidates
+a write. At most ``FUEL_CUBES`` cubes are kept; the least recently used
+beyond that are dropped and rebuilt on their next question.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from utils import repository
+from utils.query import Select
+from utils.summary import FLEET_TABLE, SUMMARY_TABLE
+
+METRICS = ("litres", "revenue", "buying_cost", "margin", "expenses", "profit")
+REBUILD_INTERVAL = int(os.environ.get("FUEL_CUBE_REBUILD", 600))
+MAX_CUBES = int(os.environ.get("FUEL_CUBES", 64))
+
+
+class MetricCube:
+    """Dense per-day, per-fuel metric array with O(1) range roll-ups."""
+
+    def __init__(self, station=None):
+        self.station = station
+        self.source = FLEET_TABLE if station is None else SUMMARY_TABLE
+        self._lock = threading.Lock()
+        self._dirty_since = None
+        self._built_at = None
+        self.origin = None
+        self.fuels = []
+        self.values = np.zeros((0, 0, len(METRICS)))
+        self.present = np.zeros((0, 0), dtype=bool)
+        self.closing = np.zeros((0, 0))
+        self._cum = np.zeros((1, 0, len(METRICS)))
+        self._cum_present = np.zeros((1, 0), dtype=np.int64)
+
+    # ---------- loading ----------
+    def _load(self, since=None):
+        sql, params = (
+            Select(self.source).columns("date", "fuel_type", *METRICS, "closing_stock")
+            .station(self.station).since(since).order_by("date").build()
+        )
+        # Bypass the query cache: the cube is itself the cache.
+        return repository.read_sql(sql, params, tables=[self.source], ttl=0)
+
+    def _coords(self, df):
+        rows = (df["date"] - self.origin).dt.days.to_numpy()
+        cols = df["fuel_type"].map({f: i for i, f in enumerate(self.fuels)}).to_numpy()
+        return rows, cols
+
+    def build(self):
+        df = self._load()
+        with self._lock:
+            self.fuels = sorted(df["fuel_type"].unique()) if not df.empty else []
+            self.origin = df["date"].min() if not df.empty else None
+            days = (df["date"].max() - self.origin).days + 1 if not df.empty else 0
+            self.values = np.zeros((days, len(self.fuels), len(METRICS)))
+            self.present = np.zeros((days, len(self.fuels)), dtype=bool)
+            self.closing = np.full((days, len(self.fuels)), np.nan)
+            self._write(df, 0)
+            self._dirty_since = None
+            self._built_at = time.monotonic()
+
+    def _write(self, df, start):
+        """Store ``df`` rows and recompute prefix sums from day index ``start``."""
+        if not df.empty:
+            rows, cols = self._coords(df)
+            self.values[rows, cols] = df[list(METRICS)].to_numpy(dtype=float)
+            self.present[rows, cols] = True
+            self.closing[rows, cols] = df["closing_stock"].to_numpy(dtype=float)
+
+        if start == 0 or self._cum.shape[0] != self.values.shape[0] + 1:
+            self._cum = np.concatenate([np.zeros((1,) + self.values.shape[1:]), self.values.cumsum(axis=0)])
+            self._cum_present = np.concatenate(
+                [np.zeros((1, self.present.shape[1]), dtype=np.int64), self.present.cumsum(axis=0)]
+            )
+        else:
+            self._cum[start + 1:] = self._cum[start] + self.values[start:].cumsum(axis=0)
+            self._cum_present[start + 1:] = self._cum_present[start] + self.present[start:].cumsum(axis=0)
+
+    def update(self, since):
+        """Re-read summary rows dated ``since`` or later and patch the arrays."""
+        if self.origin is None or since < self.origin.date():
+            return self.build()
+
+        df = self._load(since)
+        if not set(df["fuel_type"]) <= set(self.fuels):
+            return self.build()
+
+        with self._lock:
+            last = df["date"].max() if not df.empty else None
+            days = max(self.values.shape[0], (last - self.origin).days + 1 if last is not None else 0)
+            start = min(self._index(since), days)
+            grow = days - self.values.shape[0]
+            if grow > 0:
+                fuels = len(self.fuels)
+                self.values = np.concatenate([self.values, np.zeros((grow, fuels, len(METRICS)))])
+                self.present = np.concatenate([self.present, np.zeros((grow, fuels), dtype=bool)])
+                self.closing = np.concatenate([self.closing, np.full((grow, fuels), np.nan)])
+            self.values[start:] = 0
+            self.present[start:] = False
+            self.closing[start:] = np.nan
+            self._write(df, start)
+            self._dirty_since = None
+
+    def _on_invalidate(self, tables, since):
+        if tables is not None and not tables & repository.base_tables(self.source):
+            return
+        if since is None:
+            self._built_at = None
+        elif self._dirty_since is None or since < self._dirty_since:
+            self._dirty_since = since
+
+    def refresh(self):
+        """Bring the cube up to date: full build when stale, else patch."""
+        if self._built_at is None or time.monotonic() - self._built_at > REBUILD_INTERVAL:
+            self.build()
+        elif self._dirty_since is not None:
+            self.update(self._dirty_since)
+
+    # ---------- queries ----------
+    def _index(self, day):
+        return day.toordinal() - self.origin.toordinal()
+
+    def _span(self, start, end):
+        days = self.values.shape[0]
+        return (
+            min(max(self._index(start), 0), days),
+            min(max(self._index(end), 0), days),
+        )
+
+    def _fuel_cols(self, fuel):
+        if fuel is None:
+            return slice(None)
+        return [self.fuels.index(fuel)] if fuel in self.fuels else []
+
+    def total(self, metric, start, end, fuel=None):
+        """Sum of ``metric`` over [start, end), or None when no rows fall in it."""
+        with self._lock:
+            if self.origin is None:
+                return None
+            lo, hi = self._span(start, end)
+            cols = self._fuel_cols(fuel)
+            m = METRICS.index(metric)
+            if (self._cum_present[hi, cols] - self._cum_present[lo, cols]).sum() == 0:
+                return None
+            return float((self._cum[hi, cols, m] - self._cum[lo, cols, m]).sum())
+
+    def closing_stock(self, day, fuel=None):
+        """Closing stock recorded on ``day`` (summed over fuels), or None."""
+        with self._lock:
+            if self.origin is None:
+                return None
+            i = self._index(day)
+            if not 0 <= i < self.values.shape[0]:
+                return None
+            values = self.closing[i, self._fuel_cols(fuel)]
+        values = values[~np.isnan(values)]
+        return float(values.sum()) if values.size else None
+
+
+_cubes = OrderedDict()
+_cube_lock = threading.Lock()
+
+
+def _on_invalidate(tables, since):
+    # One listener for every cube, so a dropped cube is not kept alive.
+    with _cube_lock:
+        cubes = list(_cubes.values())
+    for cube in cubes:
+        cube._on_invalidate(tables, since)
+
+
+repository.on_invalidate(_on_invalidate)
+
+
+def get_cube(station=None):
+    """Process-wide cube for ``station`` (None: the fleet), built on first
+    use and refreshed on every call."""
+    with _cube_lock:
+        cube = _cubes.get(station)
+        if cube is None:
+            cube = _cubes[station] = MetricCube(station)
+            while len(_cubes) > MAX_CUBES:
+                _cubes.popitem(last=False)
+        else:
+            _cubes.move_to_end(station)
+    cube.refresh()
+    return cube
@@ -0,0 +1,155 @@
+"""Sorted, indexed in-memory fact tables for the dashboard pages.
+
+A ``FactStore`` holds one scope of a fact table (e.g. one station's daily
+summary) sorted by ``(fuel_type, date)``, with the row span of every fuel
+and the first row of every month within it computed once per load:
+
+- ``slice(ranges, fuels)`` binary-searches each fuel's dates, so a window
+  costs O(log n) plus the k rows returned;
+- ``period_totals(columns, periods, fuels)`` reads month totals off prefix
+  sums at the month boundaries, without touching the rows;
+- ``periods()`` / ``fuels()`` come from the precomputed boundaries.
+
+The store does not know where rows come from: it is given a ``load()``
+callable and reloads through it when marked stale (the repository keeps
+one store per table and station and marks them on ``invalidate``).
+"""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.periods import period_key
+
+
+class _Index:
+    """Immutable sorted frame plus its fuel spans and month boundaries."""
+
+    def __init__(self, df, order):
+        df = df.sort_values(["fuel_type", *order], kind="stable").reset_index(drop=True)
+        if "period" not in df.columns:
+            df["period"] = period_key(df["date"])
+        self.df = df
+        self.days = df["date"].to_numpy(dtype="datetime64[D]")
+        self.keys = df["period"].to_numpy()
+
+        fuels = df["fuel_type"].astype(str).to_numpy()
+        cuts = np.flatnonzero(fuels[1:] != fuels[:-1]) + 1
+        starts = np.concatenate([[0], cuts]) if len(df) else np.array([], dtype=int)
+        ends = np.concatenate([cuts, [len(df)]]) if len(df) else np.array([], dtype=int)
+        self.spans = {fuels[lo]: (int(lo), int(hi)) for lo, hi in zip(starts, ends)}
+
+        # First row of each (fuel, month): a change of fuel or of period key.
+        change = np.ones(len(df), dtype=bool)
+        change[1:] = (self.keys[1:] != self.keys[:-1]) | (fuels[1:] != fuels[:-1])
+        self.month_starts = np.flatnonzero(change)
+        self.month_ends = np.append(self.month_starts[1:], len(df)).astype(int)[:len(self.month_starts)]
+        self.month_fuels = fuels[self.month_starts]
+        self.month_keys = self.keys[self.month_starts]
+        self._cum = {}
+
+    def cumsum(self, column):
+        """Prefix sums of ``column`` (built on first use, then kept)."""
+        cum = self._cum.get(column)
+        if cum is None:
+            cum = np.concatenate([[0.0], self.df[column].to_numpy(dtype=float).cumsum()])
+            self._cum[column] = cum
+        return cum
+
+
+class FactStore:
+    """One scope of a fact table, reloaded through ``load()`` when stale.
+
+    ``order`` breaks ties after ``(fuel_type, date)`` (e.g. ``("id",)``);
+    ``ttl`` bounds how long a load is served without a reload, for writes
+    made by other processes.
+    """
+
+    def __init__(self, load, order=(), ttl=300):
+        self._load = load
+        self._order = ("date", *order)
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._index = None
+        self._loaded_at = None
+        self._generation = 0
+        self._loaded_generation = None
+
+    def mark_stale(self):
+        self._generation += 1
+
+    def _fresh(self):
+        return (
+            self._index is not None
+            and self._loaded_generation == self._generation
+            and time.monotonic() - self._loaded_at <= self._ttl
+        )
+
+    def index(self):
+        """The current index, reloading first when stale; concurrent
+        callers wait for the reload rather than reading the old index."""
+        if not self._fresh():
+            with self._lock:
+                if not self._fresh():
+                    # Taken before loading: a write landing mid-load leaves it stale.
+                    generation, started = self._generation, time.monotonic()
+                    index = _Index(self._load(), self._order)
+                    self._index, self._loaded_at, self._loaded_generation = index, started, generation
+        return self._index
+
+    # ---------- lookups ----------
+    def fuels(self):
+        return sorted(self.index().spans)
+
+    def periods(self):
+        """Distinct (year, month) pairs present, as ``load_periods`` returns them."""
+        keys = np.unique(self.index().month_keys)
+        return pd.DataFrame({"year": keys // 100, "month": keys % 100})
+
+    def _rows(self, ix, ranges, fuels):
+        """Row positions of ``fuels`` within ``ranges``, per fuel in date order."""
+        parts = []
+        for fuel in ix.spans if fuels is None else fuels:
+            if fuel not in ix.spans:
+                continue
+            lo, hi = ix.spans[fuel]
+            if ranges is None:
+                parts.append(np.arange(lo, hi))
+                continue
+            days = ix.days[lo:hi]
+            for start, end in ranges:
+                a = lo + np.searchsorted(days, np.datetime64(start, "D"), "left")
+                b = lo + np.searchsorted(days, np.datetime64(end, "D"), "left")
+                parts.append(np.arange(a, b))
+        return np.concatenate(parts) if parts else np.array([], dtype=int)
+
+    def slice(self, ranges=None, fuels=None, columns=None):
+        """Rows in the half-open date ``ranges`` for ``fuels`` (None: all),
+        ordered by date (then fuel)."""
+        ix = self.index()
+        rows = self._rows(ix, ranges, fuels)
+        if len(ix.spans) > 1 and (fuels is None or len(fuels) > 1):
+            rows = rows[np.argsort(ix.days[rows], kind="stable")]
+        positions = slice(None) if columns is None else [ix.df.columns.get_loc(c) for c in columns]
+        df = ix.df.iloc[rows, positions].reset_index(drop=True)
+        if "fuel_type" in df.columns and df["fuel_type"].dtype == "category":
+            df["fuel_type"] = df["fuel_type"].cat.remove_unused_categories()
+        return df
+
+    def period_totals(self, columns, periods=None, fuels=None):
+        """Sums of ``columns`` per ``YYYYMM`` period key (rows: ``periods``,
+        or every period present), read off prefix sums."""
+        ix = self.index()
+        pick = np.ones(len(ix.month_starts), dtype=bool)
+        if fuels is not None:
+            pick &= np.isin(ix.month_fuels, list(fuels))
+        if periods is not None:
+            pick &= np.isin(ix.month_keys, list(periods))
+        starts, ends, keys = ix.month_starts[pick], ix.month_ends[pick], ix.month_keys[pick]
+        totals = pd.DataFrame(
+            {column: ix.cumsum(column)[ends] - ix.cumsum(column)[starts] for column in columns},
+            index=pd.Index(keys, name="period"),
+        )
+        totals = totals.groupby(level="period").sum()
+        return totals if periods is None else totals.reindex(list(periods), fill_value=0.0)
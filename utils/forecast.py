@@ -0,0 +1,291 @@
+"""Exponential-smoothing forecasts of daily price and demand per fuel.
+
+``daily_series`` turns summary rows into one row per calendar day (days
+without sales are NaN, not zero), and ``fit`` chooses between Holt's
+linear trend and additive Holt-Winters with weekly seasonality by AIC.
+Both models are written in error-correction form::
+
+    e_t   = y_t - (l + b + s[t % m])
+    l     = l + b + alpha * e_t
+    b     = b + beta * e_t
+    s[r]  = s[r] + gamma * e_t
+
+and the recursion runs once over the series for a whole grid of
+``(alpha, beta, gamma)`` candidates at a time, as NumPy vectors, so a fit
+is one pass over the days rather than one pass per candidate. Missing days
+advance the states on the forecast alone. Prediction intervals use the
+analytic ETS(A,A,N) / ETS(A,A,A) forecast variance.
+
+``get_forecaster()`` keeps the fitted models per process: on each call the
+series is compared with what the model has already seen and only new (or
+re-written) days are folded in with the fitted parameters; parameters are
+re-estimated every ``FUEL_FORECAST_REFIT`` folded days.
+"""
+import os
+import threading
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from utils import repository
+
+SEASON = 7
+REFIT_EVERY = int(os.environ.get("FUEL_FORECAST_REFIT", 28))
+TARGETS = ("price", "demand")
+
+# Stock purchase advice: buy more below / buy minimum above these ratios
+# of the average price.
+BUY_MORE_BELOW = 0.98
+BUY_MINIMUM_ABOVE = 1.02
+
+# Candidate grid: beta and gamma are fractions of their admissible range
+# (0 < beta <= alpha, 0 <= gamma <= 1 - alpha).
+ALPHAS = np.linspace(0.05, 0.95, 10)
+BETA_FRACTIONS = np.array([0.01, 0.05, 0.1, 0.2, 0.4])
+GAMMA_FRACTIONS = np.array([0.0, 0.05, 0.1, 0.2, 0.4])
+
+
+def daily_series(df):
+    """Daily ``price`` (revenue / litres) and ``demand`` (litres) for one fuel.
+
+    ``df`` holds ``daily_fuel_summary`` rows (``repository.load_sales``);
+    the index covers every day from the first to the last row.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=list(TARGETS), index=pd.DatetimeIndex([], name="date"), dtype=float)
+    daily = df.groupby("date")[["quantity_sold", "total_amount"]].sum().astype(float)
+    daily = daily.asfreq("D")
+    litres = daily["quantity_sold"]
+    return pd.DataFrame({
+        "price": (daily["total_amount"] / litres).where(litres > 0),
+        "demand": litres,
+    })
+
+
+# ----------------------------------
+# RECURSIONS
+# ----------------------------------
+def _smooth(y, alpha, beta, gamma, level, trend, season, start=0, keep=False):
+    """Run the recursions over ``y`` for K candidates at once.
+
+    ``alpha``/``beta``/``gamma``/``level``/``trend`` have shape (K,) and
+    ``season`` (K, m); ``start`` is the day index of ``y[0]``. Returns the
+    final states and the sum of squared one-step errors per candidate; with
+    ``keep`` also the (len(y), K) history of levels, trends, the seasonal
+    value written and the errors.
+    """
+    level, trend, season = level.copy(), trend.copy(), season.copy()
+    m = season.shape[1]
+    sse = np.zeros_like(alpha)
+    observed = ~np.isnan(y)
+    if keep:
+        history = np.empty((4, len(y), len(alpha)))
+    for i in range(len(y)):
+        r = (start + i) % m
+        s = season[:, r]
+        e = y[i] - (level + trend + s) if observed[i] else np.zeros_like(alpha)
+        sse += e * e
+        level = level + trend + alpha * e
+        trend = trend + beta * e
+        season[:, r] = s + gamma * e
+        if keep:
+            history[:, i] = level, trend, season[:, r], e
+    if keep:
+        return level, trend, season, sse, history
+    return level, trend, season, sse
+
+
+def _initial(y, m=SEASON):
+    """Initial level, trend and seasonal offsets from the first two seasons."""
+    first, second = y[:m], y[m:2 * m]
+    level = np.nanmean(first)
+    trend = (np.nanmean(second) - level) / m
+    season = np.nan_to_num(first - level)
+    return level, trend, season - season.mean()
+
+
+def _grid():
+    alpha, beta, gamma = np.meshgrid(ALPHAS, BETA_FRACTIONS, GAMMA_FRACTIONS, indexing="ij")
+    alpha = alpha.ravel()
+    return alpha, alpha * beta.ravel(), (1 - alpha) * gamma.ravel()
+
+
+# ----------------------------------
+# MODEL
+# ----------------------------------
+class Model:
+    """Fitted Holt / Holt-Winters model plus its per-day state history."""
+
+    def __init__(self, seasonal, alpha, beta, gamma, init, origin, m=SEASON):
+        self.seasonal = seasonal
+        self.alpha, self.beta, self.gamma = float(alpha), float(beta), float(gamma)
+        self.m = m
+        self.origin = origin
+        self._init = init
+        self.y = np.empty(0)
+        self._history = np.empty((4, 0))
+        self.folded = 0  # observations folded in since the parameters were fitted
+
+    @property
+    def name(self):
+        return "Holt-Winters (weekly)" if self.seasonal else "Holt"
+
+    @property
+    def end(self):
+        """Date of the last observation folded in."""
+        return self.origin + pd.Timedelta(days=len(self.y) - 1)
+
+    def _state(self, k):
+        """(level, trend, season) before day index ``k``."""
+        if k == 0:
+            level, trend, season = self._init
+            return level, trend, np.array(season, dtype=float)
+        level, trend = self._history[0, k - 1], self._history[1, k - 1]
+        season = np.array(self._init[2], dtype=float)
+        last = (k - 1) - ((k - 1 - np.arange(self.m)) % self.m)
+        written = last >= 0
+        season[written] = self._history[2, last[written]]
+        return level, trend, season
+
+    def fold(self, y):
+        """Bring the model up to ``y`` (the full series from ``origin``).
+
+        Days already seen and unchanged are kept; the recursion resumes
+        from the first new or changed day. Returns the number of days folded.
+        """
+        y = np.asarray(y, dtype=float)
+        n = min(len(self.y), len(y))
+        old, new = self.y[:n], y[:n]
+        changed = np.flatnonzero((old != new) & ~(np.isnan(old) & np.isnan(new)))
+        k = int(changed[0]) if changed.size else n
+        if k == len(y) and k == len(self.y):
+            return 0
+
+        level, trend, season = self._state(k)
+        *_, history = _smooth(
+            y[k:], *(np.array([p]) for p in (self.alpha, self.beta, self.gamma, level, trend)),
+            season[None, :], start=k, keep=True,
+        )
+        self._history = np.concatenate([self._history[:, :k], history[:, :, 0]], axis=1)
+        self.y = y
+        self.folded += len(y) - k
+        return len(y) - k
+
+    def sigma2(self):
+        """Variance of the one-step errors over the observed days."""
+        errors = self._history[3][~np.isnan(self.y)]
+        return float(np.mean(errors ** 2)) if errors.size else 0.0
+
+    def forecast(self, horizon, level=0.95):
+        """``horizon`` days after ``end``: mean forecast and ``level`` interval."""
+        h = np.arange(1, horizon + 1)
+        lvl, trend, season = self._state(len(self.y))
+        mean = lvl + h * trend + season[(len(self.y) - 1 + h) % self.m]
+
+        a, b, g, m = self.alpha, self.beta, self.gamma, self.m
+        k = (h - 1) // m
+        var = self.sigma2() * (
+            1 + (h - 1) * (a ** 2 + a * b * h + b ** 2 * h * (2 * h - 1) / 6)
+            + g * k * (2 * a + g + b * m * (k + 1))
+        )
+        z = NormalDist().inv_cdf(0.5 + level / 2)
+        spread = z * np.sqrt(var)
+        index = pd.date_range(self.end + pd.Timedelta(days=1), periods=horizon, freq="D", name="date")
+        return pd.DataFrame({"forecast": mean, "lower": mean - spread, "upper": mean + spread}, index=index)
+
+
+def fit(y, origin, m=SEASON):
+    """Fit ``y`` (daily values from ``origin``, NaN for missing days).
+
+    Every grid candidate of both models runs in one vectorized pass; the
+    model with the lower AIC wins. Needs two full seasons of data.
+    """
+    y = np.asarray(y, dtype=float)
+    observed = int((~np.isnan(y)).sum())
+    if len(y) < 2 * m or observed < 2 * m:
+        raise ValueError(f"need at least {2 * m} days of data to fit, got {observed}")
+
+    level, trend, season = _initial(y, m)
+    alpha, beta, gamma = _grid()
+    seasonal = gamma > 0
+    # Non-seasonal (Holt) candidates: no seasonal offsets, no seasonal update.
+    holt = ~seasonal
+    candidates = len(alpha)
+    seasons = np.where(seasonal[:, None], season, 0.0)
+    *_, sse = _smooth(
+        y, alpha, beta, gamma, np.full(candidates, level), np.full(candidates, trend), seasons
+    )
+
+    params = np.where(seasonal, 3 + 2 + m - 1, 2 + 2)
+    aic = observed * np.log(np.maximum(sse, 1e-12) / observed) + 2 * params
+    best = int(np.argmin(aic))
+    init = (level, trend, seasons[best] if not holt[best] else np.zeros(m))
+    model = Model(bool(seasonal[best]), alpha[best], beta[best], gamma[best], init, origin, m)
+    model.fold(y)
+    model.folded = 0
+    return model
+
+
+def recommend(predicted_price, avg_price, recent_sales, avg_daily_sales):
+    """Stock purchase advice for the Prediction page: "more", "minimum" or "normal"."""
+    if predicted_price < avg_price * BUY_MORE_BELOW and recent_sales >= avg_daily_sales:
+        return "more"
+    if predicted_price > avg_price * BUY_MINIMUM_ABOVE:
+        return "minimum"
+    return "normal"
+
+
+# ----------------------------------
+# PER-PROCESS MODEL CACHE
+# ----------------------------------
+class Forecaster:
+    """Fitted models per (station, fuel, target), folded forward on every call."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+        self.fits = 0
+        self.folds = 0
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def daily(self, fuel, station=None):
+        return daily_series(repository.load_sales(fuels=[fuel], station=station))
+
+    def model(self, fuel, target, daily=None, station=None):
+        """Model for ``fuel``/``target`` at ``station`` (None: the fleet)
+        covering every day of ``daily``."""
+        daily = self.daily(fuel, station) if daily is None else daily
+        key = (station, fuel, target)
+        y = daily[target].to_numpy(dtype=float)
+        origin = daily.index[0] if len(daily) else None
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None and model.origin == origin:
+                self.folds += model.fold(y)
+                if model.folded < REFIT_EVERY:
+                    return model
+            model = fit(y, origin)
+            self.fits += 1
+            self._models[key] = model
+            return model
+
+    def forecast(self, fuel, target, horizon=7, level=0.95, daily=None, station=None):
+        return self.model(fuel, target, daily, station).forecast(horizon, level)
+
+
+_forecaster = None
+_forecaster_lock = threading.Lock()
+
+
+def get_forecaster():
+    """Process-wide forecaster; models persist across reruns and sessions."""
+    global _forecaster
+    if _forecaster is None:
+        with _forecaster_lock:
+            if _forecaster is None:
+                _forecaster = Forecaster()
+    return _forecaster
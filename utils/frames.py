@@ -0,0 +1,99 @@
+"""Compact, typed DataFrames for the dashboard datasets.
+
+Each dataset the repository serves declares its column types here, and
+``typed`` applies them once, when the rows are loaded (before they are
+cached): labels such as ``fuel_type`` become ``category`` (filters and
+group-bys then run on integer codes), integer keys are downcast to the
+narrowest integer type, dates are ``datetime64`` and an integer
+``period`` key (``YYYYMM``, see ``utils.periods.period_key``) replaces
+per-row month-name strings.
+Measures (litres, money, stock) stay ``float64``: float32 would change the
+totals the pages report.
+
+Rows and bytes of the last load of every dataset are kept for
+``memory_report()``, next to what the same rows take with the default
+``read_sql`` dtypes.
+"""
+import sys
+import threading
+
+import pandas as pd
+
+from utils.periods import period_key
+
+CATEGORY = "category"
+INT = "int"
+FLOAT = "float"
+DATE = "date"
+PERIOD = "period"  # derived from ``date``
+
+SCHEMAS = {
+    # Whole-scope fact tables held by ``utils.factstore``; the pages'
+    # datasets are slices of these and keep their dtypes.
+    "summary": {
+        "date": DATE, "fuel_type": CATEGORY, "litres": FLOAT, "revenue": FLOAT, "buying_cost": FLOAT,
+        "margin": FLOAT, "expenses": FLOAT, "profit": FLOAT, "period": PERIOD,
+    },
+    "stock": {
+        "id": INT, "date": DATE, "fuel_type": CATEGORY, "station_count": INT,
+        "opening_stock": FLOAT, "received_stock": FLOAT, "closing_stock": FLOAT, "period": PERIOD,
+    },
+    "periods": {"year": INT, "month": INT},
+    "stations": {"station_id": INT},
+}
+
+_usage = {}
+_usage_lock = threading.Lock()
+
+
+def _untyped_bytes(df, schema):
+    """Bytes the same rows take with default dtypes (object labels, int64)."""
+    total = 0
+    for column, kind in schema.items():
+        if column not in df.columns:
+            continue
+        series = df[column]
+        total += len(series) * 8
+        if kind == CATEGORY:
+            # An object column also holds a str object per row.
+            total += sum(n * sys.getsizeof(label) for label, n in series.value_counts().items())
+    other = [c for c in df.columns if c not in schema]
+    return total + int(df[other].memory_usage(index=False, deep=True).sum())
+
+
+def typed(name, df):
+    """``df`` with dataset ``name``'s declared dtypes; records its memory."""
+    schema = SCHEMAS[name]
+    for column, kind in schema.items():
+        if kind == PERIOD:
+            if "date" in df.columns:
+                df[column] = period_key(df["date"])
+            continue
+        if column not in df.columns:
+            continue
+        if kind == CATEGORY:
+            df[column] = df[column].astype("category")
+        elif kind == INT:
+            df[column] = pd.to_numeric(df[column], downcast="integer")
+        elif kind == FLOAT:
+            df[column] = df[column].astype("float64", copy=False)
+        elif kind == DATE and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column])
+
+    with _usage_lock:
+        _usage[name] = {
+            "rows": len(df),
+            "bytes": int(df.memory_usage(index=False, deep=True).sum()),
+            "untyped_bytes": int(_untyped_bytes(df, schema)),
+        }
+    return df
+
+
+def memory_report():
+    """Rows and bytes of the last load of each dataset, typed vs untyped."""
+    with _usage_lock:
+        report = pd.DataFrame.from_dict(_usage, orient="index")
+    if report.empty:
+        return pd.DataFrame(columns=["rows", "bytes", "untyped_bytes", "ratio"])
+    report["ratio"] = (report["bytes"] / report["untyped_bytes"]).round(3)
+    return report.rename_axis("dataset").sort_index()
@@ -0,0 +1,459 @@
+"""Bulk import of historical logs from CSV or Excel.
+
+The file is streamed in chunks. Each chunk is validated with vectorized
+pandas checks and written with batched ``executemany`` in its own
+transaction. Once every chunk is in, one more transaction derives what the
+forms would have produced row by row: a stock row for every sale day,
+buying prices carried forward onto sale days without one, re-posted
+closing stock and the daily summary for the imported range. A later stock
+import replaces those derived zero-receipt rows instead of being rejected
+as a duplicate of them.
+
+Expected columns (case and spacing are ignored)::
+
+    sales     date, fuel_type, quantity_sold, selling_price[, buying_price]
+    stock     date, fuel_type, received_stock
+    expenses  date, expense_type, amount
+
+Any kind may carry a ``station_id`` column; rows without one belong to the
+station the import is run for. From the command line::
+
+    python -m utils.importer sales logs/2019.csv [--station 3] [--chunksize 20000] [--dry-run]
+"""
+import argparse
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from utils import changes, ledger, repository, summary
+from utils.db import bulk_insert, get_connection
+from utils.query import Select, statement
+from utils.stations import DEFAULT_STATION, STATIONS_TABLE
+
+FUEL_TYPES = ("Petrol", "Diesel")
+CHUNKSIZE = int(os.environ.get("FUEL_IMPORT_CHUNKSIZE", 20000))
+
+KINDS = {
+    "sales": {
+        "columns": ["date", "fuel_type", "quantity_sold", "selling_price"],
+        "optional": ["buying_price", "station_id"],
+        "positive": ["quantity_sold", "selling_price", "buying_price"],
+        "key": ["station_id", "date", "fuel_type"],
+        "tables": ("fuel_sales", "fuel_price", "fuel_stock"),
+    },
+    "stock": {
+        "columns": ["date", "fuel_type", "received_stock"],
+        "optional": ["station_id"],
+        "non_negative": ["received_stock"],
+        "key": ["station_id", "date", "fuel_type"],
+        "tables": ("fuel_stock",),
+    },
+    "expenses": {
+        "columns": ["date", "expense_type", "amount"],
+        "optional": ["station_id"],
+        "positive": ["amount"],
+        "key": ["station_id", "date", "expense_type"],
+        "tables": ("expenses",),
+    },
+}
+
+# Table the duplicate check looks in for each kind.
+_TARGET = {"sales": "fuel_sales", "stock": "fuel_stock", "expenses": "expenses"}
+
+
+@dataclass
+class ImportReport:
+    kind: str
+    rows_read: int = 0
+    rows_written: int = 0
+    errors: list = field(default_factory=list)  # (file row, message)
+    start: object = None  # first imported date
+    end: object = None  # last imported date
+    stations: set = field(default_factory=set)  # station ids written
+    derived_stock_rows: int = 0
+    derived_prices: int = 0
+    seconds: float = 0.0
+
+    def error_frame(self):
+        return pd.DataFrame(self.errors, columns=["row", "error"])
+
+
+# ----------------------------------
+# READING
+# ----------------------------------
+def _normalize_columns(df):
+    df.columns = [str(c).strip().lower().replace(" ", "_") for c in df.columns]
+    return df
+
+
+def read_chunks(source, chunksize=CHUNKSIZE, name=None):
+    """Yield DataFrame chunks of ``source`` (a path or an uploaded file).
+
+    CSV is streamed; Excel workbooks cannot be read incrementally, so the
+    first sheet is loaded once and then sliced.
+    """
+    name = (name or getattr(source, "name", None) or str(source)).lower()
+    if name.endswith((".xlsx", ".xlsm", ".xls")):
+        df = _normalize_columns(pd.read_excel(source))
+        for lo in range(0, len(df), chunksize):
+            yield df.iloc[lo:lo + chunksize]
+        return
+    for chunk in pd.read_csv(source, chunksize=chunksize, skipinitialspace=True):
+        yield _normalize_columns(chunk)
+
+
+# ----------------------------------
+# VALIDATION
+# ----------------------------------
+def _key_hashes(df, kind):
+    """One uint64 per row identifying its duplicate-check key."""
+    return pd.util.hash_pandas_object(df[KINDS[kind]["key"]], index=False).to_numpy()
+
+
+def validate(chunk, kind, seen=None, first_row=2, station=DEFAULT_STATION):
+    """Split ``chunk`` into (clean rows, [(row number, message)]).
+
+    ``seen`` holds the key hashes accepted from earlier chunks; a key found
+    there, or repeated within the chunk, is a duplicate. Row numbers are
+    ``index + first_row`` (file lines after the header by default). Rows
+    without a ``station_id`` belong to ``station``.
+    """
+    spec = KINDS[kind]
+    missing = [c for c in spec["columns"] if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"missing column(s) for {kind} import: {', '.join(missing)}")
+
+    df = chunk[[c for c in spec["columns"] + spec["optional"] if c in chunk.columns]].copy()
+    rows = df.index + first_row
+    problems = []
+
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    problems.append((df["date"].isna(), "invalid date"))
+
+    if "station_id" in df.columns:
+        raw = df["station_id"]
+        blank = raw.isna() | raw.astype(str).str.strip().isin(["", "nan"])
+        ids = pd.to_numeric(raw, errors="coerce")
+        bad = ~blank & (ids.isna() | ids.le(0) | ids.mod(1).ne(0))
+        problems.append((bad, "station_id must be a whole number greater than zero"))
+        # Rejected rows keep the default so the key hashes stay integral.
+        df["station_id"] = ids.where(~blank & ~bad, station).astype("int64")
+    else:
+        df["station_id"] = station
+
+    if "fuel_type" in df.columns:
+        df["fuel_type"] = df["fuel_type"].astype(str).str.strip().str.title()
+        problems.append((~df["fuel_type"].isin(FUEL_TYPES), "unknown fuel type"))
+    if "expense_type" in df.columns:
+        df["expense_type"] = df["expense_type"].astype(str).str.strip()
+        problems.append((df["expense_type"].isin(["", "nan"]), "missing expense type"))
+
+    for col in spec.get("positive", []) + spec.get("non_negative", []):
+        if col not in df.columns:
+            continue
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+        # Optional columns may be blank; required ones may not.
+        bad = df[col].isna() if col not in spec["optional"] else pd.Series(False, index=df.index)
+        if col in spec.get("positive", []):
+            bad |= df[col].le(0)
+            problems.append((bad, f"{col} must be a number greater than zero"))
+        else:
+            bad |= df[col].lt(0)
+            problems.append((bad, f"{col} must be a number, zero or more"))
+
+    keys = _key_hashes(df, kind)
+    duplicate = pd.Series(pd.Index(keys).duplicated(keep="first"), index=df.index)
+    if seen is not None and len(seen):
+        duplicate |= np.isin(keys, seen)
+    problems.append((duplicate, f"duplicate {' / '.join(spec['key'])}"))
+
+    bad = pd.Series(False, index=df.index)
+    errors = []
+    for mask, message in problems:
+        mask = mask.fillna(False).astype(bool)
+        errors += [(int(r), message) for r in rows[mask.to_numpy()]]
+        bad |= mask
+    return df[~bad], errors
+
+
+def reject_existing(conn, kind, df):
+    """Drop validated rows whose key is already stored or whose station is
+    not registered; returns (rows, errors)."""
+    if df.empty:
+        return df, []
+    known = pd.read_sql(text(f"SELECT station_id FROM {STATIONS_TABLE}"), conn)["station_id"]
+    unknown = ~df["station_id"].isin(known)
+    errors = [(int(r) + 2, "unknown station") for r in df.index[unknown]]
+    df = df[~unknown]
+    if df.empty:
+        return df, errors
+    key = KINDS[kind]["key"]
+    select = Select(_TARGET[kind]).columns(*key)
+    if kind == "stock":
+        select.columns("received_stock")
+    sql, params = select.during([(df["date"].min().date(), df["date"].max().date() + timedelta(days=1))]).build()
+    stored = pd.read_sql(text(sql), conn, params=params)
+    if kind == "stock":
+        # Zero-receipt rows derived for sale days are filled in, not duplicates.
+        stored = stored[stored["received_stock"].astype(float) != 0]
+    if stored.empty:
+        return df, errors
+    stored["date"] = pd.to_datetime(stored["date"])
+    found = np.isin(_key_hashes(df, kind), _key_hashes(stored, kind))
+    return df[~found], errors + [(int(r) + 2, "already in the database") for r in df.index[found]]
+
+
+# ----------------------------------
+# WRITING
+# ----------------------------------
+def _dated(df):
+    return df.assign(date=df["date"].dt.date)
+
+
+def stations_of(frames):
+    """Station ids present in ``{kind: rows}`` frames (the default when absent)."""
+    return sorted({int(s) for df in frames.values() for s in _station_ids(df)})
+
+
+def _station_ids(df):
+    # Journal entries queued before stations existed carry none.
+    if "station_id" not in df.columns:
+        return pd.Series(DEFAULT_STATION, index=df.index, dtype="int64")
+    return df["station_id"].fillna(DEFAULT_STATION).astype("int64")
+
+
+def write_chunk(conn, kind, df):
+    """Batched INSERTs for one validated chunk on the caller's transaction."""
+    if df.empty:
+        return 0
+    df = df.assign(station_id=_station_ids(df))
+    if kind == "sales":
+        sales = df.assign(total_amount=df["quantity_sold"] * df["selling_price"])
+        bulk_insert(conn, "fuel_sales", _dated(
+            sales[["station_id", "date", "fuel_type", "quantity_sold", "selling_price", "total_amount"]]
+        ))
+        if "buying_price" in df.columns:
+            _replace_prices(
+                conn, df.dropna(subset=["buying_price"])[["station_id", "date", "fuel_type", "buying_price"]]
+            )
+    elif kind == "stock":
+        _drop_placeholders(conn, df)
+        stock = df.assign(opening_stock=0.0, closing_stock=0.0)
+        bulk_insert(conn, "fuel_stock", _dated(
+            stock[["station_id", "date", "fuel_type", "opening_stock", "received_stock", "closing_stock"]]
+        ))
+    else:
+        bulk_insert(conn, "expenses", _dated(df[["station_id", "date", "expense_type", "amount"]]))
+    return len(df)
+
+
+def _replace_prices(conn, prices):
+    """Upsert ``fuel_price`` portably: delete the keys already stored, then insert."""
+    if prices.empty:
+        return
+    key = ["station_id", "date", "fuel_type"]
+    prices = prices.drop_duplicates(key, keep="last")
+    window = [(prices["date"].min().date(), prices["date"].max().date() + timedelta(days=1))]
+    stored = _frame(conn, *Select("fuel_price").columns(*key).during(window)
+                    .stations(prices["station_id"].unique()).build())
+    clash = prices.merge(stored, on=key)
+    if not clash.empty:
+        conn.execute(
+            text("DELETE FROM fuel_price WHERE station_id = :station_id AND date = :date AND fuel_type = :fuel_type"),
+            _dated(clash[key]).to_dict("records"),
+        )
+    bulk_insert(conn, "fuel_price", _dated(prices))
+
+
+def _drop_placeholders(conn, stock):
+    """Delete the zero-receipt rows ``_fill_stock_rows`` derived on the days
+    ``stock`` brings entries for; the caller re-posts the ledger."""
+    key = ["station_id", "date", "fuel_type"]
+    window = [(stock["date"].min().date(), stock["date"].max().date() + timedelta(days=1))]
+    stored = _frame(conn, *Select("fuel_stock").columns("id", *key, "received_stock").during(window)
+                    .stations(stock["station_id"].unique()).build())
+    zero = stored[stored["received_stock"].astype(float) == 0].merge(stock[key].drop_duplicates(), on=key)
+    if not zero.empty:
+        conn.execute(text("DELETE FROM fuel_stock WHERE id = :id"), [{"id": int(i)} for i in zero["id"]])
+
+
+# ----------------------------------
+# DERIVATION
+# ----------------------------------
+def _frame(conn, sql, params):
+    stmt, bind = statement(sql, params)
+    df = pd.read_sql(stmt, conn, params=bind)
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def _sale_days(conn, table, start, end, stations):
+    key = ["station_id", "date", "fuel_type"]
+    return _frame(conn, *Select(table).columns(*key).during([(start, end)]).stations(stations)
+                  .group_by(*key).build())
+
+
+def _fill_stock_rows(conn, start, end, stations):
+    """Zero-receipt stock rows for sale days that have none, so the ledger posts them."""
+    sold = _sale_days(conn, "fuel_sales", start, end, stations)
+    stocked = _sale_days(conn, "fuel_stock", start, end, stations)
+    missing = sold.merge(stocked, how="left", indicator=True).query("_merge == 'left_only'")
+    zero = missing[["station_id", "date", "fuel_type"]].assign(
+        opening_stock=0.0, received_stock=0.0, closing_stock=0.0
+    )
+    return bulk_insert(conn, "fuel_stock", _dated(zero))
+
+
+def _fill_prices(conn, start, end, stations):
+    """Carry each station's last known buying price forward onto its sale
+    days without one."""
+    key = ["station_id", "date", "fuel_type"]
+    sold = _sale_days(conn, "fuel_sales", start, end, stations)
+    known = [_frame(conn, *Select("fuel_price").columns(*key, "buying_price")
+                    .during([(start, end)]).stations(stations).build())]
+    for station in stations:
+        for fuel in FUEL_TYPES:
+            known.append(_frame(conn, """
+                SELECT station_id, date, fuel_type, buying_price FROM fuel_price
+                WHERE station_id = :station AND fuel_type = :fuel AND date < :start
+                ORDER BY date DESC LIMIT 1
+            """, {"station": station, "fuel": fuel, "start": start}))
+    known = pd.concat(known, ignore_index=True)
+    missing = sold.merge(known[key], how="left", indicator=True).query("_merge == 'left_only'")
+    if missing.empty or known.empty:
+        return 0
+    filled = pd.merge_asof(
+        missing[key].sort_values("date"),
+        known.sort_values("date"),
+        on="date", by=["station_id", "fuel_type"], direction="backward",
+    ).dropna(subset=["buying_price"])
+    # Only days without a stored price are filled, so a plain insert suffices.
+    return bulk_insert(conn, "fuel_price", _dated(filled[[*key, "buying_price"]]))
+
+
+def derive(conn, kinds, start, end, stations):
+    """Stock rows, prices, ledger balances and summary rows of ``stations``
+    for [start, end] after writing the given ``kinds`` of rows."""
+    stop = end + timedelta(days=1)
+    stations = sorted(int(s) for s in stations)
+    stock_rows = prices = 0
+    if "sales" in kinds:
+        stock_rows = _fill_stock_rows(conn, start, stop, stations)
+        prices = _fill_prices(conn, start, stop, stations)
+    posted = "sales" in kinds or "stock" in kinds
+    if posted:
+        for station in stations:
+            for fuel in FUEL_TYPES:
+                ledger.post(conn, station, fuel, start, fleet=False)
+    summary.rebuild(conn, start, stop, stations)
+    if posted:
+        # Re-posting cascades closing stock past the window.
+        summary.rebuild_fleet(conn, stop, None)
+    written = {t for kind in kinds for t in KINDS[kind]["tables"]} | {summary.SUMMARY_TABLE, summary.FLEET_TABLE}
+    changes.record(conn, written | ({ledger.BALANCE_TABLE} if posted else set()), start)
+    return stock_rows, prices
+
+
+# ----------------------------------
+# DRIVER
+# ----------------------------------
+def run_import(source, kind, chunksize=CHUNKSIZE, dry_run=False, name=None, progress=None,
+               station=DEFAULT_STATION):
+    """Import ``source`` as ``kind``; returns an ``ImportReport``.
+
+    Rows without a ``station_id`` column belong to ``station``. Invalid rows
+    are skipped and listed in the report. ``progress`` is called with the
+    report after every chunk.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"unknown import kind: {kind}")
+    started = time.perf_counter()
+    report = ImportReport(kind)
+    engine = get_connection()
+    seen = None
+
+    for chunk in read_chunks(source, chunksize, name):
+        report.rows_read += len(chunk)
+        with engine.begin() as conn:
+            clean, errors = validate(chunk, kind, seen, station=station)
+            clean, stored = reject_existing(conn, kind, clean)
+            report.errors += sorted(errors + stored)
+            if not dry_run:
+                report.rows_written += write_chunk(conn, kind, clean)
+        if not clean.empty:
+            keys = _key_hashes(clean, kind)
+            seen = keys if seen is None else np.concatenate([seen, keys])
+            first, last = clean["date"].min().date(), clean["date"].max().date()
+            report.start = first if report.start is None else min(report.start, first)
+            report.end = last if report.end is None else max(report.end, last)
+            report.stations |= set(clean["station_id"].astype(int))
+        if progress:
+            progress(report)
+
+    if report.rows_written:
+        with engine.begin() as conn:
+            report.derived_stock_rows, report.derived_prices = derive(
+                conn, [kind], report.start, report.end, report.stations
+            )
+        repository.invalidate(*KINDS[kind]["tables"], since=report.start)
+
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def write_batch(frames):
+    """Persist validated ``{kind: rows}`` frames together in one transaction.
+
+    Used by the grid entry mode: every INSERT, the ledger re-post and the
+    summary refresh share one commit, followed by a single invalidation.
+    Returns the number of rows written.
+    """
+    frames = {kind: df for kind, df in frames.items() if not df.empty}
+    if not frames:
+        return 0
+    dates = pd.concat([df["date"] for df in frames.values()])
+    start, end = dates.min().date(), dates.max().date()
+    with get_connection().begin() as conn:
+        written = sum(write_chunk(conn, kind, df) for kind, df in frames.items())
+        derive(conn, frames, start, end, stations_of(frames))
+    repository.invalidate(*{t for kind in frames for t in KINDS[kind]["tables"]}, since=start)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-import historical logs from CSV or Excel.")
+    parser.add_argument("kind", choices=sorted(KINDS))
+    parser.add_argument("path")
+    parser.add_argument("--station", type=int, default=DEFAULT_STATION,
+                        help=f"station of rows without a station_id column (default {DEFAULT_STATION})")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    parser.add_argument("--dry-run", action="store_true", help="validate only, write nothing")
+    args = parser.parse_args(argv)
+
+    def progress(report):
+        print(f"\r{report.rows_read:,} rows read", end="", file=sys.stderr)
+
+    report = run_import(args.path, args.kind, args.chunksize, args.dry_run, progress=progress, station=args.station)
+    print(file=sys.stderr)
+    for row, message in report.errors[:20]:
+        print(f"row {row}: {message}", file=sys.stderr)
+    if len(report.errors) > 20:
+        print(f"... {len(report.errors) - 20} more", file=sys.stderr)
+    print(
+        f"{args.kind}: {report.rows_read:,} read, {report.rows_written:,} written, "
+        f"{len(report.errors):,} rejected in {report.seconds:.1f}s"
+        + (f" ({report.start} to {report.end})" if report.start else "")
+    )
+    if report.derived_stock_rows or report.derived_prices:
+        print(f"derived: {report.derived_stock_rows} stock rows, {report.derived_prices} buying prices")
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
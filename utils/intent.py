@@ -0,0 +1,296 @@
+"""Single-pass intent parser for chatbot questions.
+
+``parse("petrol vs diesel profit in Q1 2025")`` tokenizes the text once with
+a regex compiled at import, classifies each word through a lookup table
+(whole words only, so "margin" is not read as "mar"), and returns an
+``Intent``: metrics, fuels, a half-open date range, the grain of that range,
+any breakdown and any comparison.
+
+Supported period phrasings::
+
+    on 2024-02-10 | today | yesterday
+    march 2025 | mar | Q1 2025 | 2025 | this month | last year
+    last 7 days | past 2 weeks | last 3 months (calendar months incl. current)
+    between 2025-01-01 and 2025-01-15 | from jan to mar 2025
+    2024 vs 2025 | petrol vs diesel
+    each month of 2025 | monthly | per fuel | by day
+"""
+import re
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from utils.periods import next_month
+
+TOKEN_RE = re.compile(
+    r"(?P<date>\d{4}-\d{2}-\d{2})"
+    r"|(?P<quarter>\bq[1-4]\b)"
+    r"|(?P<year>\b(?:19|20)\d{2}\b)"
+    r"|(?P<number>\b\d+\b)"
+    r"|(?P<word>[a-z]+)"
+)
+
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3,
+    "april": 4, "apr": 4, "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7,
+    "august": 8, "aug": 8, "september": 9, "sep": 9, "sept": 9,
+    "october": 10, "oct": 10, "november": 11, "nov": 11, "december": 12, "dec": 12,
+}
+
+FUELS = {"petrol": "Petrol", "diesel": "Diesel"}
+
+METRICS = {
+    "profit": "profit", "profits": "profit",
+    "revenue": "revenue", "revenues": "revenue", "income": "revenue", "turnover": "revenue",
+    "sales": "sales", "sale": "sales", "sold": "sales", "sell": "sales", "litres": "sales", "liters": "sales", "volume": "sales",
+    "expense": "expenses", "expenses": "expenses", "cost": "expenses", "costs": "expenses", "spent": "expenses",
+    "margin": "margin", "margins": "margin",
+    "stock": "stock", "inventory": "stock",
+}
+
+UNITS = {
+    "day": "day", "days": "day", "week": "week", "weeks": "week",
+    "month": "month", "months": "month", "quarter": "quarter", "quarters": "quarter",
+    "year": "year", "years": "year", "fuel": "fuel", "fuels": "fuel",
+}
+
+# Adjectives that request a breakdown on their own ("monthly profit").
+BREAKDOWNS = {
+    "daily": "day", "weekly": "week", "monthly": "month",
+    "quarterly": "quarter", "yearly": "year", "annual": "year",
+}
+
+KEYWORDS = {
+    "last": "last", "past": "last", "previous": "previous", "this": "this", "current": "this",
+    "between": "between", "from": "between", "and": "and", "to": "and", "till": "and", "until": "and",
+    "vs": "vs", "versus": "vs", "compare": "vs", "compared": "vs", "against": "vs",
+    "each": "each", "every": "each", "per": "each", "by": "each", "breakdown": "each", "wise": "wise",
+    "today": "today", "yesterday": "yesterday",
+}
+
+# One table, one lookup per word.
+LEXICON = {}
+LEXICON.update({w: ("month", v) for w, v in MONTHS.items()})
+LEXICON.update({w: ("fuel", v) for w, v in FUELS.items()})
+LEXICON.update({w: ("metric", v) for w, v in METRICS.items()})
+LEXICON.update({w: ("unit", v) for w, v in UNITS.items()})
+LEXICON.update({w: ("breakdown", v) for w, v in BREAKDOWNS.items()})
+LEXICON.update({w: ("kw", v) for w, v in KEYWORDS.items()})
+
+
+@dataclass
+class Period:
+    start: date
+    end: date  # exclusive
+    grain: str
+    label: str
+
+
+@dataclass
+class Intent:
+    metrics: list = field(default_factory=list)
+    fuels: list = field(default_factory=list)
+    start: date = None
+    end: date = None
+    grain: str = None
+    label: str = None
+    group_by: list = field(default_factory=list)
+    comparison: str = None
+    periods: list = field(default_factory=list)
+
+    @property
+    def metric(self):
+        return self.metrics[0] if self.metrics else None
+
+    @property
+    def fuel(self):
+        return self.fuels[0] if len(self.fuels) == 1 else None
+
+    @property
+    def period(self):
+        return Period(self.start, self.end, self.grain, self.label)
+
+
+def tokenize(text):
+    """(kind, value) pairs for ``text``; unknown words are dropped."""
+    tokens = []
+    for m in TOKEN_RE.finditer(text.lower()):
+        kind = m.lastgroup
+        value = m.group()
+        if kind == "word":
+            hit = LEXICON.get(value)
+            if hit is not None:
+                tokens.append(hit)
+        elif kind == "date":
+            try:
+                tokens.append(("date", date.fromisoformat(value)))
+            except ValueError:
+                pass
+        elif kind == "quarter":
+            tokens.append(("quarter", int(value[1])))
+        else:
+            tokens.append((kind, int(value)))
+    return tokens
+
+
+def _day(d):
+    return Period(d, d + timedelta(days=1), "day", d.isoformat())
+
+
+def _month(year, month):
+    return Period(date(year, month, 1), next_month(year, month), "month", f"{year}-{month:02d}")
+
+
+def _quarter(year, q):
+    first = 3 * (q - 1) + 1
+    return Period(date(year, first, 1), next_month(year, first + 2), "quarter", f"Q{q} {year}")
+
+
+def _year(year):
+    return Period(date(year, 1, 1), date(year + 1, 1, 1), "year", str(year))
+
+
+def _add_months(d, n):
+    total = d.year * 12 + d.month - 1 + n
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def _relative(keyword, count, unit, today):
+    """Period for "last 7 days", "past 2 weeks", "this month", "last year"..."""
+    if unit == "day":
+        n = count or 1
+        return Period(today - timedelta(days=n - 1), today + timedelta(days=1), "range", f"last {n} days")
+    if unit == "week":
+        n = count or 1
+        return Period(today - timedelta(days=7 * n - 1), today + timedelta(days=1), "range", f"last {n} weeks")
+
+    this = {"month": date(today.year, today.month, 1), "year": date(today.year, 1, 1)}
+    if unit == "quarter":
+        this["quarter"] = date(today.year, 3 * ((today.month - 1) // 3) + 1, 1)
+    if unit not in this:
+        return None
+    step = {"month": 1, "quarter": 3, "year": 12}[unit]
+    if keyword == "this":
+        return Period(this[unit], _add_months(this[unit], step), unit, f"this {unit}")
+    if count:
+        return Period(_add_months(this[unit], -step * (count - 1)), _add_months(this[unit], step),
+                      "range", f"last {count} {unit}s")
+    prev = _add_months(this[unit], -step)
+    return Period(prev, this[unit], unit, f"last {unit}")
+
+
+def _bind_year(periods, pending, year):
+    """Resolve year-less month/quarter atoms ("from jan to mar 2025")."""
+    for slot, kind, value in pending:
+        periods[slot] = _month(year, value) if kind == "month" else _quarter(year, value)
+    pending.clear()
+
+
+def parse(text, today=None):
+    """Parse ``text`` into an ``Intent`` in a single pass over its tokens."""
+    today = today or date.today()
+    tokens = tokenize(text)
+    intent = Intent()
+    periods = []           # Period, or None while a month/quarter awaits its year
+    pending = []           # (slot, kind, value) of those awaiting atoms
+    saw_between = saw_vs = False
+    i, n = 0, len(tokens)
+
+    while i < n:
+        kind, value = tokens[i]
+        nxt = tokens[i + 1] if i + 1 < n else (None, None)
+
+        if kind == "metric":
+            if value not in intent.metrics:
+                intent.metrics.append(value)
+        elif kind == "fuel":
+            if value not in intent.fuels:
+                intent.fuels.append(value)
+        elif kind == "date":
+            periods.append(_day(value))
+        elif kind in ("month", "quarter"):
+            pending.append((len(periods), kind, value))
+            periods.append(None)
+            if nxt[0] == "year":
+                _bind_year(periods, pending, nxt[1])
+                i += 1
+        elif kind == "year":
+            if pending:
+                _bind_year(periods, pending, value)
+            else:
+                periods.append(_year(value))
+        elif kind == "kw":
+            if value in ("last", "previous", "this"):
+                count = nxt[1] if nxt[0] == "number" else None
+                j = i + (2 if count else 1)
+                if j < n and tokens[j][0] == "unit":
+                    period = _relative(value, count, tokens[j][1], today)
+                    if period is not None:
+                        periods.append(period)
+                        i = j
+            elif value == "today":
+                periods.append(_day(today))
+            elif value == "yesterday":
+                periods.append(_day(today - timedelta(days=1)))
+            elif value == "between":
+                saw_between = True
+            elif value == "vs":
+                saw_vs = True
+            elif value == "each" and nxt[0] == "unit":
+                if nxt[1] not in intent.group_by:
+                    intent.group_by.append(nxt[1])
+                i += 1
+            elif value == "wise" and i and tokens[i - 1][0] == "unit":
+                # "fuel wise", "month wise"
+                if tokens[i - 1][1] not in intent.group_by:
+                    intent.group_by.append(tokens[i - 1][1])
+        elif kind == "breakdown":
+            if value not in intent.group_by:
+                intent.group_by.append(value)
+        i += 1
+
+    # Month/quarter names with no year anywhere default to the current year.
+    _bind_year(periods, pending, today.year)
+    periods = [p for p in periods if p is not None]
+
+    if saw_vs and len(intent.fuels) > 1:
+        intent.comparison = "fuel"
+    elif saw_vs and len(periods) > 1:
+        intent.comparison = "period"
+        intent.periods = periods
+    if "fuel" in intent.group_by and len(intent.fuels) < 2:
+        intent.comparison = "fuel"
+        intent.group_by.remove("fuel")
+
+    if saw_between and len(periods) >= 2:
+        first, last = periods[0], periods[-1]
+        periods = [Period(first.start, last.end, "range", f"{first.label} to {last.label}")]
+    if periods:
+        span = periods[0] if len(periods) == 1 or intent.comparison != "period" else Period(
+            min(p.start for p in periods), max(p.end for p in periods), "range",
+            " vs ".join(p.label for p in periods),
+        )
+        intent.start, intent.end, intent.grain, intent.label = span.start, span.end, span.grain, span.label
+    return intent
+
+
+def buckets(start, end, unit):
+    """Split [start, end) into calendar ``unit`` periods for a breakdown."""
+    out = []
+    if unit in ("day", "week"):
+        step = timedelta(days=1 if unit == "day" else 7)
+        d = start
+        while d < end:
+            nxt = min(d + step, end)
+            out.append(Period(d, nxt, unit, d.isoformat()))
+            d = nxt
+        return out
+
+    make = {"month": lambda d: _month(d.year, d.month),
+            "quarter": lambda d: _quarter(d.year, (d.month - 1) // 3 + 1),
+            "year": lambda d: _year(d.year)}[unit]
+    d = start
+    while d < end:
+        p = make(d)
+        out.append(Period(max(p.start, start), min(p.end, end), unit, p.label))
+        d = p.end
+    return out
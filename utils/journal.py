@@ -0,0 +1,294 @@
+"""Write-behind journal for data-entry saves.
+
+Save buttons append their rows to a local SQLite journal (WAL mode,
+``synchronous=FULL``) and return as soon as that append is durable. A
+background writer thread drains pending entries to the main database in
+batches, through the same code path as bulk imports
+(``importer.write_chunk`` + ``importer.derive``), so ledger balances and the
+daily summary stay consistent.
+
+Every entry carries an idempotency key that is recorded in
+``applied_writes`` inside the same transaction as its rows, so an entry
+replayed after a crash (applied, but not yet marked done locally) is
+skipped instead of duplicated. Connection failures are retried with
+backoff indefinitely; any other error counts as an attempt, and after
+``FUEL_JOURNAL_MAX_ATTEMPTS`` the entry is parked as failed (never
+deleted) until someone retries it. Applied entries are kept for
+``FUEL_JOURNAL_KEEP_DAYS`` and then pruned by the writer thread.
+
+Set ``FUEL_WRITE_BEHIND=0`` to write synchronously instead.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from utils import importer, repository, schema
+from utils.db import get_connection
+from utils.query import statement
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+ENABLED = os.environ.get("FUEL_WRITE_BEHIND", "1") not in ("0", "false", "no")
+JOURNAL_PATH = os.environ.get("FUEL_JOURNAL_PATH", os.path.join(ROOT, "journal.db"))
+BATCH_SIZE = int(os.environ.get("FUEL_JOURNAL_BATCH", 50))
+MAX_ATTEMPTS = int(os.environ.get("FUEL_JOURNAL_MAX_ATTEMPTS", 5))
+POLL_INTERVAL = float(os.environ.get("FUEL_JOURNAL_POLL", 2))
+MAX_BACKOFF = 60
+OFFLINE_RETRY = 5  # seconds between attempts while the database is unreachable
+KEEP_DAYS = float(os.environ.get("FUEL_JOURNAL_KEEP_DAYS", 7))
+PRUNE_INTERVAL = 3600  # seconds between prunes of applied entries
+
+KEYS_TABLE = schema.applied_writes.name
+
+CREATE_SQL = """
+    CREATE TABLE IF NOT EXISTS journal (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        key TEXT NOT NULL UNIQUE,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        created_at REAL NOT NULL,
+        next_attempt_at REAL NOT NULL,
+        done_at REAL
+    )
+"""
+
+
+def _encode(frames):
+    """JSON payload for ``{kind: DataFrame}``; dates become ISO strings."""
+    out = {}
+    for kind, df in frames.items():
+        if df.empty:
+            continue
+        df = df.assign(date=pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d"))
+        out[kind] = df.astype(object).where(df.notna(), None).to_dict("records")
+    return json.dumps(out)
+
+
+def _decode(payload):
+    frames = {}
+    for kind, rows in json.loads(payload).items():
+        df = pd.DataFrame(rows)
+        df["date"] = pd.to_datetime(df["date"])
+        frames[kind] = df
+    return frames
+
+
+def _transient(exc):
+    """True for errors worth retrying forever (the database is unreachable)."""
+    return isinstance(exc, OperationalError) or (
+        isinstance(exc, DBAPIError) and exc.connection_invalidated
+    )
+
+
+class Journal:
+    """Durable local queue of pending writes plus its background drainer."""
+
+    def __init__(self, path):
+        self.path = path
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pruned_at = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(CREATE_SQL)
+            db.execute("CREATE INDEX IF NOT EXISTS ix_journal_status ON journal (status, next_attempt_at)")
+
+    @contextmanager
+    def _connect(self):
+        """Journal connection; commits on success and is always closed."""
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            db.execute("PRAGMA synchronous=FULL")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    # ---------- producer ----------
+    def append(self, frames):
+        """Durably queue ``{kind: rows}`` frames; returns the idempotency key."""
+        key = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO journal (key, payload, created_at, next_attempt_at) VALUES (?, ?, ?, ?)",
+                (key, _encode(frames), now, now),
+            )
+        self._wake.set()
+        return key
+
+    def counts(self):
+        with self._connect() as db:
+            rows = dict(db.execute("SELECT status, COUNT(*) FROM journal GROUP BY status").fetchall())
+        return {"pending": rows.get("pending", 0), "failed": rows.get("failed", 0), "done": rows.get("done", 0)}
+
+    def failures(self, limit=50):
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT id, created_at, attempts, last_error FROM journal WHERE status = 'failed' ORDER BY id LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [
+            {"id": i, "queued": datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S"),
+             "attempts": a, "error": e}
+            for i, t, a, e in rows
+        ]
+
+    def retry_failed(self):
+        """Move failed entries back to pending with a fresh attempt budget."""
+        with self._connect() as db:
+            n = db.execute(
+                "UPDATE journal SET status = 'pending', attempts = 0, next_attempt_at = ? WHERE status = 'failed'",
+                (time.time(),),
+            ).rowcount
+        self._wake.set()
+        return n
+
+    def prune(self, older_than=7 * 86400):
+        """Delete entries applied more than ``older_than`` seconds ago."""
+        with self._connect() as db:
+            n = db.execute(
+                "DELETE FROM journal WHERE status = 'done' AND done_at < ?", (time.time() - older_than,)
+            ).rowcount
+        return n
+
+    # ---------- consumer ----------
+    def _due(self):
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT id, key, payload, attempts FROM journal "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (time.time(), BATCH_SIZE),
+            ).fetchall()
+        return rows
+
+    def _mark_done(self, ids):
+        with self._connect() as db:
+            db.executemany(
+                "UPDATE journal SET status = 'done', done_at = ?, last_error = NULL WHERE id = ?",
+                [(time.time(), i) for i in ids],
+            )
+
+    def _mark_error(self, entries, exc):
+        transient = _transient(exc)
+        now = time.time()
+        updates = []
+        for entry_id, _, _, attempts in entries:
+            attempts = attempts if transient else attempts + 1
+            status = "failed" if attempts >= MAX_ATTEMPTS else "pending"
+            delay = OFFLINE_RETRY if transient else min(MAX_BACKOFF, 2 ** min(attempts, 6))
+            updates.append((status, attempts, str(exc)[:500], now + delay, entry_id))
+        with self._connect() as db:
+            db.executemany(
+                "UPDATE journal SET status = ?, attempts = ?, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                updates,
+            )
+
+    def _apply(self, entries):
+        """Apply ``entries`` in one transaction, skipping keys already applied."""
+        keys = [key for _, key, _, _ in entries]
+        with get_connection().begin() as conn:
+            applied = {row[0] for row in conn.execute(*statement(
+                f"SELECT idempotency_key FROM {KEYS_TABLE} WHERE idempotency_key IN :keys", {"keys": keys}
+            ))}
+            fresh = [e for e in entries if e[1] not in applied]
+
+            merged = {}
+            for _, _, payload, _ in fresh:
+                for kind, df in _decode(payload).items():
+                    merged.setdefault(kind, []).append(df)
+            frames = {kind: pd.concat(dfs, ignore_index=True) for kind, dfs in merged.items()}
+
+            start = None
+            if frames:
+                for kind, df in frames.items():
+                    importer.write_chunk(conn, kind, df)
+                dates = pd.concat([df["date"] for df in frames.values()])
+                start, end = dates.min().date(), dates.max().date()
+                importer.derive(conn, frames, start, end, importer.stations_of(frames))
+                now = datetime.now()
+                conn.execute(schema.applied_writes.insert(), [
+                    {"idempotency_key": key, "applied_at": now} for _, key, _, _ in fresh
+                ])
+
+        if frames:
+            repository.invalidate(*{t for kind in frames for t in importer.KINDS[kind]["tables"]}, since=start)
+        return len(fresh)
+
+    def drain(self):
+        """Apply every due entry; returns the number applied this call."""
+        applied = 0
+        with self._lock:
+            while True:
+                entries = self._due()
+                if not entries:
+                    return applied
+                try:
+                    applied += self._apply(entries)
+                    self._mark_done([e[0] for e in entries])
+                except Exception as exc:
+                    if _transient(exc) or len(entries) == 1:
+                        self._mark_error(entries, exc)
+                        return applied
+                    # One bad entry must not block the rest: retry one by one.
+                    for entry in entries:
+                        try:
+                            applied += self._apply([entry])
+                            self._mark_done([entry[0]])
+                        except Exception as single:
+                            self._mark_error([entry], single)
+                            if _transient(single):
+                                return applied
+
+    def _run(self):
+        while True:
+            self._wake.wait(POLL_INTERVAL)
+            self._wake.clear()
+            try:
+                self.drain()
+                if self._pruned_at is None or time.monotonic() - self._pruned_at > PRUNE_INTERVAL:
+                    self.prune(KEEP_DAYS * 86400)
+                    self._pruned_at = time.monotonic()
+            except Exception:
+                # Journal I/O trouble: keep the thread alive and try again.
+                time.sleep(POLL_INTERVAL)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+            self._thread.start()
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_journal():
+    """Process-wide journal with its writer thread running."""
+    global _journal
+    if _journal is None:
+        with _journal_lock:
+            if _journal is None:
+                _journal = Journal(JOURNAL_PATH)
+    _journal.start()
+    return _journal
+
+
+def submit(frames):
+    """Save ``{kind: rows}``: queued on the journal, or written now when disabled."""
+    if ENABLED:
+        get_journal().append(frames)
+    else:
+        importer.write_batch(frames)
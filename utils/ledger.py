@@ -0,0 +1,168 @@
+"""Fuel stock ledger: closing balances are computed and stored at write time.
+
+Every ``fuel_stock`` row carries its true ``closing_stock`` (opening +
+received − sold that day). ``fuel_stock_balance`` keeps one row per station
+and fuel with the latest balance, so the opening stock for a new entry is a
+primary-key read. Back-dated entries re-post every later row for that
+station and fuel.
+
+Recompute all balances (e.g. after importing legacy rows) with::
+
+    python -m utils.ledger rebuild
+"""
+import argparse
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from utils import summary
+
+BALANCE_TABLE = "fuel_stock_balance"
+
+CREATE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {BALANCE_TABLE} (
+        station_id INTEGER NOT NULL DEFAULT 1,
+        fuel_type VARCHAR(20) NOT NULL,
+        date DATE NOT NULL,
+        closing_stock DECIMAL(14, 3) NOT NULL,
+        PRIMARY KEY (station_id, fuel_type)
+    )
+"""
+
+
+def ensure_table(conn):
+    conn.execute(text(CREATE_SQL))
+
+
+def _latest_before(conn, station, fuel, day):
+    return conn.execute(
+        text("""
+            SELECT closing_stock FROM fuel_stock
+            WHERE station_id = :station AND fuel_type = :fuel AND date < :date
+            ORDER BY date DESC, id DESC
+            LIMIT 1
+        """),
+        {"station": station, "fuel": fuel, "date": day},
+    ).fetchone()
+
+
+def opening_stock(conn, station, fuel, day):
+    """Balance carried into ``day``: a PK read unless ``day`` is back-dated."""
+    latest = conn.execute(
+        text(f"SELECT date, closing_stock FROM {BALANCE_TABLE} WHERE station_id = :station AND fuel_type = :fuel"),
+        {"station": station, "fuel": fuel},
+    ).fetchone()
+    if latest is not None and str(latest[0]) < str(day):
+        return float(latest[1])
+
+    prev = _latest_before(conn, station, fuel, day)
+    return float(prev[0]) if prev else 0.0
+
+
+def _set_balance(conn, station, fuel, day, closing):
+    params = {"station": station, "fuel": fuel}
+    conn.execute(text(f"DELETE FROM {BALANCE_TABLE} WHERE station_id = :station AND fuel_type = :fuel"), params)
+    conn.execute(
+        text(f"""
+            INSERT INTO {BALANCE_TABLE} (station_id, fuel_type, date, closing_stock)
+            VALUES (:station, :fuel, :date, :closing)
+        """),
+        {**params, "date": day, "closing": closing},
+    )
+
+
+def _as_date(day):
+    # Rows come back as dates from MySQL and as ISO strings from SQLite.
+    return day if isinstance(day, date) else date.fromisoformat(str(day))
+
+
+def post(conn, station, fuel, day, fleet=True):
+    """Re-post the station's ``fuel`` rows dated ``day`` or later, cascading
+    the balance forward.
+
+    Within a day, sales are deducted once on the first entry; later entries
+    that day open from the previous entry's closing. Also refreshes the
+    closing stock of the matching ``daily_fuel_summary`` rows and, with
+    ``fleet``, the fleet roll-up of those days (callers posting many
+    stations at once pass False and refresh it once). Returns the number
+    of rows re-posted.
+    """
+    params = {"station": station, "fuel": fuel, "date": day}
+    prev = _latest_before(conn, station, fuel, day)
+    rows = conn.execute(
+        text("""
+            SELECT id, date, opening_stock, received_stock FROM fuel_stock
+            WHERE station_id = :station AND fuel_type = :fuel AND date >= :date
+            ORDER BY date, id
+        """),
+        params,
+    ).fetchall()
+    sold = dict(conn.execute(
+        text("""
+            SELECT date, SUM(quantity_sold) FROM fuel_sales
+            WHERE station_id = :station AND fuel_type = :fuel AND date >= :date
+            GROUP BY date
+        """),
+        params,
+    ).fetchall())
+
+    balance = float(prev[0]) if prev else None
+    updates, day_closing, last_date = [], {}, None
+    for row_id, row_date, opening, received in rows:
+        opening = float(opening) if balance is None else balance
+        closing = opening + float(received or 0)
+        if row_date != last_date:
+            closing -= float(sold.get(row_date) or 0)
+        updates.append({"id": row_id, "opening": opening, "closing": closing})
+        day_closing[row_date] = closing
+        balance, last_date = closing, row_date
+
+    if updates:
+        conn.execute(
+            text("UPDATE fuel_stock SET opening_stock = :opening, closing_stock = :closing WHERE id = :id"),
+            updates,
+        )
+        conn.execute(
+            text(f"""
+                UPDATE {summary.SUMMARY_TABLE} SET closing_stock = :closing
+                WHERE station_id = :station AND date = :date AND fuel_type = :fuel
+            """),
+            [{"station": station, "date": d, "fuel": fuel, "closing": c} for d, c in day_closing.items()],
+        )
+        if fleet:
+            summary.rebuild_fleet(conn, _as_date(min(day_closing)), _as_date(last_date) + timedelta(days=1))
+        _set_balance(conn, station, fuel, last_date, balance)
+    return len(updates)
+
+
+def rebuild(conn):
+    """Re-post every station and fuel from its first stock entry."""
+    posted = 0
+    firsts = conn.execute(text(
+        "SELECT station_id, fuel_type, MIN(date) FROM fuel_stock GROUP BY station_id, fuel_type"
+    )).fetchall()
+    for station, fuel, first in firsts:
+        posted += post(conn, station, fuel, first, fleet=False)
+    summary.rebuild_fleet(conn)
+    return posted
+
+
+def main(argv=None):
+    from utils import changes
+    from utils.db import get_connection
+
+    parser = argparse.ArgumentParser(description="Maintain the fuel stock ledger.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args(argv)
+
+    with get_connection().begin() as conn:
+        ensure_table(conn)
+        summary.ensure_table(conn)
+        summary.ensure_fleet_table(conn)
+        posted = rebuild(conn)
+        changes.record(conn, ["fuel_stock", BALANCE_TABLE, summary.SUMMARY_TABLE, summary.FLEET_TABLE])
+    print(f"fuel_stock: {posted} rows re-posted")
+
+
+if __name__ == "__main__":
+    main()
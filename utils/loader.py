@@ -0,0 +1,83 @@
+"""Load several datasets concurrently.
+
+A page that needs more than one dataset names them and loads them in one
+call::
+
+    data = loader.load({
+        "sales": loader.query(repository.load_sales, date_ranges, fuel, station),
+        "income": loader.query(repository.load_income, date_ranges, station),
+    })
+
+Identical calls (same function and arguments) run once and every name that
+asked for them gets its own copy of the result. Distinct calls run at the
+same time on a shared thread pool, sized to the engine's connection pool
+so no query waits for a connection. A page then waits for its slowest
+dataset rather than for the sum of them. Calls that overlap further down
+(e.g. two slices of the same fact store) share that work through the
+repository's own caches and locks.
+
+The loaders must not call Streamlit: they run outside the script thread.
+"""
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from utils.db import POOL_SIZE
+
+MAX_WORKERS = int(os.environ.get("FUEL_LOADER_THREADS", POOL_SIZE))
+
+Query = namedtuple("Query", ["func", "args", "kwargs"])
+
+
+def query(func, *args, **kwargs):
+    """A dataset to load: ``func(*args, **kwargs)``."""
+    return Query(func, args, kwargs)
+
+
+def _key(q):
+    # Arguments are lists of ranges/fuels, so compare by value via repr.
+    return (q.func, repr(q.args), repr(sorted(q.kwargs.items())))
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="dataset-loader")
+    return _executor
+
+
+def load(queries):
+    """Run ``{name: query(...)}`` concurrently; returns ``{name: result}``.
+
+    If any query fails, the first failure (in ``queries`` order) is raised
+    once every query has finished.
+    """
+    unique = {}
+    for q in queries.values():
+        unique.setdefault(_key(q), q)
+
+    if len(unique) == 1:
+        q = next(iter(unique.values()))
+        results = {key: q.func(*q.args, **q.kwargs) for key in unique}
+    else:
+        executor = _get_executor()
+        futures = {key: executor.submit(q.func, *q.args, **q.kwargs) for key, q in unique.items()}
+        wait(futures.values())
+        results = {key: future.result() for key, future in futures.items()}
+
+    out, handed = {}, set()
+    for name, q in queries.items():
+        key = _key(q)
+        value = results[key]
+        if key in handed and hasattr(value, "copy"):
+            value = value.copy()
+        handed.add(key)
+        out[name] = value
+    return out
@@ -0,0 +1,42 @@
+"""Cursor bookkeeping for the keyset-paginated raw-data views.
+
+``repository.load_raw_page`` returns one page plus the keyset cursor of the
+next one. A ``Pager`` (kept in the page's session state) remembers the
+cursor each visited page started from, so "Previous" re-reads a page from
+its own cursor instead of running the query backwards. Changing any
+filter, the page size or the sort order starts again from page 1.
+"""
+
+PAGE_SIZES = (25, 50, 100, 250)
+DEFAULT_PAGE_SIZE = 50
+
+
+class Pager:
+    """Stack of the cursors of the pages visited for one query."""
+
+    def __init__(self):
+        self._query = None
+        self._cursors = [None]
+
+    def scope(self, *query):
+        """Restart at page 1 when ``query`` (filters, size, order) changed."""
+        query = repr(query)
+        if query != self._query:
+            self._query = query
+            self._cursors = [None]
+
+    @property
+    def cursor(self):
+        return self._cursors[-1]
+
+    @property
+    def page(self):
+        return len(self._cursors)
+
+    def forward(self, cursor):
+        if cursor is not None:
+            self._cursors.append(cursor)
+
+    def back(self):
+        if len(self._cursors) > 1:
+            self._cursors.pop()
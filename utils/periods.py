@@ -0,0 +1,56 @@
+import calendar
+from datetime import date
+
+MONTH_NAMES = list(calendar.month_name)[1:]
+MONTH_NUMBERS = {name: i for i, name in enumerate(MONTH_NAMES, start=1)}
+
+
+def period_key(dates):
+    """Integer ``YYYYMM`` month keys (int32) for a datetime Series."""
+    return (dates.dt.year * 100 + dates.dt.month).astype("int32")
+
+
+def month_start(year, month):
+    return date(year, month, 1)
+
+
+def next_month(year, month):
+    return date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+
+
+def merge_ranges(ranges):
+    """Sort half-open [start, end) ranges and merge touching/overlapping ones."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and merged[-1][1] >= start:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def month_ranges(year, months):
+    """Half-open [start, end) date ranges covering ``months`` of ``year``.
+
+    Adjacent months are merged, so a full-year selection becomes one range
+    and Jan+Feb+May becomes two. Accepts month numbers or month names.
+    """
+    nums = {MONTH_NUMBERS.get(m, m) for m in months}
+    return merge_ranges((month_start(year, m), next_month(year, m)) for m in nums)
+
+
+def range_clause(ranges, column="date", prefix="d"):
+    """SQL predicate and bind params for a union of half-open date ranges.
+
+    Each range becomes ``column >= :start AND column < :end`` so the
+    predicate stays sargable on an index over ``column``.
+    """
+    if not ranges:
+        return "1 = 0", {}
+    parts, params = [], {}
+    for i, (start, end) in enumerate(ranges):
+        parts.append(f"({column} >= :{prefix}{i}_start AND {column} < :{prefix}{i}_end)")
+        params[f"{prefix}{i}_start"] = start
+        params[f"{prefix}{i}_end"] = end
+    clause = parts[0] if len(parts) == 1 else "(" + " OR ".join(parts) + ")"
+    return clause, params
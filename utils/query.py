@@ -0,0 +1,163 @@
+"""Small composable SELECT builder for the read paths.
+
+Every statement built here filters dates with half-open ranges
+(``date >= :start AND date < :end``) so an index on ``date`` or
+``(fuel_type, date)`` is usable; ``YEAR(date) = ...`` style predicates are
+never emitted. Values always travel as bind parameters, so the SQL text
+depends only on the statement's shape, and ``statement()`` hands back one
+compiled ``text()`` object per shape for reuse::
+
+    sql, params = (
+        Select("daily_fuel_summary")
+        .columns("fuel_type")
+        .sum("litres", "sales")
+        .during([(date(2025, 1, 1), date(2025, 2, 1))])
+        .fuels(["Petrol"])
+        .group_by("fuel_type")
+        .build()
+    )
+"""
+from functools import lru_cache
+
+from sqlalchemy import bindparam, text
+
+from utils.periods import range_clause
+
+
+class Select:
+    """SELECT over one table or view; each method returns ``self``."""
+
+    def __init__(self, source):
+        self.source = source
+        self._columns = []
+        self._where = []
+        self._params = {}
+        self._group = []
+        self._order = []
+        self._limit = None
+
+    def columns(self, *columns, rename=None):
+        rename = rename or {}
+        self._columns += [f"{c} AS {rename[c]}" if c in rename else c for c in columns]
+        return self
+
+    def expr(self, sql, alias):
+        self._columns.append(f"{sql} AS {alias}")
+        return self
+
+    def sum(self, column, alias=None):
+        return self.expr(f"SUM({column})", alias or column)
+
+    def during(self, ranges, column="date", prefix="d"):
+        """Restrict ``column`` to a union of half-open [start, end) ranges."""
+        if ranges is not None:
+            clause, params = range_clause(ranges, column, prefix)
+            self._where.append(clause)
+            self._params.update(params)
+        return self
+
+    def since(self, day, column="date"):
+        if day is not None:
+            self._where.append(f"{column} >= :since")
+            self._params["since"] = day
+        return self
+
+    def fuels(self, fuels):
+        """Restrict ``fuel_type``; one fuel is an equality, several an IN list."""
+        if fuels is None:
+            return self
+        fuels = list(fuels)
+        if len(fuels) == 1:
+            self._where.append("fuel_type = :fuel")
+            self._params["fuel"] = fuels[0]
+        else:
+            self._where.append("fuel_type IN :fuels")
+            self._params["fuels"] = tuple(fuels)
+        return self
+
+    def station(self, station):
+        """Restrict to one ``station_id``; None (the fleet) adds no filter."""
+        return self.stations(None if station is None else [station])
+
+    def stations(self, stations):
+        """Restrict ``station_id``; one station is an equality, several an IN list."""
+        if stations is None:
+            return self
+        stations = [int(s) for s in stations]
+        if len(stations) == 1:
+            self._where.append("station_id = :station")
+            self._params["station"] = stations[0]
+        else:
+            self._where.append("station_id IN :stations")
+            self._params["stations"] = tuple(stations)
+        return self
+
+    def after(self, columns, values, descending=False):
+        """Keyset pagination: rows strictly past ``values`` in ``columns`` order.
+
+        The leading column gets a plain range bound (``>=``/``<=``) so the
+        predicate stays sargable on an index over it.
+        """
+        if values is None:
+            return self
+        op = "<" if descending else ">"
+        names = [f"k{i}" for i in range(len(columns))]
+        clause = f"{columns[-1]} {op} :{names[-1]}"
+        for column, name in zip(reversed(columns[:-1]), reversed(names[:-1])):
+            clause = f"{column} {op} :{name} OR ({column} = :{name} AND ({clause}))"
+        self._where.append(f"{columns[0]} {op}= :{names[0]} AND ({clause})")
+        self._params.update(zip(names, values))
+        return self
+
+    def limit(self, rows):
+        self._limit = int(rows)
+        return self
+
+    def bucket(self, periods, alias="bucket", column="date", prefix="b"):
+        """Number rows by the period they fall in (``CASE`` over bind ranges)."""
+        cases = []
+        for i, (start, end) in enumerate(periods):
+            cases.append(f"WHEN {column} >= :{prefix}{i}_start AND {column} < :{prefix}{i}_end THEN {i}")
+            self._params[f"{prefix}{i}_start"] = start
+            self._params[f"{prefix}{i}_end"] = end
+        return self.expr(f"CASE {' '.join(cases)} END", alias)
+
+    def group_by(self, *columns):
+        self._group += columns
+        return self
+
+    def order_by(self, *columns):
+        self._order += columns
+        return self
+
+    def build(self):
+        sql = f"SELECT {', '.join(self._columns) or '*'} FROM {self.source}"
+        if self._where:
+            sql += " WHERE " + " AND ".join(self._where)
+        if self._group:
+            sql += " GROUP BY " + ", ".join(self._group)
+        if self._order:
+            sql += " ORDER BY " + ", ".join(self._order)
+        if self._limit is not None:
+            sql += f" LIMIT {self._limit}"
+        return sql, dict(self._params)
+
+
+@lru_cache(maxsize=256)
+def _compiled(sql, expanding):
+    stmt = text(sql)
+    if expanding:
+        stmt = stmt.bindparams(*(bindparam(k, expanding=True) for k in expanding))
+    return stmt
+
+
+def statement(sql, params=None):
+    """(text clause, params) for ``sql``; the clause is shared per SQL shape.
+
+    List/tuple/set values become expanding ``IN`` parameters.
+    """
+    params = params or {}
+    expanding = tuple(sorted(k for k, v in params.items() if isinstance(v, (list, tuple, set))))
+    if expanding:
+        params = {k: list(v) if k in expanding else v for k, v in params.items()}
+    return _compiled(sql, expanding), params
@@ -0,0 +1,378 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+from utils import analytics, frames, snapshot
+from utils.factstore import FactStore
+from utils.db import get_connection
+from utils.schema import VIEWS
+from utils.query import Select, statement
+from utils.stations import STATIONS_TABLE
+from utils.summary import FLEET_TABLE, METRICS, SUMMARY_TABLE
+
+DEFAULT_TTL = int(os.environ.get("FUEL_CACHE_TTL", 300))
+MAX_FACT_STORES = int(os.environ.get("FUEL_FACT_STORES", 64))
+
+# Base tables each view is derived from, so a write to a table evicts
+# every cached dataset that reads it (directly or through a view).
+VIEW_TABLES = {
+    "vw_fuel_sales": {"fuel_sales"},
+    "vw_income_summary": {"fuel_sales", "fuel_price", "fuel_stock", "expenses"},
+    "vw_fuel_stock": {"fuel_stock", "fuel_sales"},
+    "vw_profit_analysis": {"fuel_sales", "fuel_price", "fuel_stock", "expenses"},
+    "vw_fleet_income_summary": {"fuel_sales", "fuel_price", "fuel_stock", "expenses"},
+    SUMMARY_TABLE: {"fuel_sales", "fuel_price", "fuel_stock", "expenses"},
+    FLEET_TABLE: {"fuel_sales", "fuel_price", "fuel_stock", "expenses"},
+    "fuel_stock_balance": {"fuel_stock"},
+}
+
+
+def base_tables(*sources):
+    tables = set()
+    for name in sources:
+        tables |= VIEW_TABLES.get(name, {name})
+    return frozenset(tables)
+
+
+# ----------------------------------
+# QUERY CACHE
+# ----------------------------------
+class QueryCache:
+    """Memoized query results keyed by (sql, params), tagged by base table."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value, tables, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value, tables)
+
+    def invalidate(self, tables=None):
+        with self._lock:
+            if tables is None:
+                dropped = list(self._entries)
+            else:
+                tables = set(tables)
+                dropped = [k for k, e in self._entries.items() if e[2] & tables]
+            for key in dropped:
+                del self._entries[key]
+            self.evictions += len(dropped)
+            return len(dropped)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_cache = QueryCache()
+_listeners = []
+
+
+def _freeze(params):
+    if not params:
+        return ()
+    return tuple(
+        sorted((k, tuple(v) if isinstance(v, (list, tuple, set)) else v)
+               for k, v in params.items())
+    )
+
+
+def _engine_for(tables):
+    """The analytics replica when it mirrors everything ``tables`` read."""
+    needed = base_tables(*tables) | (set(tables) - set(VIEWS))
+    return analytics.engine_for(needed) or get_connection()
+
+
+def read_sql(sql, params=None, tables=(), parse_dates=("date",), ttl=DEFAULT_TTL, dataset=None):
+    """Run a SELECT through the shared engine, memoized per (sql, params).
+
+    ``tables`` names the tables/views the query reads; they decide which
+    writes invalidate the result and whether the analytics replica can
+    answer it. ``dataset`` names the ``utils.frames`` schema applied to
+    the rows before they are cached. A fresh copy is returned on every call
+    so callers may add columns without corrupting the cached frame;
+    ``ttl=0`` bypasses the cache.
+    """
+    key = (sql, _freeze(params))
+    df = _cache.get(key)
+    if df is None:
+        stmt, bind = statement(sql, params)
+        with _engine_for(tables).connect() as conn:
+            df = pd.read_sql(stmt, conn, params=bind, parse_dates=list(parse_dates or ()))
+        if dataset is not None:
+            df = frames.typed(dataset, df)
+        if ttl > 0:
+            _cache.put(key, df, base_tables(*tables), ttl)
+    return df.copy()
+
+
+def invalidate(*tables, since=None):
+    """Evict cached datasets that read any of ``tables``; no args clears all.
+
+    ``since`` is the earliest date the write touched; when the snapshot
+    store or the analytics replica is enabled, affected tables re-pull
+    from that month.
+    """
+    written = base_tables(*tables) if tables else None
+    if since is not None and written is not None and snapshot.enabled():
+        for source in snapshot.TABLES:
+            if base_tables(source) & written:
+                snapshot.get_store().mark_dirty(source, since)
+    if analytics.enabled():
+        replica = analytics.get_replica()
+        replica.mark_dirty(
+            None if written is None else [t for t in replica.tables() if base_tables(t) & written], since
+        )
+    for callback in _listeners:
+        callback(written, since)
+    with _stores_lock:
+        for store, sources in _stores.values():
+            if written is None or sources & written:
+                store.mark_stale()
+    return _cache.invalidate(written)
+
+
+def on_invalidate(callback):
+    """Register ``callback(tables, since)`` to run on every invalidate().
+
+    ``tables`` is the set of base tables written (None for a full clear).
+    In-process derived structures use this to refresh incrementally.
+    """
+    _listeners.append(callback)
+
+
+def cache_stats():
+    return _cache.stats()
+
+
+# ----------------------------------
+# STATIONS & FILTER OPTIONS
+# ----------------------------------
+# ``station`` is a station id, or None for the whole fleet; fleet-wide
+# reads of per-station daily data go to the pre-aggregated roll-up.
+def _scoped(table, station):
+    """(table to read, station filter) for ``table`` at ``station`` scope."""
+    if station is None and table in (SUMMARY_TABLE, "fuel_stock"):
+        return FLEET_TABLE, None
+    return table, station
+
+
+def load_stations():
+    return read_sql(
+        f"SELECT station_id, name FROM {STATIONS_TABLE} ORDER BY station_id",
+        tables=[STATIONS_TABLE],
+        parse_dates=(),
+        dataset="stations",
+    )
+
+
+def load_periods(table, station=None):
+    """Distinct (year, month) pairs present in ``table``, for sidebar options."""
+    if table in FACT_TABLES:
+        return frames.typed("periods", _facts(FACT_TABLES[table], station).periods())
+    table, station = _scoped(table, station)
+    sql, params = (
+        Select(table).expr("YEAR(date)", "year").expr("MONTH(date)", "month").station(station)
+        .order_by("year", "month").build()
+    )
+    return read_sql(
+        sql.replace("SELECT", "SELECT DISTINCT", 1), params, tables=[table], parse_dates=(), dataset="periods"
+    )
+
+
+def load_fuel_types(table="fuel_sales", station=None):
+    if table in FACT_TABLES:
+        return _facts(FACT_TABLES[table], station).fuels()
+    table, station = _scoped(table, station)
+    sql, params = Select(table).columns("fuel_type").station(station).order_by("fuel_type").build()
+    df = read_sql(sql.replace("SELECT", "SELECT DISTINCT", 1), params, tables=[table], parse_dates=())
+    return df["fuel_type"].tolist()
+
+
+# ----------------------------------
+# DATASETS
+# ----------------------------------
+def _select(dataset, source, columns, ranges=None, fuels=None, order=("date",), rename=None, station=None,
+            ttl=DEFAULT_TTL):
+    """Rows of ``source`` restricted to ``ranges``/``fuels``/``station``,
+    typed as ``dataset`` (see ``utils.frames``).
+
+    Served from the local snapshot when it is enabled and mirrors
+    ``source``; otherwise from SQL through the query cache.
+    """
+    rename = rename or {}
+    if snapshot.enabled() and source in snapshot.TABLES:
+        df = snapshot.get_store().read(source, columns, ranges, fuels, station)
+        df = df.sort_values(list(order), kind="stable").rename(columns=rename).reset_index(drop=True)
+        return frames.typed(dataset, df)
+
+    sql, params = (
+        Select(source).columns(*columns, rename=rename).during(ranges).fuels(fuels).station(station)
+        .order_by(*order).build()
+    )
+    return read_sql(sql, params, tables=[source], ttl=ttl, dataset=dataset)
+
+
+# ----------------------------------
+# FACT STORES
+# ----------------------------------
+# The dashboards slice whole-scope fact tables held in memory (see
+# utils/factstore.py): one store per fact and station, least recently used
+# dropped beyond FUEL_FACT_STORES, marked stale by invalidate().
+FACT_TABLES = {SUMMARY_TABLE: "summary", "fuel_stock": "stock"}
+STOCK_COLUMNS = ["id", "date", "fuel_type", "opening_stock", "received_stock", "closing_stock"]
+FLEET_STOCK_COLUMNS = ["date", "fuel_type", "station_count", "closing_stock"]
+
+_stores = OrderedDict()
+_stores_lock = threading.Lock()
+
+
+def _fact_source(fact, station):
+    """(table, station filter, columns, tie-break order) a fact store loads."""
+    if fact == "summary":
+        source, station = _scoped(SUMMARY_TABLE, station)
+        return source, station, ["date", "fuel_type", *METRICS], ()
+    if station is None:
+        return FLEET_TABLE, None, FLEET_STOCK_COLUMNS, ()
+    return "fuel_stock", station, STOCK_COLUMNS, ("id",)
+
+
+def _facts(fact, station):
+    """Process-wide store of ``fact`` ("summary" or "stock") at ``station`` scope."""
+    key = (fact, station)
+    with _stores_lock:
+        entry = _stores.get(key)
+        if entry is None:
+            source, scope, columns, order = _fact_source(fact, station)
+            store = FactStore(
+                lambda: _select(fact, source, columns, order=("fuel_type", "date", *order), station=scope, ttl=0),
+                order=order,
+                ttl=DEFAULT_TTL,
+            )
+            entry = _stores[key] = (store, base_tables(source))
+            while len(_stores) > MAX_FACT_STORES:
+                _stores.popitem(last=False)
+        else:
+            _stores.move_to_end(key)
+    return entry[0]
+
+
+def load_sales(ranges=None, fuels=None, station=None):
+    df = _facts("summary", station).slice(ranges, fuels, ["date", "fuel_type", "litres", "revenue"])
+    return df.rename(columns={"litres": "quantity_sold", "revenue": "total_amount"})
+
+
+def load_income(ranges=None, station=None):
+    df = _facts("summary", station).slice(ranges, columns=["date", "revenue", "profit"])
+    df = df.groupby("date", as_index=False)[["revenue", "profit"]].sum()
+    return df.rename(columns={"revenue": "total_sales"})
+
+
+def load_stock(ranges=None, fuels=None, station=None):
+    """Stock entries of ``station``; for the fleet, daily closing totals."""
+    columns = FLEET_STOCK_COLUMNS if station is None else STOCK_COLUMNS
+    return _facts("stock", station).slice(ranges, fuels, columns)
+
+
+def load_latest_stock(fuel, station=None):
+    """Latest ledger balance for ``fuel`` (summed over the fleet for None),
+    or None when there is none."""
+    query = Select("fuel_stock_balance").fuels([fuel]).station(station)
+    if station is None:
+        query.expr("MAX(date)", "date").columns("fuel_type").sum("closing_stock").group_by("fuel_type")
+    else:
+        query.columns("date", "fuel_type", "closing_stock")
+    sql, params = query.build()
+    df = read_sql(sql, params, tables=["fuel_stock_balance"])
+    return None if df.empty else df.iloc[0]
+
+
+def load_financial(ranges=None, fuels=None, station=None):
+    df = _facts("summary", station).slice(ranges, fuels, ["date", "fuel_type", *METRICS, "period"])
+    return df.rename(columns={"margin": "fuel_margin", "expenses": "total_expenses"})
+
+
+def load_period_totals(columns, periods=None, fuels=None, station=None):
+    """Summary ``columns`` summed per ``YYYYMM`` period key, off prefix sums."""
+    return _facts("summary", station).period_totals(columns, periods, fuels)
+
+
+# ----------------------------------
+# RAW DATA PAGES
+# ----------------------------------
+# The raw-data views page through SQL with keyset pagination: each page is
+# "the next ``size`` rows after the last key shown" in (date, key) order,
+# so a page costs the same on any history length and only one page of
+# rows is ever sent to the browser.
+RAW_VIEWS = {
+    "sales": (["date", "fuel_type", "litres", "revenue"], {"litres": "quantity_sold", "revenue": "total_amount"}),
+    "financial": (
+        ["date", "fuel_type", *METRICS], {"margin": "fuel_margin", "expenses": "total_expenses"},
+    ),
+}
+
+
+def _raw_source(view, station):
+    """(table, station filter, columns, rename, keyset columns) of a raw view."""
+    if view == "stock":
+        if station is None:
+            return FLEET_TABLE, None, FLEET_STOCK_COLUMNS, {}, ("date", "fuel_type")
+        return "fuel_stock", station, STOCK_COLUMNS, {}, ("date", "id")
+    columns, rename = RAW_VIEWS[view]
+    source, station = _scoped(SUMMARY_TABLE, station)
+    return source, station, columns, rename, ("date", "fuel_type")
+
+
+def _key_value(value):
+    # Timestamps bind as dates; numpy scalars as plain Python values.
+    if isinstance(value, pd.Timestamp):
+        return value.date()
+    return value.item() if hasattr(value, "item") else value
+
+
+def load_raw_page(view, ranges=None, fuels=None, station=None, after=None, size=50, descending=False):
+    """One page of raw ``view`` rows ("sales", "stock" or "financial").
+
+    Rows come in (date, key) order, newest first with ``descending``,
+    starting after the keyset cursor ``after`` (None: the first page).
+    Returns ``(rows, cursor)``; ``cursor`` is the key to pass as ``after``
+    for the next page, or None on the last page.
+    """
+    source, scope, columns, rename, keys = _raw_source(view, station)
+    direction = " DESC" if descending else ""
+    sql, params = (
+        Select(source).columns(*columns, rename=rename).during(ranges).fuels(fuels).station(scope)
+        .after(keys, after, descending).order_by(*(k + direction for k in keys)).limit(size + 1)
+        .build()
+    )
+    # Cached like any dataset: paging back and forth re-reads nothing.
+    df = read_sql(sql, params, tables=[source])
+    if len(df) <= size:
+        return df, None
+    df = df.iloc[:size]
+    return df, tuple(_key_value(df[k].iloc[-1]) for k in keys)
@@ -0,0 +1,413 @@
+"""Versioned schema migrations and query-plan checks.
+
+Migrations create the tables, views and indexes the app depends on. They
+are applied once per process when the shared engine is first built (see
+``utils.db``), and can be run by hand::
+
+    python -m utils.schema migrate
+    python -m utils.schema check     # exit 1 if a hot query full-scans
+"""
+import argparse
+import sys
+from datetime import date, datetime
+
+from sqlalchemy import (
+    Column, Date, DateTime, Index, Integer, MetaData, Numeric, String, Table, inspect, text,
+)
+
+from utils import ledger, stations, summary
+
+metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations", metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(100), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Every station table carries the station it belongs to; rows written
+# before stations existed belong to station 1.
+fuel_sales = Table(
+    "fuel_sales", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("station_id", Integer, nullable=False, server_default=text("1")),
+    Column("date", Date, nullable=False),
+    Column("fuel_type", String(20), nullable=False),
+    Column("quantity_sold", Numeric(12, 3), nullable=False),
+    Column("selling_price", Numeric(10, 2), nullable=False),
+    Column("total_amount", Numeric(16, 2), nullable=False),
+)
+
+fuel_price = Table(
+    "fuel_price", metadata,
+    Column("station_id", Integer, primary_key=True, autoincrement=False, server_default=text("1")),
+    Column("fuel_type", String(20), primary_key=True),
+    Column("date", Date, primary_key=True),
+    Column("buying_price", Numeric(10, 2), nullable=False),
+)
+
+fuel_stock = Table(
+    "fuel_stock", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("station_id", Integer, nullable=False, server_default=text("1")),
+    Column("date", Date, nullable=False),
+    Column("fuel_type", String(20), nullable=False),
+    Column("opening_stock", Numeric(14, 3), nullable=False, default=0),
+    Column("received_stock", Numeric(14, 3), nullable=False, default=0),
+    Column("closing_stock", Numeric(14, 3), nullable=False, default=0),
+)
+
+expenses = Table(
+    "expenses", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("station_id", Integer, nullable=False, server_default=text("1")),
+    Column("date", Date, nullable=False),
+    Column("expense_type", String(100), nullable=False),
+    Column("amount", Numeric(12, 2), nullable=False),
+)
+
+station_registry = Table(
+    stations.STATIONS_TABLE, metadata,
+    Column("station_id", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(100), nullable=False),
+)
+
+# Idempotency keys of write-behind journal entries already applied.
+applied_writes = Table(
+    "applied_writes", metadata,
+    Column("idempotency_key", String(64), primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Tables written and the earliest date each write touched, so the snapshot
+# and the analytics replica of every process can re-pull what changed
+# (see utils/changes.py).
+data_changes = Table(
+    "data_changes", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("table_name", String(64), nullable=False),
+    Column("since", Date),
+    Column("changed_at", DateTime, nullable=False),
+)
+
+# Every hot query filters on station + fuel_type + date (opening stock,
+# ledger re-posting), on station + date (dashboards and chatbot, through
+# the summary's primary key) or on a date range alone (summary refresh,
+# fleet roll-up, views).
+INDEXES = [
+    ("fuel_sales", "ix_fuel_sales_station_fuel_date", ["station_id", "fuel_type", "date"]),
+    ("fuel_sales", "ix_fuel_sales_date", ["date"]),
+    ("fuel_stock", "ix_fuel_stock_station_fuel_date", ["station_id", "fuel_type", "date", "id"]),
+    ("fuel_stock", "ix_fuel_stock_date", ["date"]),
+    ("fuel_price", "ix_fuel_price_date", ["date"]),
+    ("expenses", "ix_expenses_date", ["date"]),
+    (summary.SUMMARY_TABLE, "ix_daily_fuel_summary_date", ["date"]),
+    (summary.FLEET_TABLE, "ix_fleet_fuel_summary_fuel_date", ["fuel_type", "date"]),
+]
+
+# Single-station indexes superseded by the station-prefixed ones above.
+OBSOLETE_INDEXES = [
+    ("fuel_sales", "ix_fuel_sales_fuel_date"),
+    ("fuel_stock", "ix_fuel_stock_fuel_date"),
+    (summary.SUMMARY_TABLE, "ix_daily_fuel_summary_fuel_date"),
+]
+
+VIEWS = {
+    "vw_fuel_sales": """
+        SELECT station_id, date, fuel_type,
+               SUM(quantity_sold) AS quantity_sold,
+               SUM(total_amount) AS total_amount,
+               SUM(total_amount) / SUM(quantity_sold) AS avg_selling_price
+        FROM fuel_sales
+        GROUP BY station_id, date, fuel_type
+    """,
+    "vw_income_summary": f"""
+        SELECT station_id, date,
+               SUM(revenue) AS total_sales,
+               SUM(margin) AS fuel_margin,
+               SUM(expenses) AS total_expenses,
+               SUM(profit) AS profit
+        FROM {summary.SUMMARY_TABLE}
+        GROUP BY station_id, date
+    """,
+    "vw_fuel_stock": """
+        SELECT st.id, st.station_id, st.date, st.fuel_type, st.opening_stock, st.received_stock,
+               COALESCE(s.sold, 0) AS sold, st.closing_stock
+        FROM fuel_stock st
+        LEFT JOIN (
+            SELECT station_id, date, fuel_type, SUM(quantity_sold) AS sold
+            FROM fuel_sales
+            GROUP BY station_id, date, fuel_type
+        ) s ON s.station_id = st.station_id AND s.date = st.date AND s.fuel_type = st.fuel_type
+    """,
+    "vw_profit_analysis": f"""
+        SELECT station_id, date, fuel_type,
+               litres AS quantity_sold, revenue, buying_cost,
+               margin AS fuel_margin, expenses AS total_expenses, profit
+        FROM {summary.SUMMARY_TABLE}
+    """,
+    "vw_fleet_income_summary": f"""
+        SELECT date,
+               SUM(revenue) AS total_sales,
+               SUM(margin) AS fuel_margin,
+               SUM(expenses) AS total_expenses,
+               SUM(profit) AS profit
+        FROM {summary.FLEET_TABLE}
+        GROUP BY date
+    """,
+}
+
+
+# ----------------------------------
+# MIGRATION STEPS
+# ----------------------------------
+def _create_base_tables(conn):
+    metadata.create_all(conn, tables=[fuel_sales, fuel_price, fuel_stock, expenses], checkfirst=True)
+
+
+def _create_derived_tables(conn):
+    summary.ensure_table(conn)
+    summary.ensure_fleet_table(conn)
+    ledger.ensure_table(conn)
+
+
+def _create_indexes(conn):
+    # Station-prefixed indexes on tables written before stations existed
+    # wait for the stations migration, which runs this again.
+    inspector = inspect(conn)
+    for table, name, columns in INDEXES:
+        existing = {ix["name"] for ix in inspector.get_indexes(table)}
+        if not set(columns) <= {c["name"] for c in inspector.get_columns(table)}:
+            continue
+        if name not in existing:
+            conn.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+
+
+def _create_views(conn):
+    for name, body in VIEWS.items():
+        conn.execute(text(f"DROP VIEW IF EXISTS {name}"))
+        conn.execute(text(f"CREATE VIEW {name} AS {body}"))
+
+
+def _create_applied_writes(conn):
+    metadata.create_all(conn, tables=[applied_writes], checkfirst=True)
+
+
+def _create_data_changes(conn):
+    metadata.create_all(conn, tables=[data_changes], checkfirst=True)
+
+
+def _rebuild_with_station(conn, table, create):
+    """Recreate ``table`` with ``create`` (a station-keyed primary key) and
+    copy its rows in as station 1; primary keys cannot be altered portably.
+
+    Only the columns of the new definition are copied, so a column added to
+    the old table by hand does not break the copy. MySQL commits every DDL
+    statement, so an interrupted run leaves ``<table>_single`` behind; the
+    next run rebuilds the new table from it and finishes the swap.
+    """
+    old = f"{table}_single"
+    existing = set(inspect(conn).get_table_names())
+    if old not in existing:
+        conn.execute(text(f"ALTER TABLE {table} RENAME TO {old}"))
+    elif table in existing:
+        # Interrupted after the new table was created: redo the copy.
+        conn.execute(text(f"DROP TABLE {table}"))
+    create(conn)
+
+    wanted = {c["name"] for c in inspect(conn).get_columns(table)} - {"station_id"}
+    columns = ", ".join(c["name"] for c in inspect(conn).get_columns(old) if c["name"] in wanted)
+    conn.execute(text(f"INSERT INTO {table} (station_id, {columns}) SELECT 1, {columns} FROM {old}"))
+    conn.execute(text(f"DROP TABLE {old}"))
+
+
+def _add_stations(conn):
+    # Views are rebuilt below; SQLite would otherwise follow the renames.
+    for name in VIEWS:
+        conn.execute(text(f"DROP VIEW IF EXISTS {name}"))
+
+    inspector = inspect(conn)
+    rebuilt = {
+        "fuel_price": lambda c: metadata.create_all(c, tables=[fuel_price]),
+        summary.SUMMARY_TABLE: summary.ensure_table,
+        ledger.BALANCE_TABLE: ledger.ensure_table,
+    }
+    existing = set(inspector.get_table_names())
+    for table in ("fuel_sales", "fuel_stock", "expenses", *rebuilt):
+        if f"{table}_single" in existing:
+            _rebuild_with_station(conn, table, rebuilt[table])  # finish an interrupted swap
+            continue
+        if "station_id" in {c["name"] for c in inspector.get_columns(table)}:
+            continue  # created with the current definition
+        if table in rebuilt:
+            _rebuild_with_station(conn, table, rebuilt[table])
+        else:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN station_id INTEGER NOT NULL DEFAULT 1"))
+
+    inspector = inspect(conn)
+    for table, name in OBSOLETE_INDEXES:
+        if name in {ix["name"] for ix in inspector.get_indexes(table)}:
+            conn.execute(text(f"DROP INDEX {name} ON {table}" if conn.dialect.name == "mysql" else f"DROP INDEX {name}"))
+
+    metadata.create_all(conn, tables=[station_registry], checkfirst=True)
+    if conn.execute(text(f"SELECT COUNT(*) FROM {stations.STATIONS_TABLE}")).scalar() == 0:
+        stations.add(conn, stations.DEFAULT_NAME, 1)
+    summary.ensure_fleet_table(conn)
+    summary.rebuild_fleet(conn)
+    _create_indexes(conn)
+    _create_views(conn)
+
+
+def _fill_derived_tables(conn):
+    """Post closing stock and derive the summary tables from rows written
+    before they existed; the forms, the importer and the journal keep them
+    current from here on."""
+    from utils import changes
+
+    ledger.rebuild(conn)
+    summary.rebuild(conn)
+    changes.record(conn, ["fuel_stock", ledger.BALANCE_TABLE, summary.SUMMARY_TABLE, summary.FLEET_TABLE])
+
+
+MIGRATIONS = [
+    (1, "base tables", _create_base_tables),
+    (2, "summary and stock balance tables", _create_derived_tables),
+    (3, "fuel_type/date indexes", _create_indexes),
+    (4, "reporting views", _create_views),
+    (5, "write-behind idempotency keys", _create_applied_writes),
+    (6, "stations and fleet roll-up", _add_stations),
+    (7, "cross-process change log", _create_data_changes),
+    (8, "fill derived tables", _fill_derived_tables),
+]
+
+
+def applied_versions(conn):
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def migrate(engine):
+    """Apply pending migrations in order; safe to call on every startup."""
+    with engine.begin() as conn:
+        metadata.create_all(conn, tables=[schema_migrations], checkfirst=True)
+        done = applied_versions(conn)
+
+    applied = []
+    for version, name, step in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as conn:
+            step(conn)
+            conn.execute(
+                schema_migrations.insert(),
+                {"version": version, "name": name, "applied_at": datetime.now()},
+            )
+        applied.append(version)
+    return applied
+
+
+# ----------------------------------
+# QUERY PLAN CHECK
+# ----------------------------------
+_DAY = date(2025, 1, 15)
+
+HOT_QUERIES = {
+    "opening stock": (
+        "SELECT closing_stock FROM fuel_stock WHERE station_id = :station AND fuel_type = :fuel AND date < :date "
+        "ORDER BY date DESC, id DESC LIMIT 1",
+        {"station": 1, "fuel": "Petrol", "date": _DAY},
+    ),
+    "ledger re-post sales": (
+        "SELECT date, SUM(quantity_sold) FROM fuel_sales "
+        "WHERE station_id = :station AND fuel_type = :fuel AND date >= :date GROUP BY date",
+        {"station": 1, "fuel": "Petrol", "date": _DAY},
+    ),
+    "ledger re-post stock": (
+        "SELECT id, date, opening_stock, received_stock FROM fuel_stock "
+        "WHERE station_id = :station AND fuel_type = :fuel AND date >= :date ORDER BY date, id",
+        {"station": 1, "fuel": "Petrol", "date": _DAY},
+    ),
+    "summary refresh sales": (
+        "SELECT station_id, date, fuel_type, SUM(quantity_sold) FROM fuel_sales "
+        "WHERE date >= :start AND date < :end GROUP BY station_id, date, fuel_type",
+        {"start": _DAY, "end": date(2025, 1, 16)},
+    ),
+    "summary refresh expenses": (
+        "SELECT station_id, date, SUM(amount) FROM expenses WHERE date >= :start AND date < :end "
+        "GROUP BY station_id, date",
+        {"start": _DAY, "end": date(2025, 1, 16)},
+    ),
+    "fleet roll-up": (
+        f"SELECT date, fuel_type, SUM(litres) FROM {summary.SUMMARY_TABLE} "
+        "WHERE date >= :start AND date < :end GROUP BY date, fuel_type",
+        {"start": _DAY, "end": date(2025, 1, 16)},
+    ),
+    "station dashboard window": (
+        f"SELECT * FROM {summary.SUMMARY_TABLE} WHERE station_id = :station AND date >= :start AND date < :end "
+        "AND fuel_type IN ('Petrol', 'Diesel')",
+        {"station": 1, "start": date(2025, 1, 1), "end": date(2025, 2, 1)},
+    ),
+    "fleet dashboard window": (
+        f"SELECT * FROM {summary.FLEET_TABLE} WHERE date >= :start AND date < :end AND fuel_type IN ('Petrol', 'Diesel')",
+        {"start": date(2025, 1, 1), "end": date(2025, 2, 1)},
+    ),
+    "chatbot daily by fuel": (
+        f"SELECT SUM(profit) FROM {summary.SUMMARY_TABLE} WHERE station_id = :station AND date = :date AND fuel_type = :fuel",
+        {"station": 1, "date": _DAY, "fuel": "Petrol"},
+    ),
+    "chatbot monthly by fuel": (
+        f"SELECT SUM(litres) FROM {summary.FLEET_TABLE} WHERE fuel_type = :fuel AND date >= :start AND date < :end",
+        {"fuel": "Petrol", "start": date(2025, 1, 1), "end": date(2025, 2, 1)},
+    ),
+}
+
+
+def full_scans(conn, sql, params):
+    """Tables the planner reads with a full scan for ``sql``."""
+    if conn.dialect.name == "mysql":
+        plan = conn.execute(text("EXPLAIN " + sql), params).mappings().all()
+        return [row["table"] for row in plan if row["type"] == "ALL" and not row["table"].startswith("<")]
+
+    if conn.dialect.name == "sqlite":
+        plan = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params).fetchall()
+        return [
+            row[3].split()[1] for row in plan
+            if row[3].startswith("SCAN ") and " INDEX " not in row[3]
+        ]
+
+    raise NotImplementedError(f"plan check not supported for {conn.dialect.name}")
+
+
+def check_plans(engine):
+    """Map of hot-query name -> fully scanned tables (empty when all are indexed)."""
+    failures = {}
+    with engine.connect() as conn:
+        for name, (sql, params) in HOT_QUERIES.items():
+            scanned = full_scans(conn, sql, params)
+            if scanned:
+                failures[name] = scanned
+    return failures
+
+
+def main(argv=None):
+    from utils.db import get_connection
+
+    parser = argparse.ArgumentParser(description="Apply schema migrations / check query plans.")
+    parser.add_argument("command", choices=["migrate", "check"])
+    args = parser.parse_args(argv)
+
+    engine = get_connection()
+    if args.command == "migrate":
+        applied = migrate(engine)
+        print(f"applied migrations: {applied or 'none (up to date)'}")
+        return 0
+
+    failures = check_plans(engine)
+    for name, tables in failures.items():
+        print(f"FULL SCAN  {name}: {', '.join(tables)}")
+    print(f"{len(HOT_QUERIES) - len(failures)}/{len(HOT_QUERIES)} hot queries use an index")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""Optional local Parquet snapshot of the fact tables.
+
+Enabled by pointing ``FUEL_SNAPSHOT_DIR`` at a writable directory (and
+having ``pyarrow`` installed). Each mirrored table is stored as monthly
+partitions, ``<dir>/<table>/month=YYYY-MM/data.parquet``, and a per-table
+date watermark records how far it has been synced. A refresh only pulls
+rows from the watermark's month onwards, plus any month a write touched:
+marked dirty by a local write, or logged by any process in the change log
+(``utils.changes``), so back-dated rows written elsewhere are mirrored
+too. Readers get column projection and partition pruning. A table whose
+column list changed (e.g. after a schema migration) is re-pulled in full.
+
+Force a sync from the command line with::
+
+    python -m utils.snapshot sync [--full] [table ...]
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import date, datetime
+
+import pandas as pd
+from sqlalchemy import text
+
+from utils import changes
+from utils.db import get_connection
+from utils.summary import COLUMNS as SUMMARY_COLUMNS, FLEET_COLUMNS, FLEET_TABLE, SUMMARY_TABLE
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # snapshot support is optional
+    pa = None
+
+SNAPSHOT_DIR = os.environ.get("FUEL_SNAPSHOT_DIR")
+REFRESH_INTERVAL = int(os.environ.get("FUEL_SNAPSHOT_REFRESH", 60))
+
+TABLES = {
+    "fuel_sales": ["id", "station_id", "date", "fuel_type", "quantity_sold", "selling_price", "total_amount"],
+    "fuel_stock": ["id", "station_id", "date", "fuel_type", "opening_stock", "received_stock", "closing_stock"],
+    "fuel_price": ["station_id", "date", "fuel_type", "buying_price"],
+    "expenses": ["id", "station_id", "date", "expense_type", "amount"],
+    SUMMARY_TABLE: SUMMARY_COLUMNS,
+    FLEET_TABLE: FLEET_COLUMNS,
+}
+
+
+def _month(day):
+    return f"{day.year:04d}-{day.month:02d}"
+
+
+class SnapshotStore:
+    """Monthly-partitioned Parquet mirror of ``TABLES`` under ``root``."""
+
+    def __init__(self, root):
+        self.root = root
+        # Re-entrant: read() holds it across its own sync and the scan, so
+        # sync() never removes or rewrites partitions under a reader.
+        self._lock = threading.RLock()
+        self._synced_at = {}
+        self._dirty = {}
+
+    # ---------- state ----------
+    def _state_path(self):
+        return os.path.join(self.root, "_watermarks.json")
+
+    def _load_state(self):
+        try:
+            with open(self._state_path()) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_state(self, state):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self._state_path() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, self._state_path())
+
+    def watermark(self, table):
+        value = self._load_state().get(table)
+        return date.fromisoformat(value) if value else None
+
+    def mark_dirty(self, table, since):
+        """Force the next read of ``table`` to re-pull months from ``since``."""
+        with self._lock:
+            current = self._dirty.get(table)
+            self._dirty[table] = since if current is None else min(current, since)
+
+    # ---------- sync ----------
+    def sync(self, table, full=False):
+        """Pull new/changed rows for ``table`` and rewrite the touched months."""
+        with self._lock:
+            state = self._load_state()
+            layouts = state.setdefault("_columns", {})
+            if layouts.get(table) != TABLES[table]:
+                full = True
+            positions = state.setdefault("_changes", {})
+            with get_connection().connect() as conn:
+                # Writes logged since the last sync, by any process.
+                position, changed = changes.pending(conn, [table], positions.get(table))
+                logged = changed.get(table)
+                full = full or logged == changes.FULL
+                mark = None if full or table not in state else date.fromisoformat(state[table])
+                for since in (self._dirty.pop(table, None), logged):
+                    if mark is not None and since is not None:
+                        mark = min(mark, since)
+
+                sql = f"SELECT {', '.join(TABLES[table])} FROM {table}"
+                params = {}
+                if mark is not None:
+                    sql += " WHERE date >= :start"
+                    params["start"] = mark.replace(day=1)
+                df = pd.read_sql(text(sql), conn, params=params)
+            df["date"] = pd.to_datetime(df["date"])
+
+            table_dir = os.path.join(self.root, table)
+            if mark is None:
+                shutil.rmtree(table_dir, ignore_errors=True)
+            else:
+                # Drop resynced months so deleted rows do not linger.
+                first = _month(mark)
+                for name in os.listdir(table_dir) if os.path.isdir(table_dir) else []:
+                    if name.startswith("month=") and name[6:] >= first:
+                        shutil.rmtree(os.path.join(table_dir, name))
+
+            months = df["date"].dt.strftime("%Y-%m")
+            for month, part in df.groupby(months):
+                part_dir = os.path.join(table_dir, f"month={month}")
+                os.makedirs(part_dir, exist_ok=True)
+                tmp = os.path.join(part_dir, "data.parquet.tmp")
+                pq.write_table(pa.Table.from_pandas(part, preserve_index=False), tmp)
+                os.replace(tmp, os.path.join(part_dir, "data.parquet"))
+
+            if not df.empty:
+                state[table] = df["date"].max().date().isoformat()
+            layouts[table] = TABLES[table]
+            positions[table] = position
+            self._save_state(state)
+            self._synced_at[table] = time.monotonic()
+            return len(df)
+
+    def ensure_fresh(self, table):
+        synced = self._synced_at.get(table)
+        if synced is None or table in self._dirty or time.monotonic() - synced > REFRESH_INTERVAL:
+            self.sync(table)
+
+    # ---------- read ----------
+    def read(self, table, columns=None, ranges=None, fuels=None, station=None):
+        """Rows of ``table`` as a DataFrame, scanning only the needed months.
+
+        ``ranges`` is a list of half-open (start, end) dates as produced by
+        ``utils.periods.month_ranges``; ``fuels`` restricts ``fuel_type`` and
+        ``station`` restricts ``station_id``.
+        """
+        with self._lock:
+            self.ensure_fresh(table)
+            return self._scan(table, columns, ranges, fuels, station)
+
+    def _scan(self, table, columns, ranges, fuels, station):
+        columns = columns or TABLES[table]
+        table_dir = os.path.join(self.root, table)
+        if not os.path.isdir(table_dir):
+            return pd.DataFrame(columns=columns)
+
+        dataset = ds.dataset(table_dir, format="parquet", partitioning="hive")
+        expr = None
+        if ranges is not None:
+            for start, end in ranges:
+                last = pd.Timestamp(end) - pd.Timedelta(days=1)
+                part = (
+                    (ds.field("month") >= _month(start)) & (ds.field("month") <= _month(last))
+                    & (ds.field("date") >= pa.scalar(datetime(start.year, start.month, start.day)))
+                    & (ds.field("date") < pa.scalar(datetime(end.year, end.month, end.day)))
+                )
+                expr = part if expr is None else expr | part
+            if expr is None:
+                return pd.DataFrame(columns=columns)
+        if fuels is not None:
+            fuel_expr = ds.field("fuel_type").isin(list(fuels))
+            expr = fuel_expr if expr is None else expr & fuel_expr
+        if station is not None:
+            station_expr = ds.field("station_id") == int(station)
+            expr = station_expr if expr is None else expr & station_expr
+
+        df = dataset.to_table(columns=list(columns), filter=expr).to_pandas()
+        return df.sort_values("date", kind="stable").reset_index(drop=True)
+
+
+_store = None
+
+
+def enabled():
+    return bool(SNAPSHOT_DIR) and pa is not None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = SnapshotStore(SNAPSHOT_DIR)
+    return _store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync the local Parquet snapshot.")
+    parser.add_argument("command", choices=["sync"])
+    parser.add_argument("tables", nargs="*", help=f"default: {', '.join(TABLES)}")
+    parser.add_argument("--full", action="store_true", help="re-pull everything")
+    args = parser.parse_args(argv)
+
+    if not enabled():
+        parser.error("set FUEL_SNAPSHOT_DIR and install pyarrow to use the snapshot store")
+    unknown = set(args.tables) - set(TABLES)
+    if unknown:
+        parser.error(f"not a snapshot table: {', '.join(sorted(unknown))}")
+    for table in args.tables or TABLES:
+        rows = get_store().sync(table, full=args.full)
+        print(f"{table}: {rows} rows synced (watermark {get_store().watermark(table)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Station registry and the station scope of reads and writes.
+
+Every row of the station tables carries a ``station_id``. A single-station
+install only ever has station 1 and the pages hide the station picker; a
+chain registers its stations with::
+
+    python -m utils.stations add "Anna Nagar" [--id 12]
+    python -m utils.stations list
+
+Reads take a ``station`` argument: a station id scopes the query to that
+station's rows, ``None`` means the whole fleet, which is served from the
+pre-aggregated ``fleet_fuel_summary`` (see ``utils.summary``).
+``FUEL_STATION_ID`` is the station the forms and dashboards open on.
+"""
+import argparse
+import os
+
+from sqlalchemy import text
+
+STATIONS_TABLE = "stations"
+DEFAULT_STATION = int(os.environ.get("FUEL_STATION_ID", 1))
+DEFAULT_NAME = "Main station"
+FLEET_LABEL = "All stations (fleet)"
+
+
+def picker(stations, fleet=True):
+    """({label: station}, default index) for a station selectbox.
+
+    ``stations`` is ``repository.load_stations()``. ``None`` stands for the
+    fleet roll-up and is offered only when ``fleet`` and there is more than
+    one station.
+    """
+    ids = stations["station_id"].astype(int).tolist() or [DEFAULT_STATION]
+    names = dict(zip(stations["station_id"].astype(int), stations["name"]))
+    labels = [names.get(s, f"Station {s}") for s in ids]
+    choices = {FLEET_LABEL: None} if fleet and len(ids) > 1 else {}
+    for station, label in zip(ids, labels):
+        choices[label if labels.count(label) == 1 else f"{label} (#{station})"] = station
+    values = list(choices.values())
+    return choices, values.index(DEFAULT_STATION) if DEFAULT_STATION in values else 0
+
+
+def add(conn, name, station_id=None):
+    """Register a station; returns its id (next free id when not given)."""
+    if station_id is None:
+        station_id = conn.execute(text(f"SELECT COALESCE(MAX(station_id), 0) + 1 FROM {STATIONS_TABLE}")).scalar()
+    conn.execute(
+        text(f"INSERT INTO {STATIONS_TABLE} (station_id, name) VALUES (:id, :name)"),
+        {"id": int(station_id), "name": name},
+    )
+    return int(station_id)
+
+
+def main(argv=None):
+    from utils import repository
+    from utils.db import get_connection
+
+    parser = argparse.ArgumentParser(description="Manage the station registry.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    new = sub.add_parser("add", help="register a station")
+    new.add_argument("name")
+    new.add_argument("--id", type=int, help="station id (default: next free id)")
+    sub.add_parser("list", help="list registered stations")
+    args = parser.parse_args(argv)
+
+    if args.command == "add":
+        with get_connection().begin() as conn:
+            station_id = add(conn, args.name, args.id)
+        repository.invalidate(STATIONS_TABLE)
+        print(f"station {station_id}: {args.name}")
+        return
+
+    for row in repository.load_stations().itertuples():
+        print(f"{row.station_id:>5}  {row.name}")
+
+
+if __name__ == "__main__":
+    main()
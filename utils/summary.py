@@ -0,0 +1,254 @@
+"""Daily per-station, per-fuel summary tables, maintained alongside every write.
+
+``daily_fuel_summary`` holds one row per (station, date, fuel_type) with
+litres, revenue, buying cost, margin, allocated expenses, profit and
+closing stock, so dashboards and the chatbot read a small pre-aggregated
+table instead of re-deriving the views over the full history.
+``fleet_fuel_summary`` rolls those rows up across stations per (date,
+fuel_type) and is refreshed for the same window, so fleet-wide reads never
+touch the per-station rows.
+
+Rebuild from the command line with::
+
+    python -m utils.summary rebuild [--start YYYY-MM-DD] [--end YYYY-MM-DD] [--station N]
+"""
+import argparse
+from datetime import date
+
+import pandas as pd
+from sqlalchemy import text
+
+from utils.db import bulk_insert
+from utils.query import statement
+
+SUMMARY_TABLE = "daily_fuel_summary"
+FLEET_TABLE = "fleet_fuel_summary"
+
+CREATE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (
+        station_id INTEGER NOT NULL DEFAULT 1,
+        date DATE NOT NULL,
+        fuel_type VARCHAR(20) NOT NULL,
+        litres DECIMAL(14, 3) NOT NULL DEFAULT 0,
+        revenue DECIMAL(16, 2) NOT NULL DEFAULT 0,
+        buying_cost DECIMAL(16, 2) NOT NULL DEFAULT 0,
+        margin DECIMAL(16, 2) NOT NULL DEFAULT 0,
+        expenses DECIMAL(16, 2) NOT NULL DEFAULT 0,
+        profit DECIMAL(16, 2) NOT NULL DEFAULT 0,
+        closing_stock DECIMAL(14, 3),
+        PRIMARY KEY (station_id, date, fuel_type)
+    )
+"""
+
+CREATE_FLEET_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {FLEET_TABLE} (
+        date DATE NOT NULL,
+        fuel_type VARCHAR(20) NOT NULL,
+        station_count INTEGER NOT NULL DEFAULT 0,
+        litres DECIMAL(16, 3) NOT NULL DEFAULT 0,
+        revenue DECIMAL(18, 2) NOT NULL DEFAULT 0,
+        buying_cost DECIMAL(18, 2) NOT NULL DEFAULT 0,
+        margin DECIMAL(18, 2) NOT NULL DEFAULT 0,
+        expenses DECIMAL(18, 2) NOT NULL DEFAULT 0,
+        profit DECIMAL(18, 2) NOT NULL DEFAULT 0,
+        closing_stock DECIMAL(16, 3),
+        PRIMARY KEY (date, fuel_type)
+    )
+"""
+
+METRICS = ["litres", "revenue", "buying_cost", "margin", "expenses", "profit"]
+COLUMNS = ["station_id", "date", "fuel_type", *METRICS, "closing_stock"]
+FLEET_COLUMNS = ["date", "fuel_type", "station_count", *METRICS, "closing_stock"]
+
+
+def ensure_table(conn):
+    conn.execute(text(CREATE_SQL))
+
+
+def ensure_fleet_table(conn):
+    conn.execute(text(CREATE_FLEET_SQL))
+
+
+def _window(column, start, end, stations=None):
+    where, params = [], {}
+    if start is not None:
+        where.append(f"{column} >= :start")
+        params["start"] = start
+    if end is not None:
+        where.append(f"{column} < :end")
+        params["end"] = end
+    if stations is not None:
+        where.append("station_id IN :stations")
+        params["stations"] = tuple(stations)
+    return (" WHERE " + " AND ".join(where) if where else ""), params
+
+
+def _frame(conn, sql, params):
+    stmt, bind = statement(sql, params)
+    df = pd.read_sql(stmt, conn, params=bind)
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"])
+    if "station_id" in df.columns:
+        # Empty results come back as object columns; merge keys must match.
+        df["station_id"] = df["station_id"].astype("int64")
+    return df
+
+
+def _closing_stock(conn, start, end, stations=None):
+    """Closing balances per (station, date, fuel) in the window, seeded with
+    the last balance before ``start`` so days without a stock entry carry it
+    forward."""
+    where, params = _window("date", start, end, stations)
+    stock = _frame(
+        conn, f"SELECT station_id, date, fuel_type, closing_stock FROM fuel_stock{where} ORDER BY date, id", params
+    )
+    if start is None:
+        return stock
+
+    before, params = _window("date", None, start, stations)
+    seeds = _frame(conn, f"""
+        SELECT st.station_id, st.date, st.fuel_type, st.closing_stock
+        FROM fuel_stock st
+        JOIN (
+            SELECT station_id, fuel_type, MAX(date) AS date FROM fuel_stock{before}
+            GROUP BY station_id, fuel_type
+        ) last ON last.station_id = st.station_id AND last.fuel_type = st.fuel_type AND last.date = st.date
+        ORDER BY st.date, st.id
+    """, params)
+    return pd.concat([seeds, stock], ignore_index=True)
+
+
+def _expense_keys(conn, expenses, keys):
+    """Keys for station-days that have expenses but no sales or stock entry:
+    one per fuel the station deals in (every known fuel when it has none
+    yet), so the day's expenses still land in the summary."""
+    days = expenses[["station_id", "date"]].merge(
+        keys[["station_id", "date"]].drop_duplicates(), how="left", indicator=True
+    )
+    days = days[days["_merge"] == "left_only"].drop(columns="_merge")
+    if days.empty:
+        return days.assign(fuel_type=pd.Series(dtype=object))
+
+    stations = sorted(int(s) for s in days["station_id"].unique())
+    fuels = _frame(conn, """
+        SELECT station_id, fuel_type FROM fuel_stock WHERE station_id IN :stations
+        UNION
+        SELECT station_id, fuel_type FROM fuel_sales WHERE station_id IN :stations
+    """, {"stations": stations})
+    missing = sorted(set(stations) - set(fuels["station_id"]))
+    if missing:
+        every = _frame(conn, "SELECT fuel_type FROM fuel_stock UNION SELECT fuel_type FROM fuel_sales", {})
+        fuels = pd.concat([fuels, pd.DataFrame({"station_id": missing}).merge(every, how="cross")])
+    return days.merge(fuels, on="station_id")
+
+
+def compute(conn, start=None, end=None, stations=None):
+    """Summary rows for dates in [start, end), derived from the base tables.
+
+    ``stations`` limits the rows to those station ids (all when None).
+    """
+    where, params = _window("date", start, end, stations)
+
+    sales = _frame(conn, f"""
+        SELECT station_id, date, fuel_type,
+               SUM(quantity_sold) AS litres,
+               SUM(quantity_sold * selling_price) AS revenue
+        FROM fuel_sales{where}
+        GROUP BY station_id, date, fuel_type
+    """, params)
+    prices = _frame(conn, f"SELECT station_id, date, fuel_type, buying_price FROM fuel_price{where}", params)
+    expenses = _frame(conn, f"""
+        SELECT station_id, date, SUM(amount) AS day_expenses FROM expenses{where}
+        GROUP BY station_id, date
+    """, params)
+    stock_keys = _frame(conn, f"SELECT DISTINCT station_id, date, fuel_type FROM fuel_stock{where}", params)
+
+    key = ["station_id", "date", "fuel_type"]
+    keys = pd.concat([sales[key], stock_keys]).drop_duplicates()
+    keys = pd.concat([keys, _expense_keys(conn, expenses, keys)]).drop_duplicates()
+    if keys.empty:
+        return pd.DataFrame(columns=COLUMNS)
+
+    df = (
+        keys.merge(sales, on=key, how="left")
+        .merge(prices, on=key, how="left")
+        .merge(expenses, on=["station_id", "date"], how="left")
+        .fillna({"litres": 0, "revenue": 0, "buying_price": 0, "day_expenses": 0})
+    )
+
+    df["buying_cost"] = df["litres"] * df["buying_price"]
+    df["margin"] = df["revenue"] - df["buying_cost"]
+
+    # Expenses are per station; split each station-day total by litres sold
+    # (evenly when nothing was sold) so per-fuel rows add up to the day.
+    day = df.groupby(["station_id", "date"])
+    day_litres = day["litres"].transform("sum")
+    share = (df["litres"] / day_litres).where(day_litres > 0, 1 / day["litres"].transform("size"))
+    df["expenses"] = df["day_expenses"] * share
+    df["profit"] = df["margin"] - df["expenses"]
+
+    stock = _closing_stock(conn, start, end, stations)
+    if stock.empty:
+        df["closing_stock"] = None
+    else:
+        stock = stock.sort_values("date", kind="stable").drop_duplicates(key, keep="last")
+        df = pd.merge_asof(
+            df.sort_values("date"), stock, on="date", by=["station_id", "fuel_type"], direction="backward"
+        )
+
+    df["date"] = df["date"].dt.date
+    return df[COLUMNS].sort_values(key).reset_index(drop=True)
+
+
+def rebuild_fleet(conn, start=None, end=None):
+    """Re-aggregate ``fleet_fuel_summary`` for [start, end) from the station rows.
+
+    ``closing_stock`` sums the stations that have a row on that day.
+    """
+    where, params = _window("date", start, end)
+    conn.execute(text(f"DELETE FROM {FLEET_TABLE}{where}"), params)
+    sums = ", ".join(f"SUM({m})" for m in [*METRICS, "closing_stock"])
+    conn.execute(text(f"""
+        INSERT INTO {FLEET_TABLE} ({', '.join(FLEET_COLUMNS)})
+        SELECT date, fuel_type, COUNT(*), {sums}
+        FROM {SUMMARY_TABLE}{where}
+        GROUP BY date, fuel_type
+    """), params)
+
+
+def rebuild(conn, start=None, end=None, stations=None):
+    """Replace summary rows in [start, end) (all rows when unbounded) for
+    ``stations`` (all when None), then the fleet roll-up for the window.
+
+    Runs on the caller's connection, so data-entry forms refresh the summary
+    inside the same transaction as their INSERTs. Returns rows written.
+    """
+    rows = compute(conn, start, end, stations)
+    where, params = _window("date", start, end, stations)
+    conn.execute(*statement(f"DELETE FROM {SUMMARY_TABLE}{where}", params))
+    bulk_insert(conn, SUMMARY_TABLE, rows)
+    rebuild_fleet(conn, start, end)
+    return len(rows)
+
+
+def main(argv=None):
+    from utils import changes
+    from utils.db import get_connection
+
+    parser = argparse.ArgumentParser(description="Maintain the daily fuel summary tables.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--start", type=date.fromisoformat)
+    parser.add_argument("--end", type=date.fromisoformat, help="exclusive")
+    parser.add_argument("--station", type=int, action="append", help="only this station (repeatable)")
+    args = parser.parse_args(argv)
+
+    with get_connection().begin() as conn:
+        ensure_table(conn)
+        ensure_fleet_table(conn)
+        written = rebuild(conn, args.start, args.end, args.station)
+        changes.record(conn, [SUMMARY_TABLE, FLEET_TABLE], args.start)
+    print(f"{SUMMARY_TABLE}: {written} rows rebuilt")
+
+
+if __name__ == "__main__":
+    main()